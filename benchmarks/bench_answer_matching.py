@@ -0,0 +1,55 @@
+"""
+Micro-benchmark for src/utils/answer_matching.py.
+
+Times AnswerKey.check() per answer class against precompiled keys (the
+quiz grades with a key compiled once per exercise) and key compilation itself.
+
+Usage:
+    python benchmarks/bench_answer_matching.py [--number 200000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from src.utils.answer_matching import answer_key_for, compile_answer_key  # noqa: E402
+
+CHOICE = {"type": "multiple_choice", "options": ["A) go", "B) went", "C) gone", "D) goes"], "correct_answer": "B"}
+TEXT = {"type": "open_question", "exercise_type": "vocabulary", "question": "Where did you go?", "correct_answer": "went to the school"}
+GRAMMAR = {"type": "fill_in_the_blank", "exercise_type": "grammar", "question": "I ___ working.", "correct_answer": "have been"}
+
+CASES = [
+    ("choice: selected option", CHOICE, "B) went"),
+    ("choice: wrong option", CHOICE, "A) go"),
+    ("text: exact", TEXT, "went to the school"),
+    ("text: case/punctuation/article", TEXT, "  Went to a school! "),
+    ("text: typo (fuzzy)", TEXT, "went to the scool"),
+    ("text: wrong", TEXT, "go to the school"),
+    ("grammar: other form", GRAMMAR, "had been"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'case':34s} {'ns/check':>10s}  result")
+    for name, exercise, answer in CASES:
+        key = answer_key_for(exercise)
+        seconds = min(timeit.repeat(lambda: key.check(answer), number=args.number, repeat=5))
+        print(f"{name:34s} {seconds / args.number * 1e9:10.0f}  {key.check(answer)}")
+
+    number = max(1, args.number // 20)
+    seconds = min(timeit.repeat(
+        lambda: compile_answer_key.__wrapped__(TEXT["correct_answer"]), number=number, repeat=5
+    ))
+    print(f"{'compile key (uncached)':34s} {seconds / number * 1e9:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Prefill tokens per request with the prompt templates (src/prompts/templates.py)
+against a local prefix-cache stand-in (benchmarks/fakes.PrefixCache).
+
+A mixed workload of rendered templates runs through the cache twice:
+- "templates": static system message first, variables last (as sent by the agents);
+- "variable_first": one user message with the variables before the static
+  instructions and JSON schema, the layout of the former inline f-string prompts.
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py [--students 50] [--block-tokens 16]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from benchmarks.fakes import PrefixCache  # noqa: E402
+from src.prompts.templates import (  # noqa: E402
+    CHAT_EVALUATION,
+    CURRICULUM_ALIGNMENT,
+    DIALOGUE,
+    LESSON_PLAN,
+    PRACTICE_EXERCISE,
+    THEORY_LESSON,
+)
+
+LANGUAGES = ("English", "Spanish", "German")
+LEVELS = ("A1", "A2", "B1", "B2")
+TOPICS = ("Past Simple", "Food & Restaurants", "Travel", "Modal Verbs", "Job Interview", "Family Members")
+EXERCISE_TYPES = ("multiple_choice", "fill_in_the_blank", "open_question")
+
+
+def workload(students: int, seed: int = 7):
+    """(template name, messages) of a day of requests: lessons, exercises, dialogues, evaluations, alignments."""
+    rng = random.Random(seed)
+    requests = []
+    for s in range(students):
+        language, level = LANGUAGES[s % len(LANGUAGES)], LEVELS[s % len(LEVELS)]
+        syllabus = [{"week": w + 1, "topics": [rng.choice(TOPICS), f"Topic {s}-{w}"]} for w in range(24)]
+        for topic in rng.sample(TOPICS, 3):
+            research = f"\nAdditional Research Material:\n---\n{topic} notes {s}. " + "Textbook excerpt. " * rng.randint(20, 60) + "\n---\n"
+            requests.append((THEORY_LESSON, dict(language=language, level=level, week=s % 24 + 1, topic=topic, research_material=research)))
+            for exercise_type in EXERCISE_TYPES:
+                requests.append((PRACTICE_EXERCISE, dict(
+                    language=language, content_type=exercise_type, difficulty=2, week=s % 24 + 1, topics=[topic]
+                )))
+            requests.append((DIALOGUE, dict(level=LEVELS.index(level) + 1, topic=topic, situation=f"Situation {rng.randint(1, 9)}")))
+            requests.append((LESSON_PLAN, dict(
+                target_language=language, level=LEVELS.index(level) + 1, learning_style="visual", phase="practice",
+                tools="generate_exercise, dialogue_generation", topic=topic, name=f"Student {s}",
+            )))
+        history = [{"question": f"Question {q}?", "answer": f"Answer {q} of student {s}, I goed there."} for q in range(10)]
+        requests.append((CHAT_EVALUATION, dict(chat_history=json.dumps(history, indent=2))))
+        requests.append((CURRICULUM_ALIGNMENT, dict(
+            syllabus=json.dumps(syllabus, indent=2), exercise=json.dumps({"question": f"Exercise {s}", "topic": rng.choice(TOPICS)})
+        )))
+    rng.shuffle(requests)
+    return [(template.name, template.render(**variables)) for template, variables in requests]
+
+
+def variable_first(messages):
+    system, user = messages
+    return [HumanMessage(content=f"{user.content}\n\n{system.content}")]
+
+
+def run(requests, layout, block_tokens: int):
+    cache = PrefixCache(block_tokens=block_tokens)
+    per_template = defaultdict(lambda: [0, 0, 0])
+    for name, messages in requests:
+        tokens, cached = cache.prefill(layout(messages))
+        totals = per_template[name]
+        totals[0] += 1
+        totals[1] += tokens
+        totals[2] += tokens - cached
+    return cache, per_template
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--block-tokens", type=int, default=16)
+    args = parser.parse_args()
+
+    requests = workload(args.students)
+    layouts = {"variable_first": variable_first, "templates": lambda messages: messages}
+    results = {name: run(requests, layout, args.block_tokens) for name, layout in layouts.items()}
+
+    print(f"{len(requests)} requests, block size {args.block_tokens} tokens")
+    print(f"{'layout':16s} {'template':22s} {'prompt tok/req':>15s} {'prefill tok/req':>16s} {'cached':>7s}")
+    for layout, (cache, per_template) in results.items():
+        for name, (count, tokens, prefill) in sorted(per_template.items()):
+            print(f"{layout:16s} {name:22s} {tokens / count:15.0f} {prefill / count:16.0f} {1 - prefill / tokens:7.1%}")
+        print(
+            f"{layout:16s} {'ALL':22s} {cache.prompt_tokens / cache.requests:15.0f} "
+            f"{cache.prefill_tokens / cache.requests:16.0f} {cache.cached_tokens / cache.prompt_tokens:7.1%}"
+        )
+
+    before, after = (results[name][0].prefill_tokens for name in layouts)
+    print(f"prefill tokens: {before} -> {after} ({after / before - 1:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
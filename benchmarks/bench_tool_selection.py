@@ -0,0 +1,48 @@
+"""
+Micro-benchmark for LanguageTools.select_tools_dynamically (src/agents/tool_selection.py).
+
+Usage:
+    python benchmarks/bench_tool_selection.py [--number 200000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from src.agents.language_tools import LanguageTools  # noqa: E402
+from src.agents.tool_selection import TOOL_TABLE, topic_category  # noqa: E402
+
+CASES = [
+    ("beginner, practice, no errors", dict(level=1, topic="Food and drinks", lesson_phase="practice")),
+    ("intermediate, review, 1 error type", dict(level="B1", topic="Past Simple tense", student_errors=["grammar"], lesson_phase="review")),
+    ("advanced, new content, 3 error types", dict(
+        level=5, topic="Job interview", student_errors=["grammar", "spelling", "vocabulary"], lesson_phase="new_content"
+    )),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    tools = LanguageTools(llm=None)
+    print(f"precomputed combinations: {len(TOOL_TABLE)}")
+    print(f"{'case':40s} {'ns/call':>8s}  tools")
+    for name, kwargs in CASES:
+        seconds = min(timeit.repeat(lambda: tools.select_tools_dynamically(**kwargs), number=args.number, repeat=5))
+        print(f"{name:40s} {seconds / args.number * 1e9:8.0f}  {tools.select_tools_dynamically(**kwargs)}")
+
+    number = max(1, args.number // 10)
+    topics = [f"unseen topic {i}" for i in range(number)]
+    it = iter(topics)
+    seconds = timeit.timeit(lambda: topic_category(next(it)), number=number)
+    print(f"{'topic classification (cache miss)':40s} {seconds / number * 1e9:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
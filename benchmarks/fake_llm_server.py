@@ -0,0 +1,144 @@
+"""
+OpenAI-compatible fake LLM server for load tests.
+
+Serves POST /v1/chat/completions (plain and stream=true) with the same
+deterministic answers as benchmarks/fakes.FakeLLM, after an injected latency,
+and fails a configurable share of requests. Prompt tokens are run through a
+fakes.PrefixCache; cached and prefilled totals are reported at GET /stats. Point the API at it with:
+
+    LITELLM_BASE_URL=http://127.0.0.1:8100/v1 LITELLM_API_KEY=fake-llm-key
+
+Usage:
+    python benchmarks/fake_llm_server.py --port 8100 --latency-ms 800 --jitter-ms 400 \
+        --per-token-ms 5 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fakes import FakeLLM, PrefixCache, prompt_text  # noqa: E402
+
+
+def create_app(
+    latency_ms: float = 500.0,
+    jitter_ms: float = 0.0,
+    per_token_ms: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 42,
+) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    responder = FakeLLM(latency_s=0)
+    prefix_cache = PrefixCache()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @app.get("/stats")
+    def get_stats():
+        return {
+            **stats,
+            "prompt_tokens": prefix_cache.prompt_tokens,
+            "cached_prompt_tokens": prefix_cache.cached_tokens,
+            "prefill_tokens": prefix_cache.prefill_tokens,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        streaming = False
+        try:
+            await asyncio.sleep((latency_ms + rng.uniform(0, jitter_ms)) / 1000)
+
+            if rng.random() < error_rate:
+                stats["errors"] += 1
+                return JSONResponse(
+                    status_code=500,
+                    content={"error": {"message": "Injected failure", "type": "server_error"}},
+                )
+
+            messages = body.get("messages", [])
+            prompt_tokens, cached_tokens = prefix_cache.prefill(messages)
+            text = responder.respond(prompt_text(messages))
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = body.get("model", "fake-llm")
+
+            def chunk(delta: dict, finish_reason=None) -> str:
+                return "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }) + "\n\n"
+
+            if body.get("stream"):
+                async def stream():
+                    try:
+                        for i in range(0, len(text), 16):
+                            await asyncio.sleep(per_token_ms * 4 / 1000)
+                            yield chunk({"content": text[i:i + 16]})
+                        yield chunk({}, "stop")
+                        yield "data: [DONE]\n\n"
+                    finally:
+                        stats["in_flight"] -= 1
+
+                streaming = True
+                return StreamingResponse(stream(), media_type="text/event-stream")
+
+            await asyncio.sleep(per_token_ms * len(text) / 4 / 1000)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(text) // 4,
+                    "total_tokens": prompt_tokens + len(text) // 4,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            }
+        finally:
+            if not streaming:
+                stats["in_flight"] -= 1
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random latency")
+    parser.add_argument("--per-token-ms", type=float, default=0.0, help="Generation time per output token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.per_token_ms, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
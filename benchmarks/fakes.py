@@ -0,0 +1,292 @@
+"""
+Offline stand-ins used by the benchmark suite.
+
+- FakeLLM: deterministic LangChain-style chat model (invoke/stream) that
+  recognizes the agents' prompts and answers with valid JSON after an
+  injected latency.
+- PrefixCache: block-hash model of the serving backend's automatic prefix
+  caching, to count the prompt tokens that actually need prefill.
+- HashingEmbeddingFunction: deterministic Chroma embedding function
+  (no model download).
+- use_offline_backends(): points MongoDB at mongomock, Chroma at a temp
+  dir with the hashing embeddings and BaseAgent at the FakeLLM.
+"""
+
+import json
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Iterator, Tuple
+
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from src.utils.extract_text import FakeEmbeddingBackend
+
+
+class FakeMessage:
+    def __init__(self, content: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        } if input_tokens or output_tokens else None
+
+
+def prompt_text(prompt) -> str:
+    """Plain text of a prompt string or a list of chat messages (LangChain objects or OpenAI dicts)."""
+    if isinstance(prompt, (list, tuple)):
+        return "\n".join(str(m.get("content", "")) if isinstance(m, dict) else str(getattr(m, "content", m)) for m in prompt)
+    return str(prompt)
+
+
+class PrefixCache:
+    """
+    Stand-in for vLLM-style automatic prefix caching.
+
+    The prompt, serialized with a minimal chat template, is cut into blocks
+    of block_tokens (~4 characters per token). A block is reused when the
+    same block after the same preceding text was prefilled before (chained
+    block hashes), so only the part after the first miss is prefilled.
+
+    Args:
+        block_tokens: KV-cache block size in tokens
+        capacity_blocks: Cached blocks kept (LRU)
+    """
+
+    def __init__(self, block_tokens: int = 16, capacity_blocks: int = 65536):
+        self.block_chars = block_tokens * 4
+        self.capacity_blocks = capacity_blocks
+        self.blocks = OrderedDict()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @staticmethod
+    def serialize(prompt) -> str:
+        if not isinstance(prompt, (list, tuple)):
+            return f"<|user|>\n{prompt}\n"
+        parts = []
+        for m in prompt:
+            role = m.get("role", "user") if isinstance(m, dict) else getattr(m, "type", "user")
+            parts.append(f"<|{role}|>\n{prompt_text([m])}\n")
+        return "".join(parts)
+
+    def prefill(self, prompt) -> Tuple[int, int]:
+        """(prompt_tokens, cached_tokens) of one request; its full blocks are cached afterwards."""
+        text = self.serialize(prompt)
+        chain, cached, hit = 0, 0, True
+        for start in range(0, len(text) - self.block_chars + 1, self.block_chars):
+            chain = hash((chain, text[start:start + self.block_chars]))
+            if hit and chain in self.blocks:
+                self.blocks.move_to_end(chain)
+                cached += self.block_chars // 4
+                continue
+            hit = False
+            self.blocks[chain] = None
+            if len(self.blocks) > self.capacity_blocks:
+                self.blocks.popitem(last=False)
+
+        tokens = len(text) // 4
+        self.requests += 1
+        self.prompt_tokens += tokens
+        self.cached_tokens += cached
+        return tokens, cached
+
+    @property
+    def prefill_tokens(self) -> int:
+        return self.prompt_tokens - self.cached_tokens
+
+
+class FakeLLM:
+    """
+    Deterministic chat model.
+
+    Args:
+        latency_s: Fixed delay per call (time to first token)
+        per_token_s: Extra delay per generated token (~4 characters)
+        fail_every: Return broken JSON on every n-th call (0 = never)
+    """
+
+    def __init__(self, latency_s: float = 0.05, per_token_s: float = 0.0, fail_every: int = 0):
+        self.latency_s = latency_s
+        self.per_token_s = per_token_s
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def invoke(self, prompt) -> FakeMessage:
+        text = self.respond(prompt)
+        time.sleep(self.latency_s + self.per_token_s * len(text) / 4)
+        return FakeMessage(text, len(prompt_text(prompt)) // 4, len(text) // 4)
+
+    def stream(self, prompt) -> Iterator[FakeMessage]:
+        text = self.respond(prompt)
+        time.sleep(self.latency_s)
+        for i in range(0, len(text), 16):
+            if self.per_token_s:
+                time.sleep(self.per_token_s * 4)
+            yield FakeMessage(text[i:i + 16])
+
+    def respond(self, prompt) -> str:
+        self.calls += 1
+        if self.fail_every and self.calls % self.fail_every == 0:
+            return "Sorry, I cannot answer that {"
+
+        text = prompt_text(prompt)
+        if "week course plan" in text:
+            weeks = int(text.split("Create a ")[1].split("-week")[0])
+            return json.dumps({
+                "total_weeks": weeks,
+                "language": "English",
+                "level_from": "A2",
+                "level_to": "B2",
+                "topics_by_week": [
+                    {"week": i + 1, "topics": [f"Topic {i + 1}", "Review"]} for i in range(weeks)
+                ],
+            })
+        if "Adapt it to this student's goal" in text:
+            weeks = json.loads(next(line for line in text.splitlines() if line.startswith("[")))
+            return json.dumps([
+                {"week": w["week"], "topics": w["topics"] if w["week"] % 3 else ["Goal-specific vocabulary"]}
+                for w in weeks
+            ])
+        if "Create a theoretical lesson" in text:
+            return json.dumps({
+                "type": "theory",
+                "title": "Past Simple in Everyday Stories",
+                "topic": "Past Simple",
+                "content": "# Past Simple\n\n" + "We use the past simple for finished actions. " * 40,
+                "key_points": ["Regular verbs add -ed", "Irregular verbs must be memorized"],
+            })
+        if "Create practice exercise" in text:
+            exercise_type = "multiple_choice"
+            for candidate in ("fill_in_the_blank", "open_question", "multiple_choice"):
+                if candidate in text:
+                    exercise_type = candidate
+                    break
+            return json.dumps({
+                "exercise_id": f"ex-{self.calls}",
+                "type": exercise_type,
+                "topic": "Past Simple",
+                "task": "Choose the correct form",
+                "question": "Yesterday I ___ to the park.",
+                "options": ["A) go", "B) went", "C) gone", "D) going"],
+                "correct_answer": "B) went",
+                "explanation": "Past simple of 'go' is 'went'.",
+                "difficulty": 2,
+            })
+        if "Generate dialogue" in text:
+            return json.dumps({
+                "dialogue_id": f"dlg-{self.calls}",
+                "topic": "Travel",
+                "situation": "At the airport",
+                "level": 2,
+                "lines": [
+                    {"speaker": "A", "text": "Where is gate 5?", "translation": "Где выход 5?"},
+                    {"speaker": "B", "text": "It is on the left.", "translation": "Слева."},
+                ],
+                "key_phrases": ["Where is", "on the left"],
+                "cultural_notes": None,
+            })
+        if "Design a lesson" in text:
+            return json.dumps({
+                "outline": ["Warmup: small talk", "New content: rules", "Practice: drills", "Review: summary"],
+                "estimated_total_minutes": 50,
+            })
+        if "Evaluate the following student answers" in text:
+            return json.dumps({
+                "overall_score": 72,
+                "detailed_feedback": "Good progress, watch verb tenses.",
+                "all_errors": [{
+                    "question_index": 0,
+                    "student_answer": "I goed",
+                    "error_description": "Wrong past form",
+                    "correction": "I went",
+                    "rule_explanation": "'go' is irregular",
+                    "error_type": "grammar",
+                    "topic": "Past Simple",
+                }],
+                "improvement_plan": "Review irregular verbs.",
+                "follow_up_questions": ["What did you do yesterday?"],
+            })
+        if "Determine where this exercise fits" in text:
+            return json.dumps({
+                "week": 2,
+                "topic": "Topic 2",
+                "confidence_score": 0.8,
+                "reasoning": "Matches the week 2 grammar focus.",
+            })
+        return "# Lesson\n\nA short explanation with examples.\n\n## Key Takeaways\n- Practice daily."
+
+
+class HashingEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by the deterministic FakeEmbeddingBackend."""
+
+    def __init__(self, dim: int = 256):
+        self.backend = FakeEmbeddingBackend(dim=dim)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.backend.embed(list(input))
+
+    @staticmethod
+    def name() -> str:
+        return "benchmark-hashing"
+
+    def get_config(self) -> dict:
+        return {"dim": self.backend.dim}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashingEmbeddingFunction":
+        return HashingEmbeddingFunction(dim=config.get("dim", 256))
+
+
+def use_offline_backends(llm: FakeLLM, chroma_dir: str = None) -> str:
+    """
+    Route every agent dependency to local stand-ins. Must run before agents are created.
+    Returns the Chroma directory in use.
+    """
+    import os
+
+    import mongomock
+
+    import src.agents.base_agent as base_agent
+    import src.database.mongodb_adapter as mongodb_adapter
+    from src.database.chroma_db import ChromaVectorDB
+
+    chroma_dir = chroma_dir or tempfile.mkdtemp(prefix="bench_chroma_")
+    os.environ["CHROMA_PERSIST_DIR"] = chroma_dir
+    os.environ["YANDEX_DISK_TOKEN"] = ""
+
+    shared_mongo = mongomock.MongoClient()
+    mongodb_adapter.MongoClient = lambda *args, **kwargs: shared_mongo
+    ChromaVectorDB.embedding_function = HashingEmbeddingFunction()
+    base_agent.get_llm = lambda *args, **kwargs: llm
+    return chroma_dir
+
+
+def seed_students(db, count: int = 20, total_weeks: int = 24) -> list[str]:
+    """Insert students with curricula and chat history. Returns their ids."""
+    student_ids = []
+    for i in range(count):
+        sid = f"bench_student_{i}"
+        student_ids.append(sid)
+        db.create_student({
+            "student_id": sid,
+            "name": f"Student {i}",
+            "target_language": "English",
+            "current_level": 1 + i % 4,
+            "target_level": 5,
+            "goals": "Business English" if i % 2 else "Travel",
+            "learning_style": "visual",
+        })
+        db.save_curriculum(sid, {
+            "language": "English",
+            "total_weeks": total_weeks,
+            "completed_weeks": 0,
+            "topics_by_week": [
+                {"week": w + 1, "topics": [f"Topic {w + 1}", "Review"]} for w in range(total_weeks)
+            ],
+        })
+        for q in range(10):
+            db.save_chat_interaction(sid, f"Question {q}?", f"Answer {q}, I goed there.")
+    return student_ids
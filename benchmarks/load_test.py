@@ -0,0 +1,387 @@
+"""
+Load generator simulating concurrent classrooms against the API.
+
+Each virtual student loops over sessions picked from a weighted mix:
+
+- curriculum: GET /curriculum/{student_id}
+- theory:     GET /stream/theory (SSE; time to first token and full lesson)
+- quiz:       N x POST /generate/exercise (one question per request)
+- chat_eval:  POST /evaluate/chat
+
+Load is applied in stages of increasing concurrent students. Every stage
+reports achieved RPS, latency percentiles and error rate (the saturation
+curve), client connection-pool stats, event-loop lag of the load generator
+and of the API (event_loop_lag_seconds from GET /metrics). The knee is the
+last stage that stays within the configured SLO.
+
+Typical setup (three terminals):
+    python benchmarks/fake_llm_server.py --latency-ms 800 --jitter-ms 400 --error-rate 0.01
+    LITELLM_BASE_URL=http://127.0.0.1:8100/v1 LITELLM_API_KEY=fake-llm-key \
+        uvicorn src.api.main:app --port 8000
+    python benchmarks/load_test.py benchmarks/load_config.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CONFIG = {
+    "base_url": "http://127.0.0.1:8000",
+    "students": [],
+    "seed_students": {"mongodb_url": None, "count": 50},
+    "http": {"max_connections": 100, "max_keepalive_connections": 20, "timeout_s": 120, "pool_timeout_s": 30},
+    "session_mix": {"curriculum": 0.3, "theory": 0.2, "quiz": 0.3, "chat_eval": 0.2},
+    "quiz_questions": 10,
+    "think_time_s": [1.0, 3.0],
+    "stages": [{"students": 5, "duration_s": 30}, {"students": 10, "duration_s": 30}],
+    "slo": {"p95_ms": 10000, "error_rate": 0.01},
+    "random_seed": 7,
+    "output": "load_report.json",
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class PoolStats:
+    """Connection-pool activity gathered from httpcore trace events."""
+
+    def __init__(self):
+        self.connections_opened = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.acquire_ms: List[float] = []
+
+    def reset(self):
+        self.connections_opened = 0
+        self.max_in_flight = self.in_flight
+        self.acquire_ms = []
+
+    def tracer(self):
+        """Per-request trace callback: time from send to headers written = pool wait + connect."""
+        started = time.perf_counter()
+
+        async def trace(event: str, info: dict):
+            if event == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event.endswith("send_request_headers.started"):
+                self.acquire_ms.append((time.perf_counter() - started) * 1000)
+        return trace
+
+    def summary(self) -> Dict:
+        return {
+            "connections_opened": self.connections_opened,
+            "max_in_flight": self.max_in_flight,
+            "acquire_p50_ms": round(percentile(self.acquire_ms, 0.50), 2),
+            "acquire_p95_ms": round(percentile(self.acquire_ms, 0.95), 2),
+            "acquire_max_ms": round(max(self.acquire_ms, default=0.0), 2),
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the load generator's own event loop wakes up."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples_ms: List[float] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples_ms.append(max(0.0, loop.time() - expected) * 1000)
+
+    def drain(self) -> Dict:
+        samples, self.samples_ms = self.samples_ms, []
+        return {
+            "p50_ms": round(percentile(samples, 0.50), 2),
+            "p99_ms": round(percentile(samples, 0.99), 2),
+            "max_ms": round(max(samples, default=0.0), 2),
+        }
+
+
+class LoadTest:
+    def __init__(self, config: Dict):
+        self.config = config
+        self.rng = random.Random(config["random_seed"])
+        self.pool = PoolStats()
+        self.loop_lag = LoopLagMonitor()
+        self.records: List[Dict] = []
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def request(self, scenario: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        self.pool.in_flight += 1
+        self.pool.max_in_flight = max(self.pool.max_in_flight, self.pool.in_flight)
+        start = time.perf_counter()
+        record = {"scenario": scenario, "endpoint": path.split("?")[0], "status": 0, "error": None}
+        try:
+            response = await self.client.request(method, path, extensions={"trace": self.pool.tracer()}, **kwargs)
+            record["status"] = response.status_code
+            return response
+        except httpx.HTTPError as e:
+            record["error"] = type(e).__name__
+            return None
+        finally:
+            self.pool.in_flight -= 1
+            record["latency_ms"] = (time.perf_counter() - start) * 1000
+            self.records.append(record)
+
+    async def stream_theory(self, student_id: str):
+        week = self.rng.randint(1, 24)
+        params = {"topic": f"Topic {week}", "week": week, "level": "B1", "language": "English"}
+        self.pool.in_flight += 1
+        self.pool.max_in_flight = max(self.pool.max_in_flight, self.pool.in_flight)
+        start = time.perf_counter()
+        record = {"scenario": "theory", "endpoint": "/stream/theory", "status": 0, "error": None}
+        try:
+            async with self.client.stream(
+                "GET", "/stream/theory", params=params, extensions={"trace": self.pool.tracer()}
+            ) as response:
+                record["status"] = response.status_code
+                async for line in response.aiter_lines():
+                    if "ttft_ms" not in record and line.startswith("event: "):
+                        record["ttft_ms"] = (time.perf_counter() - start) * 1000
+        except httpx.HTTPError as e:
+            record["error"] = type(e).__name__
+        finally:
+            self.pool.in_flight -= 1
+            record["latency_ms"] = (time.perf_counter() - start) * 1000
+            self.records.append(record)
+
+    async def run_session(self, student_id: str):
+        mix = self.config["session_mix"]
+        scenario = self.rng.choices(list(mix), weights=list(mix.values()))[0]
+
+        if scenario == "curriculum":
+            await self.request("curriculum", "GET", f"/curriculum/{student_id}")
+        elif scenario == "theory":
+            await self.stream_theory(student_id)
+        elif scenario == "quiz":
+            for _ in range(self.config["quiz_questions"]):
+                await self.request("quiz", "POST", "/generate/exercise", json={
+                    "student_id": student_id,
+                    "week": self.rng.randint(1, 24),
+                    "type": self.rng.choice(["multiple_choice", "fill_in_the_blank"]),
+                    "difficulty": self.rng.randint(1, 3),
+                })
+        elif scenario == "chat_eval":
+            await self.request("chat_eval", "POST", "/evaluate/chat", json={"student_id": student_id})
+
+    async def virtual_student(self, student_id: str, deadline: float):
+        low, high = self.config["think_time_s"]
+        while time.perf_counter() < deadline:
+            await self.run_session(student_id)
+            await asyncio.sleep(self.rng.uniform(low, high))
+
+    async def scrape_loop_lag(self) -> Optional[Dict[float, float]]:
+        """Cumulative event_loop_lag_seconds buckets from the API ({le: count})."""
+        from prometheus_client.parser import text_string_to_metric_families
+
+        try:
+            response = await self.client.get("/metrics")
+            buckets = {}
+            for family in text_string_to_metric_families(response.text):
+                if family.name != "event_loop_lag_seconds":
+                    continue
+                for sample in family.samples:
+                    if sample.name.endswith("_bucket"):
+                        buckets[float(sample.labels["le"])] = sample.value
+            return buckets
+        except Exception as e:
+            logger.warning(f"Could not scrape API metrics: {e}")
+            return None
+
+    async def run_stage(self, stage: Dict, students: List[str]) -> Dict:
+        self.records = []
+        self.pool.reset()
+        self.loop_lag.drain()
+        lag_before = await self.scrape_loop_lag()
+
+        started = time.perf_counter()
+        deadline = started + stage["duration_s"]
+        await asyncio.gather(*(
+            self.virtual_student(students[i % len(students)], deadline) for i in range(stage["students"])
+        ))
+        elapsed = time.perf_counter() - started
+
+        lag_after = await self.scrape_loop_lag()
+        return self.summarize(stage, elapsed, lag_before, lag_after)
+
+    def summarize(self, stage: Dict, elapsed: float, lag_before, lag_after) -> Dict:
+        latencies = [r["latency_ms"] for r in self.records]
+        errors = [r for r in self.records if r["error"] or r["status"] >= 500]
+        by_scenario = defaultdict(list)
+        for r in self.records:
+            by_scenario[r["scenario"]].append(r)
+
+        result = {
+            "students": stage["students"],
+            "duration_s": round(elapsed, 1),
+            "requests": len(self.records),
+            "rps": round(len(self.records) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "error_rate": round(len(errors) / len(self.records), 4) if self.records else 0.0,
+            "scenarios": {},
+            "pool": self.pool.summary(),
+            "client_loop_lag": self.loop_lag.drain(),
+            "api_loop_lag": _histogram_delta_quantiles(lag_before, lag_after),
+        }
+        for scenario, records in by_scenario.items():
+            values = [r["latency_ms"] for r in records]
+            summary = {
+                "requests": len(records),
+                "p50_ms": round(percentile(values, 0.50), 1),
+                "p95_ms": round(percentile(values, 0.95), 1),
+                "errors": sum(1 for r in records if r["error"] or r["status"] >= 500),
+            }
+            ttft = [r["ttft_ms"] for r in records if "ttft_ms" in r]
+            if ttft:
+                summary["ttft_p95_ms"] = round(percentile(ttft, 0.95), 1)
+            result["scenarios"][scenario] = summary
+        return result
+
+    async def run(self) -> Dict:
+        http = self.config["http"]
+        limits = httpx.Limits(
+            max_connections=http["max_connections"],
+            max_keepalive_connections=http["max_keepalive_connections"],
+        )
+        timeout = httpx.Timeout(http["timeout_s"], pool=http["pool_timeout_s"])
+        students = self.config["students"] or seed_students(self.config["seed_students"])
+        if not students:
+            raise SystemExit("No students: set 'students' or 'seed_students.mongodb_url' in the config")
+
+        lag_task = asyncio.create_task(self.loop_lag.run())
+        stages = []
+        try:
+            async with httpx.AsyncClient(base_url=self.config["base_url"], limits=limits, timeout=timeout) as client:
+                self.client = client
+                for stage in self.config["stages"]:
+                    result = await self.run_stage(stage, students)
+                    stages.append(result)
+                    print_stage(result)
+        finally:
+            lag_task.cancel()
+
+        slo = self.config["slo"]
+        within_slo = [
+            s for s in stages if s["p95_ms"] <= slo["p95_ms"] and s["error_rate"] <= slo["error_rate"]
+        ]
+        return {
+            "config": self.config,
+            "stages": stages,
+            "max_students_within_slo": max((s["students"] for s in within_slo), default=0),
+        }
+
+
+def _histogram_delta_quantiles(before: Optional[Dict], after: Optional[Dict]) -> Optional[Dict]:
+    """Approximate quantiles (bucket upper bounds) of the observations made between two scrapes."""
+    if not before or not after:
+        return None
+    bounds = sorted(after)
+    counts = [after[b] - before.get(b, 0.0) for b in bounds]
+    total = counts[-1] if counts else 0
+    if total <= 0:
+        return None
+
+    def quantile(q: float) -> float:
+        for bound, count in zip(bounds, counts):
+            if count >= q * total:
+                return bound
+        return bounds[-1]
+
+    return {
+        "samples": int(total),
+        "p50_le_ms": quantile(0.50) * 1000,
+        "p99_le_ms": quantile(0.99) * 1000,
+    }
+
+
+def seed_students(seed_config: Dict) -> List[str]:
+    """Create load-test students (profiles, curricula, chat history) in the API's MongoDB."""
+    if not seed_config.get("mongodb_url"):
+        return []
+    from benchmarks.fakes import seed_students as seed
+    from src.database.mongodb_adapter import LanguageLearningDB
+
+    return seed(LanguageLearningDB(seed_config["mongodb_url"]), count=seed_config.get("count", 50))
+
+
+def print_stage(result: Dict):
+    api_lag = result["api_loop_lag"] or {}
+    print(
+        f"students {result['students']:4d}  rps {result['rps']:7.2f}  "
+        f"p50 {result['p50_ms']:8.0f}  p95 {result['p95_ms']:8.0f}  p99 {result['p99_ms']:8.0f} ms  "
+        f"errors {result['error_rate']:6.2%}  conns {result['pool']['connections_opened']:4d}  "
+        f"acquire p95 {result['pool']['acquire_p95_ms']:7.1f} ms  "
+        f"loop lag client p99 {result['client_loop_lag']['p99_ms']:6.1f} / api p99 <= {api_lag.get('p99_le_ms', 0):6.1f} ms"
+    )
+
+
+def load_config(path: Optional[str]) -> Dict:
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path, encoding="utf-8") as f:
+            user_config = json.load(f)
+        for key, value in user_config.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+    return config
+
+
+def write_report(report: Dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    curve_path = os.path.splitext(path)[0] + "_curve.csv"
+    with open(curve_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["students", "rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"])
+        for s in report["stages"]:
+            writer.writerow([s["students"], s["rps"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["error_rate"]])
+    print(f"Report written to {path} and {curve_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", help="JSON config (see DEFAULT_CONFIG)")
+    parser.add_argument("--base-url", help="Override base_url from the config")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = load_config(args.config)
+    if args.base_url:
+        config["base_url"] = args.base_url
+
+    report = asyncio.run(LoadTest(config).run())
+    print(f"\nMax concurrent students within SLO: {report['max_students_within_slo']}")
+    write_report(report, config["output"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Offline end-to-end benchmarks for the agents and ingestion.
+
+Everything runs in-process against local stand-ins (see benchmarks/fakes.py):
+a deterministic latency-injecting fake LLM, mongomock and a temp Chroma dir.
+No network, API keys or running services are needed.
+
+Reports p50/p95/p99 latency, throughput and peak RSS per scenario. With
+--baseline, compares p95 against a saved run and exits with status 1 when a
+scenario got slower than the threshold allows.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/run_benchmarks.py --only teach theory --iterations 50 --latency-ms 0
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from benchmarks.fakes import FakeLLM, seed_students, use_offline_backends  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_scenario(name: str, fn: Callable[[int], None], iterations: int, warmup: int) -> Dict:
+    for i in range(warmup):
+        fn(i)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(warmup + i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def build_scenarios(llm: FakeLLM, workdir: str) -> Dict[str, Callable[[int], None]]:
+    # Agents are imported after use_offline_backends() so they pick up the fakes.
+    from src.agents.assessor_agent import AssessorAgent
+    from src.agents.curriculum_planner_agent import CurriculumPlannerAgent
+    from src.agents.language_tutor_agent import LanguageTutorAgent
+    from src.agents.theory_agent import TheoryAgent
+    from src.agents.unified_teacher_agent import UnifiedTeacherAgent
+    from src.database.mongodb_adapter import LanguageLearningDB
+
+    db = LanguageLearningDB("mongodb://benchmark")
+    student_ids = seed_students(db)
+
+    tutor = LanguageTutorAgent("mongodb://benchmark")
+    teacher = UnifiedTeacherAgent("mongodb://benchmark")
+    theory = TheoryAgent()
+    planner = CurriculumPlannerAgent("mongodb://benchmark")
+    assessor = AssessorAgent("mongodb://benchmark")
+
+    textbook = os.path.join(workdir, "textbook.txt")
+    with open(textbook, "w", encoding="utf-8") as f:
+        f.write("The past simple describes finished actions in the past. " * 2000)
+    pdf_path = _make_pdf(os.path.join(workdir, "textbook.pdf"), pages=10)
+
+    # Weekly exam: 2000 answer sheets x 40 multiple-choice questions
+    exam = {"quiz_id": "benchmark_exam", "questions": [
+        {"question_id": q, "correct_answer": "ABCD"[q % 4]} for q in range(40)
+    ]}
+    answer_sheets = {
+        f"exam_student_{s}": {str(q): "ABCD"[(q + (s * q) % 7 // 5) % 4] for q in range(40)} for s in range(2000)
+    }
+
+    def student(i: int) -> str:
+        return student_ids[i % len(student_ids)]
+
+    def teach(i):
+        tutor.teach(student(i), "Past Simple")
+
+    def generate_exercise(i):
+        teacher.generate_content(student(i), {"type": "multiple_choice", "week": 1 + i % 24, "difficulty": 2})
+
+    def generate_theory(i):
+        theory.generate_theory(topic=f"Topic {i % 24}", week=1 + i % 24, level="B1", language="English")
+
+    def plan_curriculum(i):
+        planner.plan_curriculum(student(i), force_regenerate=True)
+
+    def grade_cohort(i):
+        assessor.evaluate_cohort(exam, answer_sheets, save=False)
+
+    def ingest_text(i):
+        import ingest_textbook
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_textbook.ingest_book(textbook)
+
+    def ingest_pdf(i):
+        from src.utils.extract_text import FakeEmbeddingBackend, FakeVLMBackend, Ingestor
+        from src.database.chroma_db import ChromaVectorDB
+        ingestor = Ingestor(
+            embedding_backend=FakeEmbeddingBackend(),
+            vlm_backend=FakeVLMBackend(latency_s=llm.latency_s),
+            chroma_client=ChromaVectorDB().client,
+            collection_name="benchmark_pdf",
+        )
+        ingestor.ingest_pdf(pdf_path)
+
+    return {
+        "teach": teach,
+        "generate_content": generate_exercise,
+        "theory": generate_theory,
+        "plan_curriculum": plan_curriculum,
+        "grade_cohort": grade_cohort,
+        "ingest_text": ingest_text,
+        "ingest_pdf": ingest_pdf,
+    }
+
+
+def _make_pdf(path: str, pages: int) -> str:
+    """Write a PDF where every third page has no text layer (forces the VLM route)."""
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i % 3 != 2:
+            page.insert_textbox(
+                fitz.Rect(50, 50, 550, 800),
+                f"Chapter {i + 1}. " + "Irregular verbs change form in the past tense. " * 30,
+            )
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def compare(results: List[Dict], baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        base = baseline.get(result["name"])
+        if not base or not base["p95_ms"]:
+            continue
+        change = result["p95_ms"] / base["p95_ms"] - 1
+        result["p95_change"] = round(change, 3)
+        if change > threshold:
+            regressions.append(
+                f"{result['name']}: p95 {base['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms (+{change:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fake LLM time to first token")
+    parser.add_argument("--per-token-ms", type=float, default=0.0, help="Fake LLM extra delay per output token")
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed p95 slowdown (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        llm = FakeLLM(latency_s=args.latency_ms / 1000, per_token_s=args.per_token_ms / 1000)
+        use_offline_backends(llm, chroma_dir=os.path.join(workdir, "chroma"))
+        scenarios = build_scenarios(llm, workdir)
+
+        results = []
+        for name, fn in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            result = run_scenario(name, fn, args.iterations, args.warmup)
+            results.append(result)
+            print(f"{name:18s} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                  f"p99 {result['p99_ms']:8.1f} ms  {result['throughput_per_s']:7.2f}/s  "
+                  f"rss {result['peak_rss_mb']:.0f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {
+            "iterations": args.iterations,
+            "latency_ms": args.latency_ms,
+            "per_token_ms": args.per_token_ms,
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\nNo p95 regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+One-off migration: give vocabulary items stored before spaced-repetition
+scheduling a due_at (now), so they enter the review queue, and create the
+(student_id, due_at) index.
+
+Usage:
+    python scripts/backfill_vocabulary_due_at.py [--mongo mongodb://localhost:27017]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from src.database.mongodb_adapter import LanguageLearningDB
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+
+    updated = LanguageLearningDB(args.mongo).backfill_vocabulary_due_at()
+    print(f"Vocabulary items scheduled: {updated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Import-time budget check for the API module.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+fails if the cumulative import time exceeds the budget.
+
+Usage:
+    python scripts/check_import_time.py [--module src.api.main] [--budget-ms 1000] [--top 10]
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure_import(module: str) -> list[tuple[int, int, str]]:
+    """Returns (self_us, cumulative_us, module_name) rows reported by -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="src.api.main")
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = measure_import(args.module)
+    total_ms = next(cum for _, cum, name in rows if name == args.module) / 1000
+
+    print(f"Slowest imports under {args.module}:")
+    for _, cum, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total_ms > args.budget_ms:
+        raise SystemExit("FAIL: import-time budget exceeded")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
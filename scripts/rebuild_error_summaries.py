@@ -0,0 +1,32 @@
+"""
+Rebuild the materialized per-student error summaries (student_error_summary)
+from the raw student_errors log, e.g. after deploying the summary or changing
+ERROR_DECAY_HALF_LIFE_DAYS.
+
+Usage:
+    python scripts/rebuild_error_summaries.py [--mongo mongodb://localhost:27017] [--students id1 id2]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from src.database.mongodb_adapter import LanguageLearningDB
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--students", nargs="*", help="Only these students (default: everyone with errors)")
+    args = parser.parse_args()
+
+    db = LanguageLearningDB(args.mongo)
+    student_ids = args.students or db.db.student_errors.distinct("student_id")
+    rebuilt = sum(1 for sid in student_ids if db.rebuild_error_summary(sid))
+    print(f"Error summaries rebuilt: {rebuilt}/{len(student_ids)}")
+
+
+if __name__ == "__main__":
+    main()
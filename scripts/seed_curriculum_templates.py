@@ -0,0 +1,46 @@
+"""
+Precompute curriculum templates for the common (language, level range, goal) combinations,
+so onboarding students clone a plan instead of waiting for the LLM.
+
+Usage:
+    python scripts/seed_curriculum_templates.py [--languages English Spanish] [--weeks 24]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from src.agents.curriculum_planner_agent import CurriculumPlannerAgent
+
+CEFR_RANGES = [("A1", "A2"), ("A1", "B1"), ("A2", "B1"), ("A2", "B2"), ("B1", "B2"), ("B1", "C1"), ("B2", "C1")]
+GOALS = [
+    "General fluency",
+    "Travel",
+    "Business communication",
+    "Exam preparation",
+    "IT and software development",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--languages", nargs="+", default=["English"])
+    parser.add_argument("--weeks", type=int, default=24)
+    parser.add_argument("--mongo", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+
+    planner = CurriculumPlannerAgent(database_url=args.mongo, personalize=False)
+    if planner.templates is None:
+        raise SystemExit("Curriculum templates are disabled or Chroma is unavailable")
+
+    for language in args.languages:
+        for level_from, level_to in CEFR_RANGES:
+            for goals in GOALS:
+                template_id = planner.precompute_template(language, level_from, level_to, goals, args.weeks)
+                print(f"{language:10s} {level_from}->{level_to}  {goals:30s} {template_id or 'FAILED'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Summarize a JSONL span file written by src/utils/tracing.py (TRACE_FILE).
+
+Prints per-span-name count, mean/p95/max duration and, for each root
+operation (e.g. LanguageTutorAgent.teach), the share of its time spent in
+each child node.
+
+Usage:
+    python scripts/trace_summary.py logs/traces.jsonl
+"""
+
+import json
+import sys
+from collections import defaultdict
+
+
+def load_spans(path: str) -> list[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    spans.extend(scope_spans.get("spans", []))
+    return spans
+
+
+def duration_ms(span: dict) -> float:
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main(path: str):
+    spans = load_spans(path)
+    if not spans:
+        print("No spans found.")
+        return
+
+    by_name = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        by_name[span["name"]].append(duration_ms(span))
+        if span.get("status", {}).get("code") == 2:
+            errors[span["name"]] += 1
+
+    print(f"{'span':45s} {'count':>6s} {'mean ms':>9s} {'p95 ms':>9s} {'max ms':>9s} {'errors':>6s}")
+    for name, values in sorted(by_name.items(), key=lambda kv: -sum(kv[1])):
+        print(f"{name:45s} {len(values):6d} {sum(values) / len(values):9.1f} "
+              f"{percentile(values, 0.95):9.1f} {max(values):9.1f} {errors[name]:6d}")
+
+    by_id = {span["spanId"]: span for span in spans}
+    child_time = defaultdict(lambda: defaultdict(float))
+    root_time = defaultdict(float)
+    for span in spans:
+        parent = by_id.get(span.get("parentSpanId"))
+        if parent is None:
+            root_time[span["name"]] += duration_ms(span)
+        elif parent.get("parentSpanId") is None:
+            child_time[parent["name"]][span["name"]] += duration_ms(span)
+
+    for root, children in child_time.items():
+        total = root_time[root] or 1.0
+        print(f"\nTime share inside {root}:")
+        for name, value in sorted(children.items(), key=lambda kv: -kv[1]):
+            print(f"  {name:45s} {100 * value / total:5.1f}%")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "logs/traces.jsonl")
@@ -1,9 +1,14 @@
 import logging
 import json
+import time
 from typing import Dict, Any, Optional
 
+import numpy as np
+
 from src.agents.base_agent import BaseAgent
 from src.database.mongodb_adapter import LanguageLearningDB
+from src.utils.grading import grade_cohort
+from src.utils.tracing import traced_operation
 
 logger = logging.getLogger(__name__)
 
@@ -43,23 +48,16 @@ class AssessorAgent(BaseAgent):
         Evaluates the student's answers against the quiz data.
         """
         logger.info(f"Evaluating answers for {student_id}")
-        
-        score = 0
-        total = len(quiz_data.get("questions", []))
-        feedback = []
-        
-        for question in quiz_data.get("questions", []):
-            q_id = question["question_id"]
-            correct = question["correct_answer"]
-            student_ans = student_answers.get(q_id)
-            
-            is_correct = (student_ans == correct)
-            if is_correct:
-                score += 1
-                feedback.append(f"Q{q_id}: Correct!")
-            else:
-                feedback.append(f"Q{q_id}: Incorrect. Correct was {correct}.")
-                
+
+        graded = grade_cohort(quiz_data.get("questions", []), {student_id: student_answers})
+        total = len(graded.question_ids)
+        score = int(graded.correct[0].sum())
+
+        feedback = [
+            f"Q{qid}: Correct!" if is_correct else f"Q{qid}: Incorrect. Correct was {correct}."
+            for qid, correct, is_correct in zip(graded.question_ids, graded.correct_answers, graded.correct[0])
+        ]
+
         return {
             "student_id": student_id,
             "score": score,
@@ -67,3 +65,69 @@ class AssessorAgent(BaseAgent):
             "percentage": (score / total) * 100 if total > 0 else 0,
             "feedback": feedback
         }
+
+    @traced_operation("evaluate_cohort")
+    def evaluate_cohort(
+        self,
+        quiz_data: Dict[str, Any],
+        answer_sheets: Dict[str, Dict[Any, str]],
+        save: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Grades a whole cohort's answer sheets ({student_id: {question_id: answer}}) at once.
+
+        Returns per-student scores plus per-question difficulty and discrimination.
+        With save=True the results are written with one bulk insert and the item
+        statistics are upserted under the quiz id.
+        """
+        start_time = time.perf_counter()
+        questions = quiz_data.get("questions", [])
+        if not questions:
+            return {"error": "Quiz has no questions"}
+        if not answer_sheets:
+            return {"error": "No answer sheets"}
+
+        graded = grade_cohort(questions, answer_sheets)
+        percentages = graded.percentages
+        quiz_id = str(quiz_data.get("quiz_id") or quiz_data.get("topic", "quiz"))
+
+        scores = graded.scores.tolist()
+        rounded = np.round(percentages, 2).tolist()
+        answered = graded.answered.sum(axis=1).tolist()
+        rows, columns = np.nonzero(~graded.correct)
+        incorrect = np.split(np.asarray(graded.question_ids, dtype=object)[columns], np.searchsorted(rows, np.arange(1, len(scores))))
+
+        results = [
+            {
+                "student_id": sid,
+                "quiz_id": quiz_id,
+                "topic": quiz_data.get("topic"),
+                "score": scores[i],
+                "max_score": graded.max_score,
+                "percentage": rounded[i],
+                "answered": answered[i],
+                "incorrect_questions": incorrect[i].tolist(),
+            }
+            for i, sid in enumerate(graded.student_ids)
+        ]
+        items = graded.item_statistics()
+        summary = {
+            "students": len(results),
+            "mean_percentage": round(float(percentages.mean()), 2) if results else 0.0,
+            "median_percentage": round(float(np.median(percentages)), 2) if results else 0.0,
+            "items": items,
+        }
+
+        saved = 0
+        if save and self.db:
+            saved = self.db.save_assessment_results([dict(r) for r in results])
+            self.db.save_quiz_statistics(quiz_id, {"topic": quiz_data.get("topic"), **summary})
+
+        logger.info(f"Graded {len(results)} answer sheets x {len(questions)} questions for quiz {quiz_id}")
+        return {
+            "quiz_id": quiz_id,
+            **summary,
+            "saved": saved,
+            "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            "results": results,
+        }
@@ -8,7 +8,11 @@ Provides common functionality:
 """
 
 import logging
+from typing import Dict, Iterator
+
 from src.utils.llm import get_llm
+from src.utils.metrics import LLM_REQUEST_DURATION, observe, record_llm_usage
+from src.utils.structured_output import invoke_structured, with_response_format
 
 logger = logging.getLogger(__name__)
 
@@ -40,11 +44,35 @@ class BaseAgent:
         else:
             logger.info("BaseAgent initialized with real LLM client.")
 
-    def invoke_llm(self, prompt: str) -> str:
+    def invoke_llm(self, prompt) -> str:
         """Single entry point for LLM calls with mock mode support."""
         if self.llm is None:
             logger.warning("invoke_llm in MOCK mode, returning dummy JSON.")
             
             return '{"outline": ["Warmup", "Content", "Practice", "Review"], "estimated_total_minutes": 50}'
-        resp = self.llm.invoke(prompt)
-        return resp.content
\ No newline at end of file
+        resp = self.call_llm(prompt)
+        return resp.content
+
+    def call_llm(self, prompt):
+        """Invoke the LLM with a prompt string or messages and return the raw message, recording latency and token metrics."""
+        agent = self.__class__.__name__
+        with observe(LLM_REQUEST_DURATION, agent, "invoke"):
+            resp = self.llm.invoke(prompt)
+        record_llm_usage(agent, resp)
+        return resp
+
+    def call_llm_structured(self, prompt, schema) -> Dict:
+        """Invoke the LLM for an answer of a pydantic schema (guided decoding, retried if invalid)."""
+        return invoke_structured(self.llm, prompt, schema, self.__class__.__name__)
+
+    def stream_llm(self, prompt, schema=None) -> Iterator[str]:
+        """Stream LLM output token by token (a single chunk in mock mode), decoding to `schema` if given."""
+        if self.llm is None:
+            yield self.invoke_llm(prompt)
+            return
+        agent = self.__class__.__name__
+        with observe(LLM_REQUEST_DURATION, agent, "stream"):
+            for chunk in with_response_format(self.llm, schema).stream(prompt):
+                record_llm_usage(agent, chunk)
+                if chunk.content:
+                    yield chunk.content
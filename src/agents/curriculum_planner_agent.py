@@ -1,6 +1,10 @@
 
 import logging
-from typing import Dict, List, Optional
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import json
 
@@ -14,11 +18,24 @@ sys.path.insert(0, str(ROOT))
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.agents.base_agent import BaseAgent
+from src.database.curriculum_templates import CURRICULUM_TEMPLATE_COLLECTION, CurriculumTemplateStore, goal_text
 from src.database.mongodb_adapter import LanguageLearningDB
+from src.models.generation_key import normalize_language, normalize_level
+from src.models.schemas import CurriculumPlanSchema
+from src.prompts.templates import CURRICULUM_PERSONALIZATION, CURRICULUM_PLAN
+from src.utils.json_stream import parse_llm_json
+from src.utils.llm import LLM_MAX_CONCURRENCY, llm_semaphore
+from src.utils.metrics import FALLBACK_HITS, record_llm_failure
+from src.utils.tracing import traced_operation
+from src.utils.topic_index import TOPIC_INDEX_ENABLED, TopicIndex
 
 logger = logging.getLogger(__name__)
 
 
+CURRICULUM_TEMPLATES_ENABLED = os.getenv("CURRICULUM_TEMPLATES_ENABLED", "true").lower() == "true"
+CURRICULUM_PERSONALIZE = os.getenv("CURRICULUM_PERSONALIZE", "false").lower() == "true"
+
+
 class CurriculumPlannerAgent(BaseAgent):
     """
     Curriculum Planner Agent
@@ -26,13 +43,40 @@ class CurriculumPlannerAgent(BaseAgent):
     It operates autonomously, using only LLM and MongoDB.
     """
 
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, personalize: bool = CURRICULUM_PERSONALIZE):
         super().__init__()
         self.db = LanguageLearningDB(database_url)
+        self.personalize = personalize
+        self._templates = None
+        self._templates_loaded = False
+        self._lock = threading.Lock()
+        self._background = None
+        self.topic_index = TopicIndex(self.db) if TOPIC_INDEX_ENABLED else None
         logger.info("CurriculumPlannerAgent successfully initialized")
 
+    @property
+    def templates(self) -> Optional[CurriculumTemplateStore]:
+        """Curriculum template store in Chroma (None if disabled or Chroma is unavailable)."""
+        if not self._templates_loaded:
+            with self._lock:
+                if not self._templates_loaded:
+                    if CURRICULUM_TEMPLATES_ENABLED:
+                        try:
+                            from src.database.chroma_db import ChromaVectorDB
+                            collection = ChromaVectorDB().get_collection(CURRICULUM_TEMPLATE_COLLECTION)
+                            self._templates = CurriculumTemplateStore(collection)
+                        except Exception as e:
+                            logger.warning(f"Curriculum templates disabled: {e}")
+                    self._templates_loaded = True
+        return self._templates
+
+    @staticmethod
+    def _cefr_range(profile: Dict) -> Tuple[str, str]:
+        return normalize_level(profile.get("current_level", 1)), normalize_level(profile.get("target_level", 5))
+
     def _get_fallback_curriculum(self, language: str = "English", level_from: str = "A1", level_to: str = "B2") -> Dict:
         """Backup plan in case LLM doesn't respond"""
+        FALLBACK_HITS.labels("CurriculumPlannerAgent", "curriculum").inc()
         topics = [
             ["Greetings", "Introduction"],
             ["Numbers", "Time", "Days of the week"],
@@ -52,6 +96,7 @@ class CurriculumPlannerAgent(BaseAgent):
             "language": language,
             "level_from": level_from,
             "level_to": level_to,
+            "fallback": True,
             "generated_at": datetime.utcnow().isoformat(),
             "topics_by_week": [
                 {"week": i + 1, "topics": topics[i % len(topics)]}
@@ -63,58 +108,118 @@ class CurriculumPlannerAgent(BaseAgent):
     def _generate_curriculum_with_llm(self, profile: Dict, total_weeks: int = 24) -> Dict:
         """Generating the perfect plan for Qwen3-32B"""
         lang = profile.get("target_language", "English")
-        level = profile.get("current_level", 1)
-        target_lvl_int = profile.get("target_level", 5)
-        
-        cefr_scale = ["A1", "A2", "B1", "B2", "C1", "C2"]
-        cefr_current = cefr_scale[min(level - 1, 5)]
-        cefr_target = cefr_scale[min(target_lvl_int - 1, 5)]
+        cefr_current, cefr_target = self._cefr_range(profile)
         
         goals = profile.get("goals", "General English fluency")
 
-        prompt = f"""You are the world's best language curriculum designer.
-
-Student level: {cefr_current}
-Target level: {cefr_target}
-Goal: {goals}
-Language: {lang}
-
-Create a {total_weeks}-week course plan. Write names of topics only in English language. 1-2 topics per week.
-
-ANSWER WITH NOTHING BUT THIS EXACT JSON — NO extra text, NO markdown, NO explanations:
-
-{{
-  "total_weeks": {total_weeks},
-  "language": "{lang}",
-  "level_from": "{cefr_current}",
-  "level_to": "{cefr_target}",
-  "topics_by_week": [
-    {{"week": 1, "topics": ["Greetings & Introductions", "Alphabet & Pronunciation"]}},
-    {{"week": 2, "topics": ["Numbers 1-100", "Telling Time", "Days & Months"]}},
-    {{"week": 3, "topics": ["Family Members", "Possessive Adjectives"]}},
-    {{"week": 4, "topics": ["Daily Routine", "Present Simple"]}},
-    // ... and so on until week {total_weeks}. The above is just an example; you don't have to use these exact topics; use your level and goal as a guide.
-  ]
-}}"""
+        prompt = CURRICULUM_PLAN.render(
+            language=lang, level_from=cefr_current, level_to=cefr_target, goals=goals, total_weeks=total_weeks
+        )
 
         try:
-            response = self.llm.invoke(prompt)
-            text = response.content.strip()
-
-            
-            start = text.find("{")
-            end = text.rfind("}") + 1
-            if start == -1 or end == 0:
-                raise ValueError("No JSON found")
-            json_str = text[start:end]
-            plan = json.loads(json_str)
+            plan = self.call_llm_structured(prompt, CurriculumPlanSchema)
             logger.info("LLM successfully generated the perfect plan!")
             return plan
 
         except Exception as e:
+            record_llm_failure("CurriculumPlannerAgent", e)
             logger.warning(f"LLM did not return valid JSON: {e}. Using fallback.")
             return self._get_fallback_curriculum(language=lang, level_from=cefr_current, level_to=cefr_target)
 
+    def _build_curriculum(self, profile: Dict, total_weeks: int, use_template: bool = True) -> Dict:
+        """Clone a matching template, or generate with the LLM and keep the result as a new template."""
+        lang = profile.get("target_language", "English")
+        cefr_current, cefr_target = self._cefr_range(profile)
+        goals = profile.get("goals", "General English fluency")
+        templates = self.templates if use_template else None
+
+        if templates:
+            template = templates.find(lang, cefr_current, cefr_target, total_weeks, goals)
+            if template:
+                logger.info(f"Curriculum cloned from template {template['template_id']}")
+                template["personalized"] = False
+                return template
+
+        curriculum = self._generate_curriculum_with_llm(profile, total_weeks=total_weeks)
+        if templates and not curriculum.get("fallback"):
+            curriculum["template_id"] = templates.save(lang, cefr_current, cefr_target, total_weeks, goals, curriculum)
+        return curriculum
+
+    def precompute_template(
+        self, language: str, level_from: str, level_to: str, goals: str, total_weeks: int = 24
+    ) -> Optional[str]:
+        """Make sure a template exists for this tuple and goal (LLM call only on a miss). Returns its id."""
+        profile = {
+            "target_language": language,
+            "current_level": level_from,
+            "target_level": level_to,
+            "goals": goals,
+        }
+        return self._build_curriculum(profile, total_weeks=total_weeks).get("template_id")
+
+    def _submit_background(self, fn, *args) -> None:
+        with self._lock:
+            if self._background is None:
+                self._background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="curriculum-background")
+        self._background.submit(fn, *args)
+
+    def _schedule_personalization(self, student_id: str, profile: Dict, curriculum: Dict) -> None:
+        if self.llm is None:
+            return
+        self._submit_background(self._personalize_curriculum, student_id, profile, curriculum)
+
+    def _schedule_topic_index_refresh(self, curricula: List[Dict]) -> None:
+        """Embed the topics of freshly saved plans so align_exercise finds a ready index."""
+        if self.topic_index is None or not curricula:
+            return
+        self._submit_background(self._refresh_topic_index, curricula)
+
+    def _refresh_topic_index(self, curricula: List[Dict]) -> None:
+        if self.topic_index is None:
+            return
+        try:
+            self.topic_index.refresh_many(curricula)
+        except Exception as e:
+            logger.warning(f"Topic index refresh failed: {e}")
+
+    def _personalize_curriculum(self, student_id: str, profile: Dict, curriculum: Dict) -> None:
+        """
+        Adapt a cloned template to the student's goals (background, best effort).
+        Skipped if the student has already started or got a different plan meanwhile.
+        """
+        base_plan = json.dumps(curriculum.get("topics_by_week", []), ensure_ascii=False)
+        prompt = CURRICULUM_PERSONALIZATION.render(
+            total_weeks=curriculum.get("total_weeks", 24),
+            level_from=curriculum.get("level_from"),
+            level_to=curriculum.get("level_to"),
+            base_plan=base_plan,
+            goals=profile.get("goals", "General English fluency"),
+        )
+
+        try:
+            with llm_semaphore:
+                text = self.call_llm(prompt).content.strip()
+            weeks = parse_llm_json(text, agent="CurriculumPlannerAgent", root="[")
+            if len(weeks) != len(curriculum.get("topics_by_week", [])):
+                raise ValueError("week count changed")
+        except Exception as e:
+            record_llm_failure("CurriculumPlannerAgent", e)
+            logger.warning(f"Curriculum personalization failed for {student_id}: {e}")
+            return
+
+        current = self.db.get_curriculum(student_id, language=curriculum.get("language"))
+        if not current or current.get("completed_weeks", 0) or current.get("template_id") != curriculum.get("template_id"):
+            logger.info(f"Curriculum of {student_id} changed meanwhile, personalization discarded")
+            return
+        self.db.save_curriculum(student_id, {
+            "language": curriculum.get("language"),
+            "topics_by_week": weeks,
+            "template_id": curriculum.get("template_id"),
+            "personalized": True,
+        })
+        logger.info(f"Curriculum personalized for {student_id}")
+        self._refresh_topic_index([{"student_id": student_id, "language": curriculum.get("language"), "topics_by_week": weeks}])
+
     def _find_next_week(self, curriculum: Dict) -> Dict:
         """Determines which week is next"""
         completed = curriculum.get("completed_weeks", 0)
@@ -138,14 +243,19 @@ ANSWER WITH NOTHING BUT THIS EXACT JSON — NO extra text, NO markdown, NO expla
     
     
     
+    @traced_operation("plan_curriculum")
     def plan_curriculum(
         self,
         student_id: str,
         total_weeks : int=24,
-        force_regenerate: bool = False
+        force_regenerate: bool = False,
+        use_template: bool = True
     ) -> Dict:
         """
         Creates or updates a syllabus and returns the next topic.
+
+        New plans are cloned from a matching curriculum template when one exists
+        (use_template=False or force_regenerate forces an LLM generation).
         """
         
         profile = self.db.get_student(student_id)
@@ -161,20 +271,26 @@ ANSWER WITH NOTHING BUT THIS EXACT JSON — NO extra text, NO markdown, NO expla
             logger.info(f"The existing plan is used for {student_id} ({target_lang})")
         else:
             logger.info(f"A new curriculum is being generated for {student_id} ({target_lang})")
-            curriculum = self._generate_curriculum_with_llm(profile, total_weeks=total_weeks)
+            curriculum = self._build_curriculum(
+                profile, total_weeks=total_weeks, use_template=use_template and not force_regenerate
+            )
             curriculum["student_id"] = student_id
             curriculum["language"] = target_lang 
             curriculum["completed_weeks"] = 0
             curriculum["created_at"] = datetime.utcnow().isoformat()
 
         
-        next_lesson = self._find_next_week(curriculum)
-
-        
         if not existing or force_regenerate:
             self.db.save_curriculum(student_id, curriculum)
+            self._schedule_topic_index_refresh([curriculum])
+            if self.personalize and curriculum.get("personalized") is False:
+                self._schedule_personalization(student_id, profile, curriculum)
 
         
+        return self._plan_summary(student_id, curriculum, plan_is_new=not bool(existing) or force_regenerate)
+
+    def _plan_summary(self, student_id: str, curriculum: Dict, plan_is_new: bool) -> Dict:
+        next_lesson = self._find_next_week(curriculum)
         return {
             "student_id": student_id,
             "next_week": next_lesson["week"],
@@ -184,7 +300,7 @@ ANSWER WITH NOTHING BUT THIS EXACT JSON — NO extra text, NO markdown, NO expla
             "level_from": curriculum.get("level_from", "A1"),
             "level_to": curriculum.get("level_to", "C1"),
             "message": f"Week {next_lesson['week']}: {', '.join(next_lesson['topics'])}",
-            "plan_is_new": not bool(existing) or force_regenerate,
+            "plan_is_new": plan_is_new,
             "topics_by_week": curriculum.get("topics_by_week", [])
         }
 
@@ -192,3 +308,83 @@ ANSWER WITH NOTHING BUT THIS EXACT JSON — NO extra text, NO markdown, NO expla
     def get_next_topics(self, student_id: str) -> Dict:
         """Quickly get only the next topic (without re-creating the plan)"""
         return self.plan_curriculum(student_id, force_regenerate=False)
+
+    @traced_operation("plan_curricula")
+    def plan_curricula(
+        self,
+        student_ids: List[str],
+        total_weeks: int = 24,
+        force_regenerate: bool = False,
+        use_template: bool = True,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        """
+        Batch version of plan_curriculum for a cohort (e.g. term-start onboarding).
+
+        Profiles and existing curricula are loaded with one query each. Students
+        with identical planning inputs (language, CEFR range, total_weeks, goals)
+        share one plan; distinct plans are built concurrently (template clone or
+        LLM) and all new curricula are upserted with a single bulk_write.
+        """
+        start_time = time.perf_counter()
+        profiles = {p["_id"]: p for p in self.db.get_students(student_ids)}
+        existing = self.db.get_curricula(list(profiles))
+        missing = [sid for sid in student_ids if sid not in profiles]
+
+        results: Dict[str, Dict] = {}
+        groups: Dict[Tuple, List[str]] = {}
+        for sid, profile in profiles.items():
+            language = profile.get("target_language", "English")
+            current = existing.get((sid, language))
+            if current and not force_regenerate:
+                results[sid] = self._plan_summary(sid, current, plan_is_new=False)
+                continue
+            cefr_current, cefr_target = self._cefr_range(profile)
+            key = (normalize_language(language), cefr_current, cefr_target, total_weeks,
+                   goal_text(profile.get("goals", "General English fluency")))
+            groups.setdefault(key, []).append(sid)
+
+        logger.info(
+            f"Batch planning: {len(profiles)} students, {len(results)} existing plans kept, "
+            f"{len(groups)} distinct plans to build"
+        )
+
+        def build(key):
+            profile = profiles[groups[key][0]]
+            with llm_semaphore:
+                return key, self._build_curriculum(
+                    profile, total_weeks=total_weeks, use_template=use_template and not force_regenerate
+                )
+
+        new_curricula = []
+        created_at = datetime.utcnow().isoformat()
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            for key, plan in executor.map(build, list(groups)):
+                for sid in groups[key]:
+                    curriculum = json.loads(json.dumps(plan))
+                    curriculum["student_id"] = sid
+                    curriculum["language"] = profiles[sid].get("target_language", "English")
+                    curriculum["completed_weeks"] = 0
+                    curriculum["created_at"] = created_at
+                    new_curricula.append(curriculum)
+                    results[sid] = self._plan_summary(sid, curriculum, plan_is_new=True)
+
+        saved = self.db.save_curricula(new_curricula)
+        self._schedule_topic_index_refresh(new_curricula)
+
+        if self.personalize:
+            for curriculum in new_curricula:
+                if curriculum.get("personalized") is False:
+                    self._schedule_personalization(curriculum["student_id"], profiles[curriculum["student_id"]], curriculum)
+
+        return {
+            "students": len(profiles),
+            "missing_students": missing,
+            "kept_existing": len(profiles) - len(new_curricula),
+            "planned": len(new_curricula),
+            "distinct_plans": len(groups),
+            "fallback_plans": sum(1 for c in new_curricula if c.get("fallback")),
+            "saved": saved,
+            "duration_s": round(time.perf_counter() - start_time, 3),
+            "curricula": results,
+        }
@@ -9,12 +9,15 @@ Provides utilities for:
 - Vocabulary search
 """
 
-import json
 import logging
 import asyncio
 from typing import List, Dict, Optional, Union
 
+from src.agents.tool_selection import select_tools
 from src.models.schemas import ExerciseSchema, DialogueSchema
+from src.prompts.templates import DIALOGUE, GRAMMAR_EXPLANATION, TOOL_EXERCISE
+from src.utils.structured_output import invoke_structured
+from src.utils.metrics import LLM_REQUEST_DURATION, observe, record_llm_failure, record_llm_usage
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +33,12 @@ class LanguageTools:
         self.llm = llm
         logger.info("LanguageTools initialized")
 
-    def select_tools_dynamically(self, level, topic, student_errors=None, lesson_phase="practice"):
-        
-        
-        
-        pass 
+    def select_tools_dynamically(self, level, topic, student_errors=None, lesson_phase="practice") -> List[str]:
+        """
+        Pick the lesson tools for the student's level band, the lesson phase, their
+        dominant error types and the topic category (precomputed table, no LLM).
+        """
+        return select_tools(level, topic, student_errors=student_errors, lesson_phase=lesson_phase)
 
     async def generate_exercise(
         self,
@@ -49,43 +53,12 @@ class LanguageTools:
         try:
             import uuid
             
-            prompt = f"""
-Create practice exercise.
-Topic: {topic}, Type: {exercise_type}, Level: {level}
-
-Return JSON (ExerciseSchema):
-{{
-  "exercise_id": "string",
-  "type": "{exercise_type}",
-  "topic": "string",
-  "task": "string",
-  "question": "string",
-  "options": ["string"] (optional),
-  "correct_answer": "string",
-  "explanation": "string",
-  "difficulty": {level}
-}}
-"""
-            
-            
-            response = self.llm.invoke(prompt)
-            content = response.content
-            
-            
-            data = self._parse_json(content)
-            
-            if count > 1:
-                
-                
-                
-                
-                validated = ExerciseSchema(**data).model_dump()
-                return [validated] 
-            else:
-                validated = ExerciseSchema(**data).model_dump()
-                return validated
+            prompt = TOOL_EXERCISE.render(exercise_type=exercise_type, level=level, topic=topic)
+            validated = invoke_structured(self.llm, prompt, ExerciseSchema, "LanguageTools")
+            return [validated] if count > 1 else validated
         
         except Exception as exc:
+            record_llm_failure("LanguageTools", exc)
             logger.error(f"Error generating exercise: {exc}")
             return {"error": str(exc)}
 
@@ -99,44 +72,21 @@ Return JSON (ExerciseSchema):
         Generate a dialogue for practice.
         """
         try:
-            prompt = f"""
-Generate dialogue.
-Topic: {topic}, Situation: {situation}, Level: {level}
-
-Return JSON (DialogueSchema):
-{{
-  "dialogue_id": "string",
-  "topic": "string",
-  "situation": "string",
-  "level": {level},
-  "lines": [{{"speaker": "A", "text": "...", "translation": "..."}}],
-  "key_phrases": ["..."],
-  "cultural_notes": "..."
-}}
-"""
-            response = self.llm.invoke(prompt)
-            data = self._parse_json(response.content)
-            
-            validated = DialogueSchema(**data).model_dump()
+            prompt = DIALOGUE.render(level=level, topic=topic, situation=situation)
+            validated = invoke_structured(self.llm, prompt, DialogueSchema, "LanguageTools")
             logger.info(f"Generated dialogue for topic '{topic}'")
             return validated
 
         except Exception as exc:
+            record_llm_failure("LanguageTools", exc)
             logger.error(f"Error generating dialogue: {exc}")
             return {"error": str(exc)}
 
-    def _parse_json(self, text: str) -> Dict:
-        clean_res = text.strip()
-        if "```json" in clean_res:
-             clean_res = clean_res.split("```json")[1].split("```")[0].strip()
-        elif "```" in clean_res:
-             clean_res = clean_res.split("```json")[1].split("```")[0].strip()
-        
-        start = clean_res.find("{")
-        end = clean_res.rfind("}") + 1
-        if start != -1 and end != 0:
-             clean_res = clean_res[start:end]
-        return json.loads(clean_res)
+    def _invoke(self, prompt):
+        with observe(LLM_REQUEST_DURATION, "LanguageTools", "invoke"):
+            response = self.llm.invoke(prompt)
+        record_llm_usage("LanguageTools", response)
+        return response
 
     def explain_grammar(
         self,
@@ -156,17 +106,9 @@ Return JSON (DialogueSchema):
         try:
             examples_text = "\n".join(examples) if examples else "No examples provided"
 
-            prompt = f"""
-            Explain the following grammar rule in simple terms:
-            
-            Rule: {rule}
-            Examples: {examples_text}
-            
-            Provide a clear, beginner-friendly explanation with examples.
-            Keep it concise (3-4 sentences max).
-            """
+            prompt = GRAMMAR_EXPLANATION.render(rule=rule, examples=examples_text)
 
-            response = self.llm.invoke(prompt)
+            response = self._invoke(prompt)
             logger.info(f"Generated grammar explanation for rule: {rule}")
             return response.content
 
@@ -8,7 +8,6 @@ Uses:
 - LangGraph for multi-step workflow
 """
 
-import json
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
@@ -20,6 +19,12 @@ from src.agents.base_agent import BaseAgent
 from src.agents.language_tools import LanguageTools
 from src.database.mongodb_adapter import LanguageLearningDB
 from src.database.chroma_db import ChromaVectorDB
+from src.utils.metrics import FALLBACK_HITS, JSON_PARSE_FAILURES, record_llm_failure
+from src.prompts.templates import LESSON_PLAN
+from src.utils.error_summary import ErrorProfile
+from src.utils.json_stream import parse_llm_json
+from src.utils.spaced_repetition import ReviewScheduler
+from src.utils.tracing import traced_node, traced_operation
 
 logger = logging.getLogger(__name__)
 
@@ -44,19 +49,20 @@ class LanguageTutorAgent(BaseAgent):
         
         
         database_url: str = "mongodb://localhost:27017",
-        vector_path: str = "./chroma_data"
+        vector_path: Optional[str] = None
     ):
         """
         Initialize Tutor Agent.
 
         Args:
             database_url: MongoDB connection string
-            vector_path: Path to Chroma persistent directory
+            vector_path: Path to Chroma persistent directory (defaults to $CHROMA_PERSIST_DIR)
         """
         super().__init__()
 
         self.db = LanguageLearningDB(database_url)
         self.vector_store = ChromaVectorDB(vector_path)
+        self.review_scheduler = ReviewScheduler(self.db)
         self.tools = LanguageTools(self.llm)
         self.graph = self._build_graph()
 
@@ -68,13 +74,17 @@ class LanguageTutorAgent(BaseAgent):
         """
         graph = StateGraph(dict)
 
-        graph.add_node("analyze_student", self._analyze_student)
-        graph.add_node("retrieve_context", self._retrieve_context)
-        graph.add_node("check_review_needs", self._check_review_needs)
-        graph.add_node("select_tools", self._select_tools)
-        graph.add_node("plan_lesson", self._plan_lesson)
-        graph.add_node("generate_content", self._generate_content)
-        graph.add_node("save_lesson", self._save_lesson)
+        nodes = {
+            "analyze_student": self._analyze_student,
+            "retrieve_context": self._retrieve_context,
+            "check_review_needs": self._check_review_needs,
+            "select_tools": self._select_tools,
+            "plan_lesson": self._plan_lesson,
+            "generate_content": self._generate_content,
+            "save_lesson": self._save_lesson,
+        }
+        for name, fn in nodes.items():
+            graph.add_node(name, traced_node("LanguageTutorAgent", name, fn))
 
         graph.add_edge(START, "analyze_student")
         graph.add_edge("analyze_student", "retrieve_context")
@@ -102,17 +112,10 @@ class LanguageTutorAgent(BaseAgent):
 
             state["student_profile"] = profile
 
-            vocabulary = self.db.get_student_vocabulary(
-                student_id=student_id,
-                limit=5,
-            )
+            vocabulary = self.review_scheduler.for_lesson(student_id, limit=5)
             state["personal_vocabulary"] = vocabulary
 
-            errors = self.db.get_student_errors(
-                student_id=student_id,
-                limit=5,
-            )
-            state["errors_history"] = errors
+            state["error_summary"] = self.db.get_error_summary(student_id) or {}
 
             logger.info(
                 f"Student analyzed: {profile.get('name')} (level {profile.get('current_level')})"
@@ -164,13 +167,13 @@ class LanguageTutorAgent(BaseAgent):
         Phase 3: Decide if the lesson should focus on review.
         """
         try:
-            errors = state.get("errors_history", [])
+            errors = ErrorProfile(state.get("error_summary"))
 
-            if errors:
+            if errors.needs_review():
                 state["phase"] = "review"
-                state["review_topics"] = errors[:3]
+                state["review_topics"] = errors.top_topics(3)
                 logger.info(
-                    f"Review phase enabled (found {len(errors)} recent errors)"
+                    f"Review phase enabled (recent error weight {errors.recent_weight:.2f})"
                 )
             else:
                 state["phase"] = "new_content"
@@ -189,14 +192,14 @@ class LanguageTutorAgent(BaseAgent):
         """
         try:
             profile = state.get("student_profile", {})
-            errors = state.get("errors_history", [])
+            errors = ErrorProfile(state.get("error_summary"))
             phase = state.get("phase", "practice")
             topic = state.get("topic")
 
             selected_tools = self.tools.select_tools_dynamically(
                 level=profile.get("current_level", 3),
                 topic=topic,
-                student_errors=[e.get("error_type") for e in errors],
+                student_errors=errors.top_types(),
                 lesson_phase=phase,
             )
 
@@ -206,6 +209,7 @@ class LanguageTutorAgent(BaseAgent):
             state["step"] = "tools_selected"
 
         except Exception as exc:
+            FALLBACK_HITS.labels("LanguageTutorAgent", "tools").inc()
             logger.error(f"Error selecting tools: {exc}")
             state["selected_tools"] = ["vocabulary_search", "generate_exercise"]
 
@@ -221,42 +225,23 @@ class LanguageTutorAgent(BaseAgent):
             phase = state.get("phase", "practice")
             topic = state.get("topic")
 
-            prompt = f"""
-            You are an expert language teacher.
-
-            Student profile:
-            - Name: {profile.get('name')}
-            - Level: {profile.get('current_level')}/5
-            - Target language: {profile.get('target_language')}
-            - Learning style: {profile.get('learning_style')}
-
-            Lesson request:
-            - Topic: {topic}
-            - Phase: {phase}
-            - Available tools: {', '.join(selected_tools)}
-
-            Design a lesson with four parts:
-            1. Warmup (5 minutes)
-            2. New content or review (15 minutes)
-            3. Practice exercises (20 minutes)
-            4. Consolidation and summary (10 minutes)
-
-            Return response in JSON:
-            {{
-              "outline": ["Warmup: ...", "New content: ...", "Practice: ...", "Review: ..."],
-              "estimated_total_minutes": 50
-            }}
-            """
-
-            response = self.llm.invoke(prompt)
-            content = response.content
-
-            start = content.find("{")
-            end = content.rfind("}") + 1
-
-            if start >= 0 and end > start:
-                lesson_plan = json.loads(content[start:end])
-            else:
+            prompt = LESSON_PLAN.render(
+                target_language=profile.get("target_language"),
+                level=profile.get("current_level"),
+                learning_style=profile.get("learning_style"),
+                phase=phase,
+                tools=", ".join(selected_tools),
+                topic=topic,
+                name=profile.get("name"),
+            )
+
+            response = self.call_llm(prompt)
+
+            try:
+                lesson_plan = parse_llm_json(response.content, agent="LanguageTutorAgent")
+            except ValueError as exc:
+                JSON_PARSE_FAILURES.labels("LanguageTutorAgent").inc()
+                logger.warning(f"Lesson plan is not JSON ({exc}), using the default outline")
                 lesson_plan = {
                     "outline": [
                         "Warmup",
@@ -279,6 +264,7 @@ class LanguageTutorAgent(BaseAgent):
             state["step"] = "lesson_planned"
 
         except Exception as exc:
+            record_llm_failure("LanguageTutorAgent", exc)
             logger.error(f"Error planning lesson: {exc}")
             state["lesson_plan"] = {}
 
@@ -395,6 +381,7 @@ class LanguageTutorAgent(BaseAgent):
             return f" Tutor error: {str(e)}"
 
 
+    @traced_operation("teach")
     def teach(
         self,
         student_id: str,
@@ -419,7 +406,7 @@ class LanguageTutorAgent(BaseAgent):
             "difficulty_level": 3,
             "student_profile": {},
             "personal_vocabulary": [],
-            "errors_history": [],
+            "error_summary": {},
             "current_content": [],
             "review_materials": [],
             "lesson_plan": {},
@@ -6,6 +6,9 @@ from openai import OpenAI
 
 from src.agents.base_agent import BaseAgent
 from src.database.chroma_db import ChromaVectorDB
+from src.prompts.templates import RESEARCH_SYNTHESIS
+from src.utils.metrics import DB_OPERATION_DURATION, observe
+from src.utils.tracing import traced_node, traced_operation
 
 logger = logging.getLogger(__name__)
 
@@ -28,17 +31,14 @@ class ResearchAgent(BaseAgent):
         
         self.db = ChromaVectorDB()
         
-        self.client = OpenAI(
-            api_key=os.environ.get("LITELLM_API_KEY", "sk-mock-key"),
-            base_url=os.environ.get("LITELLM_BASE_URL"),
-        )
+        self._client = None
         self.model_name = os.environ.get("MODEL_NAME", "qwen3-32b")
 
         
         graph = StateGraph(dict)
-        graph.add_node("reformat", self.reformat_query)
-        graph.add_node("retrieval", self.retrieve_from_db)
-        graph.add_node("synthesis", self.synthesize_output)
+        graph.add_node("reformat", traced_node("ResearchAgent", "reformat", self.reformat_query))
+        graph.add_node("retrieval", traced_node("ResearchAgent", "retrieval", self.retrieve_from_db))
+        graph.add_node("synthesis", traced_node("ResearchAgent", "synthesis", self.synthesize_output))
 
         graph.add_edge(START, "reformat")
         graph.add_edge("reformat", "retrieval")
@@ -47,6 +47,15 @@ class ResearchAgent(BaseAgent):
 
         self.app = graph.compile()
 
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            self._client = OpenAI(
+                api_key=os.environ.get("LITELLM_API_KEY", "sk-mock-key"),
+                base_url=os.environ.get("LITELLM_BASE_URL"),
+            )
+        return self._client
+
     def reformat_query(self, state: dict) -> dict:
         
         
@@ -60,10 +69,11 @@ class ResearchAgent(BaseAgent):
 
         try:
             
-            results = self.db.textbooks.query(
-                query_texts=[query],
-                n_results=5,
-            )
+            with observe(DB_OPERATION_DURATION, "chroma", "textbooks.query"):
+                results = self.db.textbooks.query(
+                    query_texts=[query],
+                    n_results=5,
+                )
             
             if results and results["documents"] and results["documents"][0]:
                 text_results = "\n\n".join(results["documents"][0])
@@ -82,33 +92,13 @@ class ResearchAgent(BaseAgent):
     def synthesize_output(self, state: dict) -> dict:
         retrieved = state["db_results"]
 
-        prompt = (
-            "You are an educational content generator.",
-            f"User level: {state['level']}\n",
-            f"Language: {state['language']}\n",
-            f"Topic: {state['topic']}\n",
-            "Use the retrieved textbook material below to write **a coherent theoretical lesson**.",
-            "If the retrieved material is relevant, base your explanation strictly on it.",
-            "If it is not relevant, rely on your general knowledge but mention that no textbook source was found.\n",
-            "--- Retrieved Textbook Content ---\n",
-            f"{retrieved}\n",
-            "-------------------------\n\n",
-            "Return a markdown response with:\n",
-            "- Title\n",
-            "- Clear Explanation\n",
-            "- Examples\n",
-            "- Key Takeaways\n",
+        prompt = RESEARCH_SYNTHESIS.render(
+            language=state["language"], level=state["level"], topic=state["topic"], retrieved=retrieved
         )
-        
-        
-        
-        
-        
-        
-        
         state["final_text"] = self.invoke_llm(prompt).strip()
         return state
 
+    @traced_operation("run")
     def run(self, language: str, topic: str, level: str) -> str:
         initial = {
             "language": language,
@@ -1,9 +1,15 @@
 import logging
-import json
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
+
+from langchain_core.messages import BaseMessage
 
 from src.agents.base_agent import BaseAgent
+from src.models.schemas import TheorySchema
+from src.prompts.templates import THEORY_LESSON
+from src.utils.json_stream import JsonObjectParser, JsonStringFieldStreamer
+from src.utils.metrics import FALLBACK_HITS, record_llm_failure
+from src.utils.tracing import traced_operation
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +29,7 @@ class TheoryAgent(BaseAgent):
             from src.database.chroma_db import ChromaVectorDB
             
             self.research_agent = ResearchAgent()
-            self.db = ChromaVectorDB(persist_dir="./chroma_data") 
+            self.db = ChromaVectorDB()
             
             logger.info("ResearchAgent and ChromaDB linked to TheoryAgent.")
         except Exception as e:
@@ -32,21 +38,12 @@ class TheoryAgent(BaseAgent):
 
         logger.info("TheoryAgent initialized")
 
+    @traced_operation("generate_theory")
     def generate_theory(self, topic: str, week: int, level: str, language: str) -> Dict[str, Any]:
         """
         Generates a markdown-formatted theory lesson.
         """
-        research_material = ""
-        
-        
-        if self.research_agent:
-            try:
-                logger.info(f"Researching topic: {topic}")
-                research_material = self.research_agent.run(language=language, topic=topic, level=str(level))
-                logger.info("Research completed successfully.")
-            except Exception as e:
-                logger.error(f"ResearchAgent failed during run: {e}")
-                research_material = ""
+        research_material = self._research(topic, level, language)
 
         
         if self.llm is None:
@@ -56,6 +53,65 @@ class TheoryAgent(BaseAgent):
             
             return self._fallback_generation(topic, week, level, language, "No LLM available")
 
+        prompt = self._build_prompt(topic, week, level, language, research_material)
+        try:
+            lesson = self.call_llm_structured(prompt, TheorySchema)
+            return self._save(lesson, topic, level, language)
+
+        except Exception as e:
+            record_llm_failure("TheoryAgent", e)
+            logger.error(f"Error generating theory with LLM: {e}")
+            return self._fallback_generation(topic, week, level, language, str(e))
+
+    def stream_theory(self, topic: str, week: int, level: str, language: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_theory.
+
+        Yields {"event": "token", "data": str} with pieces of the lesson "content"
+        as the LLM produces them, then a final {"event": "done", "data": lesson}
+        with the fully parsed lesson (or the fallback result).
+        """
+        research_material = self._research(topic, level, language)
+
+        if self.llm is None:
+            logger.warning("No LLM, forcing fallback.")
+            yield {"event": "done", "data": self._fallback_generation(topic, week, level, language, "No LLM available")}
+            return
+
+        prompt = self._build_prompt(topic, week, level, language, research_material)
+        streamer = JsonStringFieldStreamer("content")
+        parser = JsonObjectParser(TheorySchema, agent="TheoryAgent")
+        try:
+            for token in self.stream_llm(prompt, TheorySchema):
+                piece = streamer.feed(token)
+                if piece:
+                    yield {"event": "token", "data": piece}
+                # The lesson is complete once its object closes; skip any trailing remarks
+                if parser.feed(token):
+                    break
+
+            result = self._save(parser.finish(), topic, level, language)
+
+        except Exception as e:
+            record_llm_failure("TheoryAgent", e)
+            logger.error(f"Error streaming theory with LLM: {e}")
+            result = self._fallback_generation(topic, week, level, language, str(e))
+
+        yield {"event": "done", "data": result}
+
+    def _research(self, topic: str, level: str, language: str) -> str:
+        if not self.research_agent:
+            return ""
+        try:
+            logger.info(f"Researching topic: {topic}")
+            research_material = self.research_agent.run(language=language, topic=topic, level=str(level))
+            logger.info("Research completed successfully.")
+            return research_material
+        except Exception as e:
+            logger.error(f"ResearchAgent failed during run: {e}")
+            return ""
+
+    def _build_prompt(self, topic: str, week: int, level: str, language: str, research_material: str) -> List[BaseMessage]:
         context_block = ""
         if research_material:
             context_block = f"""
@@ -64,63 +120,13 @@ Additional Research Material (Use this to enrich the lesson):
 {research_material}
 ---
 """
+        return THEORY_LESSON.render(language=language, level=level, week=week, topic=topic, research_material=context_block)
 
-        prompt = f"""
-You are an expert language teacher specializing in creating clear, engaging educational content.
-
-Task: Create a theoretical lesson for a student interacting with a language learning app.
-
-Context:
-- Target Language: {language}
-- Student Level: {level} (CEFR)
-- Current Week: {week}
-- Main Topic: {topic}
-{context_block}
-
-Requirements:
-1. **Title**: Catchy and relevant.
-2. **Content**: 
-   - Use Markdown formatting.
-   - Explain the concept clearly (grammar, vocabulary, or culture).
-   - Provide examples in {language}. {'If ' + language + ' != "English", provide English translations.' if language != "English" else 'Do NOT provide translations if teaching English.'}
-   - Keep it concise but comprehensive enough for {level} level.
-   - If research material is provided, strictly use it to verify facts or provide examples, but structure it as a clean lesson.
-3. **Key Takeaways**: A list of 2-4 crucial points to remember.
-
-Return strictly valid JSON in this format:
-{{
-  "type": "theory",
-  "title": "Lesson Title",
-  "topic": "{topic}",
-  "content": "Markdown string here...",
-  "key_points": ["Point 1", "Point 2", "Point 3"]
-}}
-"""
-        try:
-            response = self.llm.invoke(prompt).content
-            clean_res = response.strip()
-            
-            if "```json" in clean_res:
-                clean_res = clean_res.split("```json")[1].split("```")[0].strip()
-            elif "```" in clean_res:
-                clean_res = clean_res.split("```")[1].split("```")[0].strip()
-            
-            start = clean_res.find("{")
-            end = clean_res.rfind("}") + 1
-            if start != -1 and end != 0:
-                clean_res = clean_res[start:end]
-            
-            result_json = json.loads(clean_res)
-            
-            
-            if self.db and "content" in result_json:
-                self._auto_save_to_db(result_json, topic, level, language)
-            
-            return result_json
-
-        except Exception as e:
-            logger.error(f"Error generating theory with LLM: {e}")
-            return self._fallback_generation(topic, week, level, language, str(e))
+    def _save(self, result_json: Dict[str, Any], topic: str, level: str, language: str) -> Dict[str, Any]:
+        if self.db and "content" in result_json:
+            self._auto_save_to_db(result_json, topic, level, language)
+        
+        return result_json
 
     def _auto_save_to_db(self, result_json, topic, level, language):
         import uuid
@@ -134,7 +140,8 @@ Return strictly valid JSON in this format:
                     "level": level,
                     "language": language,
                     "type": "generated_theory",
-                    "source": "TheoryAgent"
+                    "source": "TheoryAgent",
+                    "prompt": THEORY_LESSON.id,
                 }
             )
             logger.info(f"Auto-saved generated theory to ChromaDB: {doc_id}")
@@ -148,6 +155,7 @@ Return strictly valid JSON in this format:
         2. Return error if all fail.
         """
         logger.info(f"Initiating fallback for topic: {topic}. Error was: {error_msg}")
+        FALLBACK_HITS.labels("TheoryAgent", "theory").inc()
         
         
         if self.db:
@@ -170,7 +178,8 @@ Return strictly valid JSON in this format:
                         "title": f"Lesson: {topic} ({source})",
                         "topic": topic,
                         "content": content,
-                        "key_points": ["Content retrieved from backup storage."]
+                        "key_points": ["Content retrieved from backup storage."],
+                        "fallback": True
                     }
             except Exception as db_err:
                 logger.error(f"Database/Fallback search failed: {db_err}")
@@ -0,0 +1,123 @@
+"""
+Deterministic lesson tool selection.
+
+Tools are bits of a mask. The selection for every combination of
+(level band, lesson phase, dominant error types, topic category) is
+precomputed at import into TOOL_TABLE, so selecting tools is input
+classification (memoized) plus one dict lookup:
+
+    mask = PHASE_TOOLS[band, phase] | TOPIC_TOOLS[category] | ERROR_TOOLS of the dominant errors
+"""
+
+from collections import Counter
+from functools import lru_cache
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.models.generation_key import normalize_level
+
+VOCABULARY_SEARCH = 1
+GENERATE_EXERCISE = 2
+DIALOGUE_GENERATION = 4
+GRAMMAR_EXPLANATION = 8
+
+TOOL_NAMES = (
+    (VOCABULARY_SEARCH, "vocabulary_search"),
+    (GENERATE_EXERCISE, "generate_exercise"),
+    (DIALOGUE_GENERATION, "dialogue_generation"),
+    (GRAMMAR_EXPLANATION, "grammar_explanation"),
+)
+
+LEVEL_BANDS = {"A1": "beginner", "A2": "beginner", "B1": "intermediate", "B2": "intermediate", "C1": "advanced", "C2": "advanced"}
+PHASES = ("new_content", "practice", "review")
+
+PHASE_TOOLS = {
+    ("beginner", "new_content"): VOCABULARY_SEARCH | GRAMMAR_EXPLANATION | GENERATE_EXERCISE,
+    ("beginner", "practice"): VOCABULARY_SEARCH | GENERATE_EXERCISE,
+    ("beginner", "review"): VOCABULARY_SEARCH | GENERATE_EXERCISE,
+    ("intermediate", "new_content"): GRAMMAR_EXPLANATION | GENERATE_EXERCISE | DIALOGUE_GENERATION,
+    ("intermediate", "practice"): GENERATE_EXERCISE | DIALOGUE_GENERATION,
+    ("intermediate", "review"): GENERATE_EXERCISE,
+    ("advanced", "new_content"): GENERATE_EXERCISE | DIALOGUE_GENERATION,
+    ("advanced", "practice"): DIALOGUE_GENERATION | GENERATE_EXERCISE,
+    ("advanced", "review"): GENERATE_EXERCISE | DIALOGUE_GENERATION,
+}
+
+# Error type -> bit of the error mask, and the tools that remediate it
+ERROR_BITS = {"grammar": 1, "vocabulary": 2, "spelling": 4, "pronunciation": 8}
+ERROR_TOOLS = {
+    "grammar": GRAMMAR_EXPLANATION | GENERATE_EXERCISE,
+    "vocabulary": VOCABULARY_SEARCH | GENERATE_EXERCISE,
+    "spelling": VOCABULARY_SEARCH,
+    "pronunciation": DIALOGUE_GENERATION,
+}
+MAX_DOMINANT_ERRORS = 2
+
+TOPIC_CATEGORIES = {
+    "grammar": (
+        "grammar", "tense", "verb", "article", "pronoun", "preposition", "conditional", "passive",
+        "modal", "plural", "adjective", "adverb", "comparative", "clause", "question form", "negation",
+    ),
+    "conversation": (
+        "conversation", "dialogue", "speaking", "greeting", "introduction", "small talk", "restaurant",
+        "shopping", "travel", "interview", "meeting", "phone", "directions", "role play",
+    ),
+    "vocabulary": ("vocabulary", "words", "food", "family", "weather", "clothes", "body", "colors", "numbers", "animals"),
+}
+TOPIC_TOOLS = {
+    "grammar": GRAMMAR_EXPLANATION,
+    "conversation": DIALOGUE_GENERATION,
+    "vocabulary": VOCABULARY_SEARCH,
+    "general": 0,
+}
+
+
+def _names(mask: int) -> Tuple[str, ...]:
+    return tuple(name for bit, name in TOOL_NAMES if mask & bit)
+
+
+def _build_table() -> Dict[Tuple[str, str, int, str], Tuple[str, ...]]:
+    table = {}
+    bands = sorted(set(LEVEL_BANDS.values()))
+    for band, phase, errors, category in product(bands, PHASES, range(1 << len(ERROR_BITS)), TOPIC_TOOLS):
+        mask = PHASE_TOOLS[band, phase] | TOPIC_TOOLS[category]
+        for error_type, bit in ERROR_BITS.items():
+            if errors & bit:
+                mask |= ERROR_TOOLS[error_type]
+        table[band, phase, errors, category] = _names(mask)
+    return table
+
+
+TOOL_TABLE = _build_table()
+
+
+@lru_cache(maxsize=64)
+def level_band(level) -> str:
+    return LEVEL_BANDS.get(normalize_level(level), "intermediate")
+
+
+@lru_cache(maxsize=4096)
+def topic_category(topic: Optional[str]) -> str:
+    text = (topic or "").casefold()
+    for category, keywords in TOPIC_CATEGORIES.items():
+        if any(keyword in text for keyword in keywords):
+            return category
+    return "general"
+
+
+@lru_cache(maxsize=4096)
+def error_mask(student_errors: Tuple[str, ...]) -> int:
+    """Bits of the dominant (most frequent, then first listed) error types."""
+    errors = [e for e in student_errors if e in ERROR_BITS]
+    if len(set(errors)) > MAX_DOMINANT_ERRORS:
+        errors = [e for e, _ in Counter(errors).most_common(MAX_DOMINANT_ERRORS)]
+    mask = 0
+    for e in errors:
+        mask |= ERROR_BITS[e]
+    return mask
+
+
+def select_tools(level, topic: Optional[str], student_errors: Optional[Iterable[str]] = None, lesson_phase: str = "practice") -> List[str]:
+    phase = lesson_phase if lesson_phase in PHASES else "practice"
+    errors = error_mask(tuple(student_errors)) if student_errors else 0
+    return list(TOOL_TABLE[level_band(level), phase, errors, topic_category(topic)])
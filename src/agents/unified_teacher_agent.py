@@ -1,10 +1,28 @@
 import logging
 import json
-from typing import List, Dict, Any, Optional, Union
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.messages import BaseMessage
 
 from src.agents.base_agent import BaseAgent
 from src.agents.theory_agent import TheoryAgent
 from src.database.mongodb_adapter import LanguageLearningDB
+from src.models.generation_key import GenerationKey
+from src.prompts.templates import CHAT_EVALUATION, CURRICULUM_ALIGNMENT, PRACTICE_EXERCISE
+from src.utils.llm import LLM_MAX_CONCURRENCY, llm_semaphore
+from src.utils.embeddings import embed_texts
+from src.utils.error_summary import DEFAULT_ERROR_TYPE
+from src.utils.json_stream import parse_llm_json
+from src.utils.metrics import record_cache, record_llm_failure
+from src.utils.tracing import traced_operation
+from src.utils.semantic_cache import SEMANTIC_CACHE_COLLECTION, SEMANTIC_CACHE_ENABLED, SemanticCache
+from src.utils.topic_index import TOPIC_INDEX_ENABLED, TopicIndex, curriculum_fingerprint, exercise_text, match_weeks
 from src.models.schemas import (
     AlignmentResponse, 
     ChatEvaluationResponse, 
@@ -14,10 +32,23 @@ from src.models.schemas import (
 
 logger = logging.getLogger(__name__)
 
+
+# Max new chat pairs per evaluation, weight cap of the previous aggregate, errors kept in it
+CHAT_EVAL_BATCH = int(os.getenv("CHAT_EVAL_BATCH", "20"))
+CHAT_EVAL_WINDOW = int(os.getenv("CHAT_EVAL_WINDOW", "50"))
+CHAT_EVAL_MAX_ERRORS = int(os.getenv("CHAT_EVAL_MAX_ERRORS", "30"))
+
+# Embedding alignment is trusted when the best week beats the runner-up by this margin
+ALIGN_MIN_MARGIN = float(os.getenv("ALIGN_MIN_MARGIN", "0.05"))
+ALIGN_MIN_SIMILARITY = float(os.getenv("ALIGN_MIN_SIMILARITY", "0.35"))
+# Bulk alignment: exercises per embedding call, cap on LLM adjudications per request
+ALIGN_EMBED_BATCH = int(os.getenv("ALIGN_EMBED_BATCH", "256"))
+ALIGN_MAX_ADJUDICATIONS = int(os.getenv("ALIGN_MAX_ADJUDICATIONS", "200"))
+
 class UnifiedTeacherAgent(BaseAgent):
     """
     Unified Teacher Agent that handles:
-    1. Exercise Alignment (align_exercise).
+    1. Exercise Alignment (align_exercise, align_exercises_bulk).
     2. Chat Evaluation (evaluate_chat).
     3. Content Generation (generate_content).
     """
@@ -25,18 +56,47 @@ class UnifiedTeacherAgent(BaseAgent):
     def __init__(self, database_url: str = "mongodb://localhost:27017"):
         super().__init__()
         self.db = LanguageLearningDB(database_url)
-        try:
-             self.theory_agent = TheoryAgent()
-             logger.info("TheoryAgent initialized within UnifiedTeacherAgent")
-        except Exception as e:
-             logger.error(f"Failed to initialize TheoryAgent: {e}")
-             self.theory_agent = None
+        self._theory_agent = None
+        self._theory_agent_lock = threading.Lock()
+        self._semantic_cache = None
+        self._semantic_cache_loaded = False
+        self.topic_index = TopicIndex(self.db)
 
         logger.info("UnifiedTeacherAgent initialized")
 
+    @property
+    def theory_agent(self) -> Optional[TheoryAgent]:
+        """TheoryAgent (with its ResearchAgent and Chroma stores), built on first use."""
+        if self._theory_agent is None:
+            with self._theory_agent_lock:
+                if self._theory_agent is None:
+                    try:
+                        self._theory_agent = TheoryAgent()
+                        logger.info("TheoryAgent initialized within UnifiedTeacherAgent")
+                    except Exception as e:
+                        logger.error(f"Failed to initialize TheoryAgent: {e}")
+        return self._theory_agent
+
+    @property
+    def semantic_cache(self) -> Optional[SemanticCache]:
+        """Generation cache in Chroma (None if disabled or Chroma is unavailable)."""
+        if not self._semantic_cache_loaded:
+            with self._theory_agent_lock:
+                if not self._semantic_cache_loaded:
+                    if SEMANTIC_CACHE_ENABLED:
+                        try:
+                            from src.database.chroma_db import ChromaVectorDB
+                            collection = ChromaVectorDB().get_collection(SEMANTIC_CACHE_COLLECTION)
+                            self._semantic_cache = SemanticCache(collection)
+                        except Exception as e:
+                            logger.warning(f"Semantic cache disabled: {e}")
+                    self._semantic_cache_loaded = True
+        return self._semantic_cache
+
     
     
     
+    @traced_operation("align_exercise")
     def align_exercise(self, student_id: Optional[str], exercise: Dict[str, Any]) -> Union[AlignmentResponse, Dict]:
         """
         Analyzes the exercise and the student's syllabus to find the best match.
@@ -52,6 +112,10 @@ class UnifiedTeacherAgent(BaseAgent):
         
         syllabus = curriculum.get("topics_by_week", [])
 
+        fast_match = self._align_by_embedding(curriculum, exercise)
+        if fast_match is not None:
+            return fast_match
+
         if self.llm is None:
             logger.warning("No LLM, returning mock alignment.")
             return AlignmentResponse(
@@ -61,41 +125,226 @@ class UnifiedTeacherAgent(BaseAgent):
                 reasoning="MOCK: Matched verb forms to Present Simple."
             ).model_dump()
 
-        prompt = f"""
-You are an expert curriculum developer.
-Determine where this exercise fits into the provided syllabus.
+        return self._align_with_llm(syllabus, exercise)
 
-Syllabus:
-{json.dumps(syllabus, indent=2, ensure_ascii=False)}
+    def _align_with_llm(self, syllabus: List[Dict], exercise: Dict[str, Any]) -> Union[AlignmentResponse, Dict]:
+        prompt = CURRICULUM_ALIGNMENT.render(
+            syllabus=json.dumps(syllabus, indent=2, ensure_ascii=False),
+            exercise=json.dumps(exercise, indent=2, ensure_ascii=False),
+        )
+        return self._invoke_and_parse(prompt, model_class=AlignmentResponse)
 
-Exercise:
-{json.dumps(exercise, indent=2, ensure_ascii=False)}
+    def _align_by_embedding(self, curriculum: Dict, exercise: Dict[str, Any]) -> Optional[Dict]:
+        """
+        Nearest syllabus topic by cosine similarity. Returns None (-> LLM) when the
+        index is unavailable or the best and second-best weeks are too close to call.
+        """
+        if not TOPIC_INDEX_ENABLED:
+            return None
+        try:
+            matrix = self.topic_index.get(curriculum)
+            if matrix is None:
+                return None
+            similarities = embed_texts([exercise_text(exercise)]) @ matrix.vectors.T
+            best, similarity, margin = match_weeks(similarities, matrix)
+        except Exception as e:
+            logger.warning(f"Embedding alignment failed, using LLM: {e}")
+            return None
 
-Return JSON matching this schema:
-{{
-  "week": (int),
-  "topic": (string),
-  "confidence_score": (float),
-  "reasoning": (string)
-}}
-"""
-        return self._invoke_and_parse(prompt, model_class=AlignmentResponse)
+        confident = margin[0] >= ALIGN_MIN_MARGIN and similarity[0] >= ALIGN_MIN_SIMILARITY
+        record_cache("align_embedding", confident)
+        if not confident:
+            logger.info(f"Ambiguous embedding alignment (similarity {similarity[0]:.2f}, margin {margin[0]:.2f})")
+            return None
+
+        topic = best[0]
+        return AlignmentResponse(
+            week=int(matrix.weeks[topic]),
+            topic=matrix.topics[topic],
+            confidence_score=round(float(similarity[0]), 3),
+            reasoning=(
+                f"Embedding match with '{matrix.topics[topic]}' (similarity {similarity[0]:.2f}, "
+                f"margin {margin[0]:.2f} over the next best week)."
+            ),
+        ).model_dump()
+
+    @traced_operation("align_exercises_bulk")
+    def align_exercises_bulk(
+        self,
+        exercises: List[Dict[str, Any]],
+        student_ids: Optional[List[str]] = None,
+        curriculum_ids: Optional[List[str]] = None,
+        adjudicate: bool = False,
+        max_adjudications: int = ALIGN_MAX_ADJUDICATIONS,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        run_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Aligns a whole question bank with the curricula of many students (or
+        curricula given by id).
+
+        Exercises are embedded in batches of ALIGN_EMBED_BATCH. Curricula with
+        identical topics share one plan, and each plan is scored with a single
+        (exercises x topics) similarity matrix. Items whose best week does not
+        beat the runner-up by ALIGN_MIN_MARGIN are low-confidence; with
+        adjudicate=True the LLM decides those, once per (plan, exercise).
+
+        The assignments are stored per (plan, exercise) under run_id (see
+        LanguageLearningDB.get_alignment_plans / get_exercise_alignments);
+        only a summary is returned.
+        """
+        if not exercises:
+            return {"error": "No exercises provided"}
+        start_time = time.perf_counter()
+        run_id = run_id or uuid.uuid4().hex
+
+        owners, missing = self._load_alignment_curricula(student_ids or [], curriculum_ids or [])
+        plans: Dict[str, Dict[str, Any]] = {}
+        for owner, curriculum in owners:
+            plan = plans.setdefault(curriculum_fingerprint(curriculum), {"curriculum": curriculum, "owners": []})
+            plan["owners"].append(owner)
+        if not plans:
+            return {"error": "No curricula found", "missing": missing}
+
+        try:
+            texts = [exercise_text(exercise) for exercise in exercises]
+            vectors = np.vstack([
+                embed_texts(texts[i:i + ALIGN_EMBED_BATCH]) for i in range(0, len(texts), ALIGN_EMBED_BATCH)
+            ])
+        except Exception as e:
+            logger.error(f"Bulk alignment: embedding failed: {e}")
+            return {"error": f"Embedding failed: {e}"}
+
+        low_confidence: List[Tuple[str, int]] = []
+        for fingerprint, plan in list(plans.items()):
+            matrix = self.topic_index.get(plan["curriculum"])
+            if matrix is None:
+                missing.extend(plan.pop("owners"))
+                del plans[fingerprint]
+                continue
+            best, similarity, margin = match_weeks(vectors @ matrix.vectors.T, matrix)
+            confident = (margin >= ALIGN_MIN_MARGIN) & (similarity >= ALIGN_MIN_SIMILARITY)
+            plan["assignments"] = [
+                {
+                    "plan_fingerprint": fingerprint,
+                    "exercise_index": i,
+                    "exercise_id": exercises[i].get("exercise_id"),
+                    "week": int(matrix.weeks[best[i]]),
+                    "topic": matrix.topics[best[i]],
+                    "confidence_score": round(float(similarity[i]), 3),
+                    "margin": round(float(margin[i]), 3),
+                    "low_confidence": not confident[i],
+                    "source": "embedding",
+                }
+                for i in range(len(exercises))
+            ]
+            low_confidence.extend((fingerprint, int(i)) for i in np.flatnonzero(~confident))
+
+        adjudicated = 0
+        if adjudicate and self.llm is not None and low_confidence:
+            if len(low_confidence) > max_adjudications:
+                logger.warning(
+                    f"Bulk alignment: {len(low_confidence)} low-confidence items, adjudicating the first {max_adjudications}"
+                )
+
+            def run(item):
+                fingerprint, i = item
+                syllabus = plans[fingerprint]["curriculum"].get("topics_by_week", [])
+                with llm_semaphore:
+                    return item, self._align_with_llm(syllabus, exercises[i])
+
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+                for (fingerprint, i), result in executor.map(run, low_confidence[:max_adjudications]):
+                    if not isinstance(result, dict) or "error" in result:
+                        continue
+                    plans[fingerprint]["assignments"][i].update(
+                        week=result.get("week"),
+                        topic=result.get("topic"),
+                        confidence_score=result.get("confidence_score"),
+                        low_confidence=False,
+                        source="llm",
+                    )
+                    adjudicated += 1
+
+        assignments = [a for plan in plans.values() for a in plan["assignments"]]
+        saved = self.db.save_exercise_alignments(
+            run_id,
+            [{"plan_fingerprint": fingerprint, "owners": plan["owners"]} for fingerprint, plan in plans.items()],
+            assignments,
+        )
+        if saved != len(assignments):
+            return {"error": f"Stored {saved} of {len(assignments)} alignments of run {run_id}"}
+
+        logger.info(
+            f"Bulk alignment {run_id}: {len(exercises)} exercises x {len(plans)} distinct plans, "
+            f"{len(low_confidence)} low-confidence, {adjudicated} adjudicated"
+        )
+        return {
+            "run_id": run_id,
+            "exercises": len(exercises),
+            "curricula": sum(len(plan["owners"]) for plan in plans.values()),
+            "distinct_plans": len(plans),
+            "missing": missing,
+            "low_confidence": len(low_confidence) - adjudicated,
+            "adjudicated": adjudicated,
+            "saved": saved,
+            "duration_s": round(time.perf_counter() - start_time, 3),
+        }
+
+    def _load_alignment_curricula(
+        self, student_ids: List[str], curriculum_ids: List[str]
+    ) -> Tuple[List[Tuple[str, Dict]], List[str]]:
+        """[(owner, curriculum)] keyed by student id or curriculum id, plus the ids not found."""
+        owners: List[Tuple[str, Dict]] = []
+        missing: List[str] = []
+
+        if curriculum_ids:
+            found = self.db.get_curricula_by_ids(curriculum_ids)
+            owners.extend((cid, found[cid]) for cid in curriculum_ids if cid in found)
+            missing.extend(cid for cid in curriculum_ids if cid not in found)
+
+        if student_ids:
+            students = {s["_id"]: s for s in self.db.get_students(student_ids)}
+            curricula = self.db.get_curricula(list(students))
+            for sid in student_ids:
+                curriculum = None
+                if sid in students:
+                    language = students[sid].get("target_language", "English")
+                    curriculum = curricula.get((sid, language)) or curricula.get((sid, None))
+                if curriculum:
+                    owners.append((sid, curriculum))
+                else:
+                    missing.append(sid)
+
+        return owners, missing
 
     
     
     
+    @traced_operation("evaluate_chat")
     def evaluate_chat(self, student_id: Optional[str] = None) -> Union[ChatEvaluationResponse, Dict]:
         """
-        Evaluates Q&A pairs from a chat session.
+        Evaluates Q&A pairs from a chat session incrementally.
+
+        Only interactions newer than the student's watermark are sent to the LLM,
+        oldest first in batches of CHAT_EVAL_BATCH until caught up (the last 10
+        on the first run); each batch result is merged into a rolling aggregate
+        score and error list and moves the watermark to its last pair. With no
+        new interactions the stored aggregate is returned without an LLM call.
         """
         if not student_id:
             student_id = self.db.get_random_student_id()
             if not student_id:
                 return {"error": "Student ID not provided and no students found in database."}
 
-        chat_history = self.db.get_student_chat_history(student_id)
-        
-        if not chat_history:
+        state = self.db.get_chat_evaluation_state(student_id)
+        watermark = state.get("watermark") if state else None
+        limit = CHAT_EVAL_BATCH if watermark else 10
+        new_pairs = self.db.get_chat_interactions_after(student_id, watermark, limit=limit)
+
+        if not new_pairs:
+            if state:
+                return self._chat_aggregate_response(state)
             logger.warning(f"No chat history found for student {student_id}")
             return {"error": "No chat history found"}
 
@@ -113,46 +362,98 @@ Return JSON matching this schema:
             except:
                 return {"error": "Mock data creation failed"}
 
-        prompt = f"""
-You are an expert language tutor.
-Evaluate the following student answers.
-
-Chat History:
-{json.dumps(chat_history, indent=2, ensure_ascii=False)}
-
-Return JSON matching schema:
-{{
-  "overall_score": (0-100),
-  "detailed_feedback": "string",
-  "all_errors": [
-    {{
-       "question_index": (int),
-       "student_answer": (string),
-       "error_description": (string),
-       "correction": (string),
-       "rule_explanation": (string)
-    }}
-  ],
-  "improvement_plan": "string",
-  "follow_up_questions": ["string"]
-}}
-"""
-        result = self._invoke_and_parse(prompt, model_class=ChatEvaluationResponse)
-        
-        
-        if isinstance(result, dict) and "overall_score" in result:
-             eval_data = result.copy()
-             eval_data["student_id"] = student_id
-             self.db.save_chat_evaluation(eval_data)
-             
-        return result
+        # A backlog longer than one batch is evaluated batch by batch, oldest first
+        while new_pairs:
+            chat_history = [{"question": p.get("question", ""), "answer": p.get("answer", "")} for p in new_pairs]
+            prompt = CHAT_EVALUATION.render(chat_history=json.dumps(chat_history, indent=2, ensure_ascii=False))
+            result = self._invoke_and_parse(prompt, model_class=ChatEvaluationResponse)
+            if not isinstance(result, dict) or "overall_score" not in result:
+                if not state:
+                    return result
+                logger.warning(f"Chat evaluation of {student_id} stopped at a failed batch: {result}")
+                break
+
+            new_state = self._merge_chat_evaluation(state, result, new_pairs)
+            if not self.db.advance_chat_evaluation_state(student_id, watermark, new_state):
+                logger.info(f"Chat of {student_id} was evaluated concurrently, returning the stored aggregate")
+                return self._chat_aggregate_response(self.db.get_chat_evaluation_state(student_id) or new_state)
+
+            eval_data = result.copy()
+            eval_data["student_id"] = student_id
+            eval_data["interaction_ids"] = [p["_id"] for p in new_pairs]
+            eval_data["aggregate_score"] = new_state["overall_score"]
+            self.db.save_chat_evaluation(eval_data)
+            self.db.record_student_errors(student_id, [
+                {
+                    "error_type": error.get("error_type") or DEFAULT_ERROR_TYPE,
+                    "original_text": error.get("student_answer") or "",
+                    "corrected_text": error.get("correction", ""),
+                    "explanation": error.get("rule_explanation") or error.get("error_description", ""),
+                    "topic": error.get("topic"),
+                    "source": "chat_evaluation",
+                }
+                for error in result.get("all_errors", [])
+            ])
+
+            state, watermark = new_state, new_state["watermark"]
+            if len(new_pairs) < limit:
+                break
+            limit = CHAT_EVAL_BATCH
+            new_pairs = self.db.get_chat_interactions_after(student_id, watermark, limit=limit)
+
+        return self._chat_aggregate_response(state)
+
+    @staticmethod
+    def _merge_chat_evaluation(state: Optional[Dict], batch: Dict, new_pairs: List[Dict]) -> Dict:
+        """Fold one batch evaluation into the rolling aggregate (older pairs weigh at most CHAT_EVAL_WINDOW)."""
+        state = state or {}
+        offset = state.get("evaluated_count", 0)
+        old_weight = min(offset, CHAT_EVAL_WINDOW)
+        new_weight = len(new_pairs)
+        score = (state.get("overall_score", 0) * old_weight + batch["overall_score"] * new_weight) / (old_weight + new_weight)
+
+        batch_errors = []
+        for error in batch.get("all_errors", []):
+            error = dict(error)
+            if isinstance(error.get("question_index"), int):
+                # batch position -> position in the student's evaluated history
+                error["question_index"] += offset
+            batch_errors.append(error)
+
+        last = new_pairs[-1]
+        return {
+            "watermark": {"created_at": last["created_at"], "_id": last["_id"]},
+            "evaluated_count": offset + new_weight,
+            "overall_score": score,
+            "all_errors": (state.get("all_errors", []) + batch_errors)[-CHAT_EVAL_MAX_ERRORS:],
+            "detailed_feedback": batch.get("detailed_feedback", ""),
+            "improvement_plan": batch.get("improvement_plan", ""),
+            "follow_up_questions": batch.get("follow_up_questions", []),
+        }
+
+    @staticmethod
+    def _chat_aggregate_response(state: Dict) -> Dict:
+        response = ChatEvaluationResponse(
+            overall_score=round(state.get("overall_score", 0)),
+            detailed_feedback=state.get("detailed_feedback", ""),
+            all_errors=state.get("all_errors", []),
+            improvement_plan=state.get("improvement_plan", ""),
+            follow_up_questions=state.get("follow_up_questions", []),
+        ).model_dump()
+        response["evaluated_interactions"] = state.get("evaluated_count", 0)
+        return response
 
     
     
     
+    @traced_operation("generate_content")
     def generate_content(self, student_id: Optional[str], request_params: Dict[str, Any]) -> Union[ExerciseSchema, TheorySchema, Dict]:
         """
         Generates a question/exercise or theory lesson.
+
+        Interactive requests get a fresh generation each time (which still
+        refreshes the cache for bulk runs); request_params["cache"] = True
+        serves a cached one instead.
         """
         if not student_id:
             student_id = self.db.get_random_student_id()
@@ -178,66 +479,194 @@ Return JSON matching schema:
         if self.llm is None:
             return {"error": "No LLM available"}
 
-        if request_params.get('type') == 'theory':
+        return self._generate_for_week(
+            content_type=request_params.get('type'),
+            week=target_week,
+            topics=topics,
+            level=current_level,
+            language=target_lang,
+            difficulty=request_params.get('difficulty', 1),
+            use_cache=bool(request_params.get('cache', False)),
+        )
+
+    @traced_operation("generate_bulk")
+    def generate_bulk(
+        self,
+        student_ids: List[str],
+        week_from: int = 1,
+        week_to: int = 24,
+        content_types: Optional[List[str]] = None,
+        count: int = 1,
+        difficulty: int = 1,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        """
+        Generates content for a range of weeks for one or many students.
+
+        Identical (content type, week, topics, level, language) work is generated
+        once and shared between students. Distinct generations run concurrently,
+        bounded by the global LLM concurrency budget; one that fails is listed in
+        "errors" without affecting the others. Results are written to the
+        generated_content collection in one bulk insert.
+        """
+        if self.llm is None:
+            return {"error": "No LLM available"}
+
+        content_types = content_types or ["theory", "multiple_choice"]
+        start_time = time.perf_counter()
+
+        students = {s["_id"]: s for s in self.db.get_students(student_ids)}
+        curricula = self.db.get_curricula(list(students))
+
+        work: Dict[GenerationKey, Dict[str, Any]] = {}
+        targets: Dict[GenerationKey, List[Dict[str, Any]]] = {}
+        missing = [sid for sid in student_ids if sid not in students]
+
+        for sid, profile in students.items():
+            language = profile.get("target_language", "English")
+            level = profile.get("current_level", "A1")
+            curriculum = curricula.get((sid, language)) or curricula.get((sid, None))
+            if not curriculum:
+                missing.append(sid)
+                continue
+
+            for week_data in curriculum.get("topics_by_week", []):
+                week = week_data.get("week")
+                if not week or not week_from <= week <= week_to:
+                    continue
+                topics = week_data.get("topics", [])
+                for content_type in content_types:
+                    for variant in range(count):
+                        # The prompts name the week, so students on different weeks do not share
+                        key = GenerationKey.build(content_type, topics, level, language, variant=variant, week=week)
+                        work.setdefault(key, {
+                            "content_type": content_type,
+                            "week": week,
+                            "topics": topics,
+                            "level": level,
+                            "language": language,
+                            "variant": variant,
+                        })
+                        targets.setdefault(key, []).append({"student_id": sid, "week": week})
+
+        logger.info(
+            f"Bulk generation: {sum(len(t) for t in targets.values())} requested items, "
+            f"{len(work)} distinct generations, concurrency {max_concurrency}"
+        )
+
+        def run(key):
+            item = work[key]
+            try:
+                with llm_semaphore:
+                    return key, self._generate_for_week(difficulty=difficulty, **item)
+            except Exception as e:
+                logger.error(f"Bulk generation of {item['content_type']} for week {item['week']} failed: {e}")
+                return key, {"error": str(e)}
+
+        documents = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            for key, result in executor.map(run, list(work)):
+                item = work[key]
+                if not isinstance(result, dict) or "error" in result:
+                    error = result.get("error") if isinstance(result, dict) else f"Unexpected result: {type(result).__name__}"
+                    errors.append({
+                        "type": item["content_type"],
+                        "week": item["week"],
+                        "topics": item["topics"],
+                        "variant": item["variant"],
+                        "students": len(targets[key]),
+                        "error": error,
+                    })
+                    continue
+                for target in targets[key]:
+                    documents.append({
+                        **target,
+                        "type": item["content_type"],
+                        "topics": item["topics"],
+                        "level": item["level"],
+                        "language": item["language"],
+                        "variant": item["variant"],
+                        "content": result,
+                    })
+
+        self.db.save_generated_content(documents)
+
+        return {
+            "students": len(students),
+            "missing_students": missing,
+            "requested": sum(len(t) for t in targets.values()),
+            "generated": len(work) - len(errors),
+            "deduplicated": sum(len(t) for t in targets.values()) - len(work),
+            "failed": len(errors),
+            "errors": errors,
+            "saved": len(documents),
+            "duration_s": round(time.perf_counter() - start_time, 3),
+        }
+
+    def _generate_for_week(
+        self,
+        content_type: str,
+        week: int,
+        topics: List[str],
+        level: Any,
+        language: str,
+        difficulty: int = 1,
+        variant: int = 0,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        key = GenerationKey.build(
+            content_type,
+            topics,
+            level,
+            language,
+            difficulty=None if content_type == "theory" else difficulty,
+            variant=variant,
+            week=week,
+        )
+        cache = self.semantic_cache
+        if cache and use_cache:
+            cached = cache.lookup(key)
+            if cached is not None:
+                return cached
+
+        result = self._generate_uncached(key, week, topics, language)
+
+        if cache and isinstance(result, dict) and "error" not in result and not result.get("fallback"):
+            cache.store(key, result)
+        return result
+
+    def _generate_uncached(self, key: GenerationKey, week: int, topics: List[str], language: str) -> Dict[str, Any]:
+        content_type = key.content_type
+        if content_type == 'theory':
+            if self.theory_agent is None:
+                return {"error": "TheoryAgent is not available"}
             logger.info("Delegating theory generation to TheoryAgent")
             
             topic_str = ", ".join(topics) if isinstance(topics, list) else str(topics)
             
             return self.theory_agent.generate_theory(
                 topic=topic_str,
-                week=target_week,
-                level=str(current_level),
-                language=target_lang
+                week=week,
+                level=key.level,
+                language=language
             )
         else:
-            prompt = f"""
-Create practice exercise.
-Week: {target_week}, Topics: {topics}, Type: {request_params.get('type')}, Language: {target_lang}
-
-Return JSON (ExerciseSchema):
-{{
-  "exercise_id": "string",
-  "type": "{request_params.get('type')}",
-  "topic": "string",
-  "task": "string",
-  "question": "string",
-  "options": ["string"] (optional),
-  "correct_answer": "string",
-  "explanation": "string",
-  "difficulty": {request_params.get('difficulty', 1)}
-}}
-"""
+            prompt = PRACTICE_EXERCISE.render(
+                language=language, content_type=content_type, difficulty=key.difficulty, week=week, topics=topics
+            )
             return self._invoke_and_parse(prompt, model_class=ExerciseSchema)
 
     
     
     
-    def _invoke_and_parse(self, prompt: str, model_class=None) -> Any:
+    def _invoke_and_parse(self, prompt: List[BaseMessage], model_class=None) -> Any:
         try:
-            response = self.llm.invoke(prompt).content
-            clean_res = response.strip()
-            
-            if "```json" in clean_res:
-                clean_res = clean_res.split("```json")[1].split("```")[0].strip()
-            elif "```" in clean_res:
-                clean_res = clean_res.split("```")[1].split("```")[0].strip()
-            
-            
-            start = clean_res.find("{")
-            end = clean_res.rfind("}") + 1
-            if start != -1 and end != 0:
-                clean_res = clean_res[start:end]
-            
-            data = json.loads(clean_res)
-            
-            
             if model_class:
-                
-                obj = model_class(**data)
-                return obj.model_dump()
-            
-            return data
-            
+                return self.call_llm_structured(prompt, model_class)
+            return parse_llm_json(self.call_llm(prompt).content, agent="UnifiedTeacherAgent")
+
         except Exception as e:
+            record_llm_failure("UnifiedTeacherAgent", e)
             logger.error(f"LLM/Validation Error: {e}")
             return {"error": str(e)}
@@ -1,34 +1,208 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Union
+import asyncio
+import json
+import logging
+import os
 import sys
+import threading
+import time
+import uuid
 from pathlib import Path
 
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from src.agents.unified_teacher_agent import UnifiedTeacherAgent
-from src.agents.language_tools import LanguageTools
 from src.models.schemas import (
     ExerciseSchema, 
     TheorySchema, 
-    ChatEvaluationResponse
+    ChatEvaluationResponse,
+    PersonalVocabularySchema
 )
-from langchain_community.llms import FakeListLLM 
+from src.utils.metrics import EVENT_LOOP_LAG, HTTP_REQUEST_DURATION
 
-app = FastAPI(
-    title="Language Learning MAS API",
-    description="Multi-Agent System for Personalized Language Learning",
-    version="1.0.0"
-)
+logger = logging.getLogger(__name__)
+
+
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+
+
+class AppComponents:
+    """
+    Lazily constructed API dependencies.
+
+    Nothing heavy happens at import time: agents (LLM client, MongoDB, Chroma,
+    Yandex Disk) are built on first use, so worker boot stays fast.
+    """
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+        self._lock = threading.Lock()
+        self._db = None
+        self._unified_agent = None
+        self._planner = None
+        self._assessor = None
+        self._job_queue = None
+        self._tools = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    from src.database.mongodb_adapter import LanguageLearningDB
+                    self._db = LanguageLearningDB(self.database_url)
+        return self._db
+
+    @property
+    def unified_agent(self):
+        if self._unified_agent is None:
+            with self._lock:
+                if self._unified_agent is None:
+                    from src.agents.unified_teacher_agent import UnifiedTeacherAgent
+                    self._unified_agent = UnifiedTeacherAgent(database_url=self.database_url)
+        return self._unified_agent
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            with self._lock:
+                if self._planner is None:
+                    from src.agents.curriculum_planner_agent import CurriculumPlannerAgent
+                    self._planner = CurriculumPlannerAgent(database_url=self.database_url)
+        return self._planner
 
+    @property
+    def assessor(self):
+        if self._assessor is None:
+            with self._lock:
+                if self._assessor is None:
+                    from src.agents.assessor_agent import AssessorAgent
+                    self._assessor = AssessorAgent(database_url=self.database_url)
+        return self._assessor
 
-db_url = "mongodb://mongo:27017"
-unified_agent = UnifiedTeacherAgent(database_url=db_url)
+    @property
+    def job_queue(self):
+        if self._job_queue is None:
+            db = self.db
+            with self._lock:
+                if self._job_queue is None:
+                    from src.tasks.generation_jobs import GenerationJobQueue
+                    self._job_queue = GenerationJobQueue(
+                        db,
+                        handlers={
+                            "generate_content": _run_generation_job,
+                            "generate_bulk": _run_bulk_generation_job,
+                            "plan_curricula": _run_curriculum_planning_job,
+                            "align_exercises": _run_bulk_alignment_job,
+                        },
+                        max_workers=int(os.getenv("GENERATION_JOB_WORKERS", "4"))
+                    )
+        return self._job_queue
 
+    @property
+    def tools(self):
+        if self._tools is None:
+            from src.agents.language_tools import LanguageTools
+            self._tools = LanguageTools(llm=None)
+        return self._tools
 
-mock_llm = FakeListLLM(responses=["Mock response"])
-tools = LanguageTools(llm=mock_llm)
+    def warm_up(self) -> None:
+        """Build the agents ahead of the first request (API_WARMUP=true)."""
+        try:
+            _ = self.unified_agent.theory_agent
+            logger.info("API components warmed up")
+        except Exception as e:
+            logger.error(f"Warm-up failed: {e}")
+
+    def status(self) -> Dict[str, bool]:
+        agent = self._unified_agent
+        return {
+            "job_queue": self._job_queue is not None,
+            "unified_agent": agent is not None,
+            "theory_agent": agent is not None and agent._theory_agent is not None,
+            "llm": agent is not None and agent.llm is not None,
+        }
+
+    def shutdown(self) -> None:
+        if self._job_queue is not None:
+            self._job_queue.shutdown()
+
+
+components = AppComponents(database_url=os.getenv("MONGODB_URL", "mongodb://mongo:27017"))
+
+
+def _run_generation_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return components.unified_agent.generate_content(
+        student_id=params.get("student_id"),
+        request_params=params
+    )
+
+
+def _run_bulk_generation_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    student_ids = list(params.get("cohort") or [])
+    if params.get("student_id"):
+        student_ids.append(params["student_id"])
+    return components.unified_agent.generate_bulk(
+        student_ids=student_ids,
+        week_from=params.get("week_from", 1),
+        week_to=params.get("week_to", 24),
+        content_types=params.get("content_types"),
+        count=params.get("count", 1),
+        difficulty=params.get("difficulty", 1)
+    )
+
+
+async def _monitor_event_loop_lag(interval: float):
+    """Records how late the event loop wakes up from a fixed sleep (blocked-loop indicator)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+def _run_curriculum_planning_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return components.planner.plan_curricula(
+        student_ids=params.get("student_ids", []),
+        total_weeks=params.get("total_weeks", 24),
+        force_regenerate=params.get("force_regenerate", False),
+        use_template=params.get("use_template", True)
+    )
+
+
+def _run_bulk_alignment_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    run_id = params.get("run_id")
+    return components.unified_agent.align_exercises_bulk(
+        exercises=params.get("exercises") or components.db.get_alignment_exercises(run_id),
+        student_ids=params.get("student_ids"),
+        curriculum_ids=params.get("curriculum_ids"),
+        adjudicate=params.get("adjudicate", False),
+        run_id=run_id,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(components.job_queue.recover)
+    if os.getenv("API_WARMUP", "False").lower() == "true":
+        threading.Thread(target=components.warm_up, name="api-warmup", daemon=True).start()
+    lag_monitor = asyncio.create_task(_monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL))
+    yield
+    lag_monitor.cancel()
+    components.shutdown()
+
+
+app = FastAPI(
+    title="Language Learning MAS API",
+    description="Multi-Agent System for Personalized Language Learning",
+    version="1.0.0",
+    lifespan=lifespan
+)
 
 
 
@@ -37,16 +211,118 @@ class GenerateContentRequest(BaseModel):
     week: int
     type: str = "multiple_choice"
     difficulty: int = 1
+    cache: bool = False
 
 class ChatEvaluationRequest(BaseModel):
     student_id: str
 
+class BulkGenerateRequest(BaseModel):
+    student_id: Optional[str] = None
+    cohort: List[str] = []
+    week_from: int = 1
+    week_to: int = 24
+    content_types: List[str] = ["theory", "multiple_choice"]
+    count: int = 1
+    difficulty: int = 1
+
+class PlanCurriculaRequest(BaseModel):
+    student_ids: List[str]
+    total_weeks: int = 24
+    force_regenerate: bool = False
+    use_template: bool = True
+
+class BulkAlignRequest(BaseModel):
+    exercises: List[Dict[str, Any]]
+    student_ids: List[str] = []
+    curriculum_ids: List[str] = []
+    adjudicate: bool = False
+
+class GradeCohortRequest(BaseModel):
+    quiz: Dict[str, Any]
+    answer_sheets: Dict[str, Dict[str, Any]]
+    save: bool = True
+
+class VocabularyReviewRequest(BaseModel):
+    student_id: str
+    results: Dict[str, Union[bool, int]]
+
+class AddVocabularyRequest(BaseModel):
+    student_id: str
+    items: List[PersonalVocabularySchema]
+
+class JobSubmittedResponse(BaseModel):
+    job_id: str
+    status: str = "queued"
+
+
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = route.path if route else "unmatched"
+        HTTP_REQUEST_DURATION.labels(request.method, endpoint, str(status)).observe(time.perf_counter() - start)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus metrics: request latency, agent/LangGraph node durations, LLM latency and tokens,
+    cache hits, DB operation timings, JSON parse failures and fallbacks.
+    """
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Language Learning MAS API"}
 
+@app.get("/ready")
+def readiness_endpoint():
+    """
+    Readiness probe: checks MongoDB and reports which subsystems are already warm.
+    """
+    subsystems = components.status()
+    try:
+        components.db.client.admin.command("ping")
+        database_ok = True
+    except Exception as e:
+        logger.warning(f"Readiness check: MongoDB unavailable: {e}")
+        database_ok = False
+
+    body = {"ready": database_ok, "database": database_ok, "warm": subsystems}
+    return JSONResponse(status_code=200 if database_ok else 503, content=body)
+
+@app.get("/curriculum/{student_id}")
+def get_curriculum_endpoint(student_id: str, language: Optional[str] = None):
+    """
+    The student's stored curriculum (weekly topics and progress).
+    """
+    curriculum = components.db.get_curriculum(student_id, language=language)
+    if not curriculum:
+        raise HTTPException(status_code=404, detail=f"Curriculum not found for {student_id}")
+    curriculum.pop("_id", None)
+    return curriculum
+
+@app.post("/curriculum/plan", response_model=JobSubmittedResponse, status_code=202)
+def plan_curricula_endpoint(request: PlanCurriculaRequest):
+    """
+    Plan curricula for a whole cohort in one batched background job
+    (shared plans are built once, all curricula saved with one bulk write).
+    """
+    if not request.student_ids:
+        raise HTTPException(status_code=400, detail="student_ids must not be empty")
+
+    job_id = components.job_queue.submit("plan_curricula", request.model_dump())
+    if not job_id:
+        raise HTTPException(status_code=503, detail="Job store unavailable")
+    return JobSubmittedResponse(job_id=job_id)
+
 @app.post("/generate/exercise", response_model=Union[ExerciseSchema, TheorySchema, Dict[str, Any]])
 def generate_exercise_endpoint(request: GenerateContentRequest):
     """
@@ -55,10 +331,11 @@ def generate_exercise_endpoint(request: GenerateContentRequest):
     params = {
         "week": request.week,
         "type": request.type,
-        "difficulty": request.difficulty
+        "difficulty": request.difficulty,
+        "cache": request.cache,
     }
     
-    result = unified_agent.generate_content(
+    result = components.unified_agent.generate_content(
         student_id=request.student_id,
         request_params=params
     )
@@ -68,12 +345,182 @@ def generate_exercise_endpoint(request: GenerateContentRequest):
         
     return result
 
+@app.post("/jobs/generate", response_model=JobSubmittedResponse, status_code=202)
+def submit_generation_job(request: GenerateContentRequest):
+    """
+    Queue exercise/theory generation in the background and return the job id immediately.
+    Poll GET /jobs/{job_id} or subscribe to GET /jobs/{job_id}/events for the result.
+    """
+    job_id = components.job_queue.submit("generate_content", request.model_dump())
+    if not job_id:
+        raise HTTPException(status_code=503, detail="Job store unavailable")
+    return JobSubmittedResponse(job_id=job_id)
+
+@app.post("/generate/bulk", response_model=JobSubmittedResponse, status_code=202)
+def generate_bulk_endpoint(request: BulkGenerateRequest):
+    """
+    Generate content for a range of curriculum weeks for a student or a cohort in one request.
+    Runs as a background job; shared (topics, level, language) work is generated once.
+    """
+    if not request.student_id and not request.cohort:
+        raise HTTPException(status_code=400, detail="Provide student_id or cohort")
+    if request.week_from > request.week_to:
+        raise HTTPException(status_code=400, detail="week_from must not exceed week_to")
+
+    job_id = components.job_queue.submit("generate_bulk", request.model_dump())
+    if not job_id:
+        raise HTTPException(status_code=503, detail="Job store unavailable")
+    return JobSubmittedResponse(job_id=job_id)
+
+@app.post("/align/bulk", response_model=JobSubmittedResponse, status_code=202)
+def align_bulk_endpoint(request: BulkAlignRequest):
+    """
+    Align a question bank with the curricula of many students (or curricula by id).
+    Runs as a background job whose result is a summary with the run_id; the
+    per-exercise week assignments are read with GET /align/bulk/{run_id}.
+    """
+    if not request.exercises:
+        raise HTTPException(status_code=400, detail="exercises must not be empty")
+    if not request.student_ids and not request.curriculum_ids:
+        raise HTTPException(status_code=400, detail="Provide student_ids or curriculum_ids")
+
+    # The question bank is stored with the run, not in the job document
+    run_id = uuid.uuid4().hex
+    if components.db.save_alignment_exercises(run_id, request.exercises) != len(request.exercises):
+        raise HTTPException(status_code=503, detail="Could not store the exercises")
+
+    params = request.model_dump(exclude={"exercises"})
+    params["run_id"] = run_id
+    job_id = components.job_queue.submit("align_exercises", params)
+    if not job_id:
+        raise HTTPException(status_code=503, detail="Job store unavailable")
+    return JobSubmittedResponse(job_id=job_id)
+
+@app.get("/align/bulk/{run_id}")
+def get_bulk_alignment_endpoint(run_id: str, owner: Optional[str] = None, skip: int = 0, limit: int = 500):
+    """
+    Assignments of a bulk alignment run. Without owner: the run's distinct plans
+    and their owners. With owner (student or curriculum id): one page of that
+    owner's per-exercise assignments.
+    """
+    plans = components.db.get_alignment_plans(run_id, owner=owner)
+    if not plans:
+        raise HTTPException(status_code=404, detail=f"No alignment for run {run_id}" + (f" and owner {owner}" if owner else ""))
+    if not owner:
+        return {"run_id": run_id, "plans": plans}
+
+    fingerprint = plans[0]["plan_fingerprint"]
+    return {
+        "run_id": run_id,
+        "owner": owner,
+        "plan_fingerprint": fingerprint,
+        "skip": skip,
+        "assignments": components.db.get_exercise_alignments(run_id, fingerprint, skip=skip, limit=min(limit, 5000)),
+    }
+
+@app.post("/assessments/grade")
+def grade_cohort_endpoint(request: GradeCohortRequest):
+    """
+    Grade a cohort's answer sheets ({student_id: {question_id: answer}}) for one quiz in a single
+    vectorized pass. Returns per-student scores and per-question difficulty/discrimination.
+    """
+    result = components.assessor.evaluate_cohort(request.quiz, request.answer_sheets, save=request.save)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/vocabulary/{student_id}/due")
+def due_vocabulary_endpoint(student_id: str, limit: int = 20):
+    """
+    The student's vocabulary items due for spaced-repetition review, most overdue first.
+    """
+    from src.utils.spaced_repetition import ReviewScheduler
+    items = ReviewScheduler(components.db).due(student_id, limit=limit)
+    for item in items:
+        item["_id"] = str(item["_id"])
+    return {"student_id": student_id, "items": items}
+
+@app.post("/vocabulary")
+def add_vocabulary_endpoint(request: AddVocabularyRequest):
+    """
+    Add words to a student's vocabulary. New words are due for review immediately;
+    words the student already has keep their review schedule.
+    """
+    items = [item.model_dump(exclude_unset=True) for item in request.items]
+    saved = components.db.add_vocabulary_items(request.student_id, items)
+    if items and not saved:
+        raise HTTPException(status_code=503, detail="Vocabulary store unavailable")
+    return {"student_id": request.student_id, "saved": saved}
+
+@app.post("/vocabulary/review")
+def vocabulary_review_endpoint(request: VocabularyReviewRequest):
+    """
+    Reschedule the words of a finished review session: results map each word to an
+    SM-2 grade (0-5) or to true/false.
+    """
+    from src.utils.spaced_repetition import ReviewScheduler
+    return ReviewScheduler(components.db).record_session(request.student_id, request.results)
+
+@app.get("/jobs/{job_id}")
+def get_job_endpoint(job_id: str):
+    """
+    Current status (queued, running, done, failed) and result of a generation job.
+    """
+    job = components.job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_endpoint(job_id: str):
+    """
+    Server-Sent Events stream of job status changes; closes once the job is finished.
+    """
+    if not await run_in_threadpool(components.job_queue.get, job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    # Imported here: the job module pulls in pymongo, which app startup defers
+    from src.tasks.generation_jobs import FINISHED_STATUSES
+
+    async def event_stream():
+        last_status = None
+        while True:
+            job = await run_in_threadpool(components.job_queue.wait_for_change, job_id, last_status)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"job not found\"}\n\n"
+                return
+            if job["status"] == last_status:
+                yield ": keep-alive\n\n"
+                continue
+            last_status = job["status"]
+            yield f"event: status\ndata: {json.dumps(job, default=str, ensure_ascii=False)}\n\n"
+            if last_status in FINISHED_STATUSES:
+                return
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/stream/theory")
+def stream_theory_endpoint(topic: str, week: int = 1, level: str = "A1", language: str = "English"):
+    """
+    Server-Sent Events stream of a theory lesson: "token" events carry pieces of the
+    lesson content as the LLM generates them, a final "done" event carries the full lesson.
+    """
+    theory_agent = components.unified_agent.theory_agent
+    if theory_agent is None:
+        raise HTTPException(status_code=503, detail="TheoryAgent unavailable")
+
+    def event_stream():
+        for event in theory_agent.stream_theory(topic=topic, week=week, level=level, language=language):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/evaluate/chat", response_model=Union[ChatEvaluationResponse, Dict[str, Any]])
 def evaluate_chat_endpoint(request: ChatEvaluationRequest):
     """
     Evaluate recent chat history for a student.
     """
-    result = unified_agent.evaluate_chat(student_id=request.student_id)
+    result = components.unified_agent.evaluate_chat(student_id=request.student_id)
     
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
@@ -85,7 +532,7 @@ def select_tools_endpoint(level: int, topic: str, phase: str = "practice"):
     """
     Dynamically select tools based on context.
     """
-    selected = tools.select_tools_dynamically(
+    selected = components.tools.select_tools_dynamically(
         level=level,
         topic=topic,
         lesson_phase=phase
@@ -7,8 +7,11 @@ Used for RAG (Retrieval-Augmented Generation) in the Tutor Agent.
 
 import chromadb
 import logging
+import os
 from typing import List, Dict, Optional
 
+from src.utils.metrics import DB_OPERATION_DURATION, observe
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,54 +26,83 @@ class ChromaVectorDB:
     - lesson_history: Summaries of past lessons
     """
 
-    def __init__(self, persist_dir: str = "./chroma_data"):
+    # Embedding function for all collections; None uses Chroma's default model.
+    # Benchmarks replace it with a deterministic offline function.
+    embedding_function = None
+
+    def __init__(self, persist_dir: Optional[str] = None):
         """
         Initialize Chroma with persistence.
 
         Args:
             persist_dir: Directory path for persistent storage
+                (defaults to $CHROMA_PERSIST_DIR or ./chroma_data)
         """
+        persist_dir = persist_dir or os.getenv("CHROMA_PERSIST_DIR", "./chroma_data")
         try:
             self.client = chromadb.PersistentClient(path=persist_dir)
 
             self.materials = self.client.get_or_create_collection(
                 name="lesson_materials",
                 metadata={"hnsw:space": "cosine"},
+                **self._collection_kwargs(),
             )
             self.vocabulary = self.client.get_or_create_collection(
                 name="student_vocabulary",
                 metadata={"hnsw:space": "cosine"},
+                **self._collection_kwargs(),
             )
             self.errors = self.client.get_or_create_collection(
                 name="error_patterns",
                 metadata={"hnsw:space": "cosine"},
+                **self._collection_kwargs(),
             )
             self.lessons = self.client.get_or_create_collection(
                 name="lesson_history",
                 metadata={"hnsw:space": "cosine"},
+                **self._collection_kwargs(),
             )
             self.textbooks = self.client.get_or_create_collection(
                 name="textbooks",
                 metadata={"hnsw:space": "cosine"},
+                **self._collection_kwargs(),
             )
-            
-            
+            self._disk_client = None
+            self._disk_client_loaded = False
+
+            logger.info(f"Chroma initialized with persistence at {persist_dir}")
+
+        except Exception as exc:
+            logger.error(f"Failed to initialize Chroma: {exc}")
+            raise
+
+    def _collection_kwargs(self) -> Dict:
+        if self.embedding_function is None:
+            return {}
+        return {"embedding_function": self.embedding_function}
+
+    def get_collection(self, name: str):
+        """Get (or create) an extra cosine-space collection using the configured embeddings."""
+        return self.client.get_or_create_collection(
+            name=name,
+            metadata={"hnsw:space": "cosine"},
+            **self._collection_kwargs(),
+        )
+
+    @property
+    def disk_client(self):
+        """Yandex Disk fallback client, connected (token check) on first use."""
+        if not self._disk_client_loaded:
+            self._disk_client_loaded = True
             try:
                 from src.utils.yandex_disk import YandexDiskClient
-                self.disk_client = YandexDiskClient()
+                self._disk_client = YandexDiskClient()
                 logger.info("YandexDiskClient attached to ChromaVectorDB")
             except ImportError:
                 logger.warning("Could not import YandexDiskClient")
-                self.disk_client = None
             except Exception as e:
                 logger.warning(f"Failed to init YandexDiskClient: {e}")
-                self.disk_client = None
-
-            logger.info(f"Chroma initialized with persistence at {persist_dir}")
-
-        except Exception as exc:
-            logger.error(f"Failed to initialize Chroma: {exc}")
-            raise
+        return self._disk_client
 
     def search_materials(
         self,
@@ -101,11 +133,12 @@ class ChromaVectorDB:
                 if level is not None:
                     where_filter["level"] = level
 
-            results = self.materials.query(
-                query_texts=[query],
-                n_results=limit,
-                where=where_filter if where_filter else None,
-            )
+            with observe(DB_OPERATION_DURATION, "chroma", "materials.query"):
+                results = self.materials.query(
+                    query_texts=[query],
+                    n_results=limit,
+                    where=where_filter if where_filter else None,
+                )
 
             if not results["documents"] or not results["documents"][0]:
                 logger.debug(f"No materials found for query: {query}")
@@ -162,11 +195,12 @@ class ChromaVectorDB:
             List of vocabulary entries
         """
         try:
-            results = self.vocabulary.query(
-                query_texts=[query],
-                n_results=limit,
-                where={"student_id": student_id},
-            )
+            with observe(DB_OPERATION_DURATION, "chroma", "vocabulary.query"):
+                results = self.vocabulary.query(
+                    query_texts=[query],
+                    n_results=limit,
+                    where={"student_id": student_id},
+                )
 
             if not results["documents"] or not results["documents"][0]:
                 return []
@@ -201,10 +235,11 @@ class ChromaVectorDB:
             List of error patterns with explanations
         """
         try:
-            results = self.errors.query(
-                query_texts=[query],
-                n_results=limit,
-            )
+            with observe(DB_OPERATION_DURATION, "chroma", "errors.query"):
+                results = self.errors.query(
+                    query_texts=[query],
+                    n_results=limit,
+                )
 
             if not results["documents"] or not results["documents"][0]:
                 return []
@@ -248,11 +283,12 @@ class ChromaVectorDB:
                 **(metadata or {}),
             }
 
-            self.materials.add(
-                ids=[doc_id],
-                documents=[content],
-                metadatas=[full_metadata],
-            )
+            with observe(DB_OPERATION_DURATION, "chroma", "materials.add"):
+                self.materials.add(
+                    ids=[doc_id],
+                    documents=[content],
+                    metadatas=[full_metadata],
+                )
 
             logger.info(f"Material added: {doc_id} ({topic})")
             return True
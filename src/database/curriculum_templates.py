@@ -0,0 +1,101 @@
+"""
+Curriculum template store.
+
+Most students share (language, current level, target level, total_weeks) and
+have similar goals, so a curriculum generated once can be cloned for the next
+student. Templates live in a Chroma collection: the tuple is matched exactly
+through metadata, the student's goals are embedded, and the nearest template
+counts as the same goal cluster when its cosine similarity reaches the
+threshold.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from src.models.generation_key import normalize_language, normalize_level, normalize_topics
+from src.utils.metrics import DB_OPERATION_DURATION, observe, record_cache
+
+logger = logging.getLogger(__name__)
+
+
+CURRICULUM_TEMPLATE_COLLECTION = "curriculum_templates"
+CURRICULUM_TEMPLATE_THRESHOLD = float(os.getenv("CURRICULUM_TEMPLATE_THRESHOLD", "0.8"))
+
+# Plan fields copied into / out of a template
+TEMPLATE_FIELDS = ("total_weeks", "level_from", "level_to", "topics_by_week")
+
+
+def goal_text(goals: Any) -> str:
+    return "; ".join(normalize_topics(goals)) or "general fluency"
+
+
+class CurriculumTemplateStore:
+    """
+    Args:
+        collection: Chroma collection (cosine space) holding the templates
+        threshold: Minimum goal similarity to reuse a template
+    """
+
+    def __init__(self, collection, threshold: float = CURRICULUM_TEMPLATE_THRESHOLD):
+        self.collection = collection
+        self.threshold = threshold
+
+    @staticmethod
+    def _key_fields(language: str, level_from: Any, level_to: Any, total_weeks: int) -> Dict[str, Any]:
+        return {
+            "language": normalize_language(language),
+            "level_from": normalize_level(level_from),
+            "level_to": normalize_level(level_to),
+            "total_weeks": int(total_weeks),
+        }
+
+    def find(self, language: str, level_from: Any, level_to: Any, total_weeks: int, goals: Any) -> Optional[Dict]:
+        """
+        Deep copy of the closest template for this tuple and goal cluster, or None.
+        The copy carries "template_id".
+        """
+        fields = self._key_fields(language, level_from, level_to, total_weeks)
+        try:
+            with observe(DB_OPERATION_DURATION, "chroma", "curriculum_templates.query"):
+                results = self.collection.query(
+                    query_texts=[goal_text(goals)],
+                    n_results=1,
+                    where={"$and": [{k: v} for k, v in fields.items()]},
+                    include=["metadatas", "distances"],
+                )
+        except Exception as e:
+            logger.warning(f"Curriculum template lookup failed: {e}")
+            record_cache("curriculum_template", False)
+            return None
+
+        template = None
+        if results["ids"] and results["ids"][0] and 1.0 - results["distances"][0][0] >= self.threshold:
+            template = copy.deepcopy(json.loads(results["metadatas"][0][0]["plan"]))
+            template["template_id"] = results["ids"][0][0]
+
+        record_cache("curriculum_template", template is not None)
+        return template
+
+    def save(self, language: str, level_from: Any, level_to: Any, total_weeks: int, goals: Any, curriculum: Dict) -> str:
+        """Store an LLM-generated curriculum as the template for its tuple and goals. Returns the template id."""
+        fields = self._key_fields(language, level_from, level_to, total_weeks)
+        text = goal_text(goals)
+        template_id = hashlib.sha1(json.dumps([fields, text], sort_keys=True).encode("utf-8")).hexdigest()
+        plan = {k: curriculum[k] for k in TEMPLATE_FIELDS if k in curriculum}
+
+        try:
+            with observe(DB_OPERATION_DURATION, "chroma", "curriculum_templates.upsert"):
+                self.collection.upsert(
+                    ids=[template_id],
+                    documents=[text],
+                    metadatas=[{**fields, "created_at": time.time(), "plan": json.dumps(plan, ensure_ascii=False)}],
+                )
+            logger.info(f"Curriculum template saved: {fields} goals='{text}'")
+        except Exception as e:
+            logger.warning(f"Failed to save curriculum template: {e}")
+        return template_id
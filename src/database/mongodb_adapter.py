@@ -1,18 +1,54 @@
 
 import logging
 from typing import Optional, Dict
-from datetime import datetime
-from pymongo import MongoClient
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient, ReturnDocument, UpdateOne, monitoring
 from pymongo.errors import DuplicateKeyError
 
+from src.utils.error_summary import summary_document, summary_update
+from src.utils.metrics import DB_OPERATION_DURATION
+
 logger = logging.getLogger(__name__)
 
+# Where a saved plan came from; fields a new plan does not set are removed, not kept from the old one
+PLAN_SOURCE_FIELDS = ("template_id", "fallback", "personalized")
+
+
+def _plan_update(curriculum: Dict) -> Dict:
+    update = {"$set": curriculum}
+    stale = {field: "" for field in PLAN_SOURCE_FIELDS if field not in curriculum}
+    if stale:
+        update["$unset"] = stale
+    return update
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records the duration of every MongoDB command in DB_OPERATION_DURATION."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        DB_OPERATION_DURATION.labels("mongo", event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        DB_OPERATION_DURATION.labels("mongo", event.command_name).observe(event.duration_micros / 1e6)
+
+
 class LanguageLearningDB:
     """MongoDB adapter for language learning system"""
 
+    _vocabulary_indexes_ready = False
+    _alignment_indexes_ready = False
+
     def __init__(self, database_url: str = "mongodb://localhost:27017"):
         try:
-            self.client = MongoClient(database_url, serverSelectionTimeoutMS=5000)
+            self.client = MongoClient(
+                database_url,
+                serverSelectionTimeoutMS=5000,
+                event_listeners=[MongoCommandMetrics()],
+            )
             self.db = self.client["language_learning"]
             logger.info("MongoDB connected successfully")
         except Exception as e:
@@ -83,6 +119,108 @@ class LanguageLearningDB:
             logger.error(f"Error retrieving vocabulary for {student_id}: {exc}")
             return []
 
+    def _ensure_vocabulary_indexes(self) -> None:
+        """(student_id, due_at) serves the review due-queue, (student_id, word) the session lookups."""
+        if LanguageLearningDB._vocabulary_indexes_ready:
+            return
+        try:
+            self.db.vocabulary.create_index([("student_id", ASCENDING), ("due_at", ASCENDING)], name="student_due_at")
+            self.db.vocabulary.create_index([("student_id", ASCENDING), ("word", ASCENDING)], name="student_word")
+            LanguageLearningDB._vocabulary_indexes_ready = True
+        except Exception as e:
+            logger.warning(f"Could not create vocabulary indexes: {e}")
+
+    def get_due_vocabulary(
+        self,
+        student_id: str,
+        limit: int = 20,
+        now: Optional[datetime] = None,
+        include_upcoming: bool = False,
+    ) -> list[Dict]:
+        """
+        The student's vocabulary items due for review (due_at <= now), most overdue first;
+        with include_upcoming, topped up with the items due next.
+        A range scan on the (student_id, due_at) index that stops after `limit` items.
+        """
+        self._ensure_vocabulary_indexes()
+        query = {"student_id": student_id}
+        if not include_upcoming:
+            query["due_at"] = {"$lte": now or datetime.utcnow()}
+        try:
+            cursor = (
+                self.db.vocabulary
+                .find(query)
+                .sort("due_at", ASCENDING)
+                .limit(limit)
+            )
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"Error retrieving due vocabulary for {student_id}: {e}")
+            return []
+
+    def get_vocabulary_items(self, student_id: str, words: list[str]) -> list[Dict]:
+        """Vocabulary items of a student by word, in one query."""
+        self._ensure_vocabulary_indexes()
+        try:
+            return list(self.db.vocabulary.find({"student_id": student_id, "word": {"$in": list(words)}}))
+        except Exception as e:
+            logger.error(f"Error retrieving vocabulary items for {student_id}: {e}")
+            return []
+
+    def add_vocabulary_items(self, student_id: str, items: list[Dict]) -> int:
+        """
+        Upsert words into the student's vocabulary (by word and language). New words
+        are due immediately; the review schedule of known words is left untouched.
+        Returns the number of items stored (new or already known).
+        """
+        if not items:
+            return 0
+        self._ensure_vocabulary_indexes()
+        try:
+            now = datetime.utcnow()
+            operations = []
+            for item in items:
+                fields = {k: v for k, v in item.items() if k not in ("repetitions", "interval_days", "ease", "due_at")}
+                fields["student_id"] = student_id
+                operations.append(UpdateOne(
+                    {"student_id": student_id, "word": item["word"], "language": item.get("language")},
+                    {
+                        "$set": fields,
+                        "$setOnInsert": {"repetitions": 0, "interval_days": 0, "ease": 2.5, "due_at": now, "created_at": now},
+                    },
+                    upsert=True,
+                ))
+            result = self.db.vocabulary.bulk_write(operations, ordered=False)
+            return result.upserted_count + result.matched_count
+        except Exception as e:
+            logger.error(f"Error adding vocabulary for {student_id}: {e}")
+            return 0
+
+    def update_vocabulary_schedules(self, updates: list[Dict]) -> int:
+        """Apply the new review schedules of a session ([{_id, **fields}]) in one bulk_write."""
+        if not updates:
+            return 0
+        try:
+            operations = [
+                UpdateOne({"_id": update["_id"]}, {"$set": {k: v for k, v in update.items() if k != "_id"}})
+                for update in updates
+            ]
+            result = self.db.vocabulary.bulk_write(operations, ordered=False)
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"Error updating vocabulary schedules: {e}")
+            return 0
+
+    def backfill_vocabulary_due_at(self) -> int:
+        """Make vocabulary stored before review scheduling due now. Returns the number of items updated."""
+        self._ensure_vocabulary_indexes()
+        try:
+            result = self.db.vocabulary.update_many({"due_at": {"$exists": False}}, {"$set": {"due_at": datetime.utcnow()}})
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"Error backfilling vocabulary due dates: {e}")
+            return 0
+
     def get_student_errors(
         self,
         student_id: str,
@@ -115,6 +253,48 @@ class LanguageLearningDB:
         except Exception as e:
             logger.error(f"Error retrieving errors for {student_id}: {e}")
             return []
+
+    def record_student_errors(self, student_id: str, errors: list[Dict]) -> int:
+        """
+        Store new errors and fold them into the student's error summary
+        (one insert_many plus one $inc upsert). Returns the number stored.
+        """
+        if not errors:
+            return 0
+        try:
+            now = datetime.utcnow()
+            documents = [{**e, "student_id": student_id, "created_at": e.get("occurred_at") or now} for e in errors]
+            self.db.student_errors.insert_many(documents, ordered=False)
+            self.db.student_error_summary.update_one({"_id": student_id}, summary_update(errors, now), upsert=True)
+            return len(documents)
+        except Exception as e:
+            logger.error(f"Error recording errors for {student_id}: {e}")
+            return 0
+
+    def rebuild_error_summary(self, student_id: str) -> bool:
+        """Recompute a student's error summary from the raw error log (migration / repair)."""
+        try:
+            errors = [
+                {**e, "occurred_at": e.get("occurred_at") or e.get("created_at")}
+                for e in self.db.student_errors.find({"student_id": student_id})
+            ]
+            if errors:
+                self.db.student_error_summary.replace_one({"_id": student_id}, summary_document(errors), upsert=True)
+            else:
+                self.db.student_error_summary.delete_one({"_id": student_id})
+            return True
+        except Exception as e:
+            logger.error(f"Error rebuilding error summary for {student_id}: {e}")
+            return False
+
+    def get_error_summary(self, student_id: str) -> Optional[Dict]:
+        """Materialized error counts and decayed weights of a student (see src/utils/error_summary.py)."""
+        try:
+            return self.db.student_error_summary.find_one({"_id": student_id})
+        except Exception as e:
+            logger.error(f"Error reading error summary for {student_id}: {e}")
+            return None
+
     def save_lesson_session(self, lesson_data: Dict) -> str:
         """
         Save a completed lesson session to the database.
@@ -147,20 +327,162 @@ class LanguageLearningDB:
 
 
     def save_assessment_result(self, assessment_data: Dict) -> str:
-        """Save assessment/quiz results."""
+        """Save assessment/quiz results. Returns the inserted id (empty string on failure)."""
         try:
-            profile["_id"] = profile.get("student_id") or profile["_id"]
-            profile.setdefault("created_at", datetime.utcnow())
-            profile["updated_at"] = datetime.utcnow()
+            assessment_data.setdefault("created_at", datetime.utcnow())
+            result = self.db.assessments.insert_one(assessment_data)
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error saving assessment result: {e}")
+            return ""
 
-            self.db.students.update_one(
-                {"_id": profile["_id"]},
-                {"$set": profile},
-                upsert=True
+    def save_assessment_results(self, results: list[Dict]) -> int:
+        """Bulk-insert the graded answer sheets of a cohort. Returns the number inserted."""
+        if not results:
+            return 0
+        try:
+            now = datetime.utcnow()
+            for doc in results:
+                doc.setdefault("created_at", now)
+            result = self.db.assessments.insert_many(results, ordered=False)
+            logger.info(f"Saved {len(result.inserted_ids)} assessment results")
+            return len(result.inserted_ids)
+        except Exception as e:
+            logger.error(f"Error saving assessment results: {e}")
+            return 0
+
+    def save_quiz_statistics(self, quiz_id: str, statistics: Dict) -> bool:
+        """Upsert the item statistics (difficulty, discrimination) of a graded quiz."""
+        try:
+            statistics["updated_at"] = datetime.utcnow()
+            self.db.quiz_statistics.update_one({"_id": quiz_id}, {"$set": statistics}, upsert=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving quiz statistics for {quiz_id}: {e}")
+            return False
+
+    def get_students(self, student_ids: list[str]) -> list[Dict]:
+        """Get several student profiles in one query."""
+        try:
+            return list(self.db.students.find({"_id": {"$in": list(student_ids)}}))
+        except Exception as e:
+            logger.error(f"Error reading students: {e}")
+            return []
+
+    def get_curricula(self, student_ids: list[str]) -> Dict[tuple, Dict]:
+        """
+        Get the curricula of several students in one query.
+        Returns {(student_id, language): curriculum}.
+        """
+        try:
+            cursor = self.db.curriculums.find({"student_id": {"$in": list(student_ids)}})
+            return {(c["student_id"], c.get("language")): c for c in cursor}
+        except Exception as e:
+            logger.error(f"Error reading curricula: {e}")
+            return {}
+
+    def get_curricula_by_ids(self, curriculum_ids: list[str]) -> Dict[str, Dict]:
+        """
+        Get curricula by their document ids in one query.
+        Returns {curriculum_id: curriculum}.
+        """
+        try:
+            ids = [ObjectId(cid) if ObjectId.is_valid(cid) else cid for cid in curriculum_ids]
+            return {str(c["_id"]): c for c in self.db.curriculums.find({"_id": {"$in": ids}})}
+        except Exception as e:
+            logger.error(f"Error reading curricula by id: {e}")
+            return {}
+
+    def _ensure_alignment_indexes(self) -> None:
+        """Bulk alignment runs are read back by run id (and owner / plan)."""
+        if LanguageLearningDB._alignment_indexes_ready:
+            return
+        try:
+            self.db.alignment_exercises.create_index([("run_id", ASCENDING), ("index", ASCENDING)], name="run_index")
+            self.db.alignment_plans.create_index([("run_id", ASCENDING), ("owners", ASCENDING)], name="run_owners")
+            self.db.exercise_alignments.create_index(
+                [("run_id", ASCENDING), ("plan_fingerprint", ASCENDING), ("exercise_index", ASCENDING)],
+                name="run_plan_exercise",
             )
-            logger.info(f"Student {profile['_id']} created/updated")
+            LanguageLearningDB._alignment_indexes_ready = True
         except Exception as e:
-            logger.error(f"Error creating student: {e}")
+            logger.warning(f"Could not create alignment indexes: {e}")
+
+    def save_alignment_exercises(self, run_id: str, exercises: list[Dict]) -> int:
+        """Store the question bank of a bulk alignment run (one document per exercise)."""
+        if not exercises:
+            return 0
+        self._ensure_alignment_indexes()
+        try:
+            now = datetime.utcnow()
+            result = self.db.alignment_exercises.insert_many(
+                [{"run_id": run_id, "index": i, "exercise": exercise, "created_at": now} for i, exercise in enumerate(exercises)],
+                ordered=False,
+            )
+            return len(result.inserted_ids)
+        except Exception as e:
+            logger.error(f"Error saving exercises of alignment run {run_id}: {e}")
+            return 0
+
+    def get_alignment_exercises(self, run_id: str) -> list[Dict]:
+        self._ensure_alignment_indexes()
+        try:
+            cursor = self.db.alignment_exercises.find({"run_id": run_id}).sort("index", ASCENDING)
+            return [doc["exercise"] for doc in cursor]
+        except Exception as e:
+            logger.error(f"Error reading exercises of alignment run {run_id}: {e}")
+            return []
+
+    def save_exercise_alignments(self, run_id: str, plans: list[Dict], assignments: list[Dict]) -> int:
+        """
+        Store the result of a bulk alignment run: one document per distinct plan
+        (plan_fingerprint, owners) and one per (plan, exercise) assignment.
+        Returns the number of assignments stored.
+        """
+        self._ensure_alignment_indexes()
+        try:
+            now = datetime.utcnow()
+            if plans:
+                self.db.alignment_plans.insert_many(
+                    [{**plan, "run_id": run_id, "created_at": now} for plan in plans], ordered=False
+                )
+            if not assignments:
+                return 0
+            result = self.db.exercise_alignments.insert_many(
+                [{**assignment, "run_id": run_id} for assignment in assignments], ordered=False
+            )
+            return len(result.inserted_ids)
+        except Exception as e:
+            logger.error(f"Error saving alignments of run {run_id}: {e}")
+            return 0
+
+    def get_alignment_plans(self, run_id: str, owner: Optional[str] = None) -> list[Dict]:
+        """Plans of an alignment run (only the one of `owner` if given)."""
+        self._ensure_alignment_indexes()
+        query = {"run_id": run_id}
+        if owner:
+            query["owners"] = owner
+        try:
+            return list(self.db.alignment_plans.find(query, {"_id": 0}))
+        except Exception as e:
+            logger.error(f"Error reading plans of alignment run {run_id}: {e}")
+            return []
+
+    def get_exercise_alignments(self, run_id: str, plan_fingerprint: str, skip: int = 0, limit: int = 500) -> list[Dict]:
+        """One page of a plan's per-exercise assignments, in exercise order."""
+        self._ensure_alignment_indexes()
+        try:
+            cursor = (
+                self.db.exercise_alignments
+                .find({"run_id": run_id, "plan_fingerprint": plan_fingerprint}, {"_id": 0, "run_id": 0})
+                .sort("exercise_index", ASCENDING)
+                .skip(skip)
+                .limit(limit)
+            )
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"Error reading alignments of run {run_id}: {e}")
+            return []
 
     def get_curriculum(self, student_id: str, language: Optional[str] = None) -> Optional[Dict]:
         try:
@@ -184,7 +506,7 @@ class LanguageLearningDB:
                 
             self.db.curriculums.update_one(
                 query,
-                {"$set": curriculum},
+                _plan_update(curriculum),
                 upsert=True
             )
             logger.info(f"Curriculum saved for {student_id} (Language: {language})")
@@ -192,6 +514,47 @@ class LanguageLearningDB:
             logger.error(f"Error saving curriculum for {student_id}: {e}")
             return False
 
+    def save_curricula(self, curricula: list[Dict]) -> int:
+        """
+        Upsert many curricula (each with student_id and language) in one bulk_write.
+        Returns the number of inserted + modified documents.
+        """
+        if not curricula:
+            return 0
+        try:
+            now = datetime.utcnow().isoformat()
+            operations = []
+            for curriculum in curricula:
+                curriculum["updated_at"] = now
+                query = {"student_id": curriculum["student_id"]}
+                if curriculum.get("language"):
+                    query["language"] = curriculum["language"]
+                operations.append(UpdateOne(query, _plan_update(curriculum), upsert=True))
+            result = self.db.curriculums.bulk_write(operations, ordered=False)
+            saved = result.upserted_count + result.modified_count
+            logger.info(f"Bulk-saved {saved} curricula")
+            return saved
+        except Exception as e:
+            logger.error(f"Error bulk-saving curricula: {e}")
+            return 0
+
+    def get_topic_index(self, index_id: str) -> Optional[Dict]:
+        """Stored topic embedding matrix of a curriculum (see src/utils/topic_index.py)."""
+        try:
+            return self.db.curriculum_topic_index.find_one({"_id": index_id})
+        except Exception as e:
+            logger.error(f"Error reading topic index {index_id}: {e}")
+            return None
+
+    def save_topic_index(self, index_doc: Dict) -> bool:
+        try:
+            index_doc["updated_at"] = datetime.utcnow()
+            self.db.curriculum_topic_index.replace_one({"_id": index_doc["_id"]}, index_doc, upsert=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving topic index {index_doc.get('_id')}: {e}")
+            return False
+
     def save_chat_interaction(self, student_id: str, question: str, answer: str) -> bool:
         """Save a single chat Q&A pair."""
         try:
@@ -228,6 +591,56 @@ class LanguageLearningDB:
             logger.error(f"Error getting chat history: {e}")
             return []
 
+    def get_chat_interactions_after(self, student_id: str, watermark: Optional[Dict] = None, limit: int = 10) -> list[Dict]:
+        """
+        Chat interactions newer than the watermark ({"created_at", "_id"} of the last
+        evaluated one), oldest first: the `limit` oldest after the watermark, so it
+        can advance batch by batch. Without a watermark, the last `limit` interactions.
+        """
+        try:
+            query = {"student_id": student_id}
+            if watermark:
+                query["$or"] = [
+                    {"created_at": {"$gt": watermark["created_at"]}},
+                    {"created_at": watermark["created_at"], "_id": {"$gt": watermark["_id"]}},
+                ]
+                cursor = self.db.chat_interactions.find(query).sort([("created_at", 1), ("_id", 1)]).limit(limit)
+                return list(cursor)
+            cursor = self.db.chat_interactions.find(query).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+            return list(cursor)[::-1]
+        except Exception as e:
+            logger.error(f"Error getting new chat interactions for {student_id}: {e}")
+            return []
+
+    def get_chat_evaluation_state(self, student_id: str) -> Optional[Dict]:
+        """Rolling chat evaluation aggregate and watermark of a student."""
+        try:
+            return self.db.chat_evaluation_state.find_one({"_id": student_id})
+        except Exception as e:
+            logger.error(f"Error reading chat evaluation state for {student_id}: {e}")
+            return None
+
+    def advance_chat_evaluation_state(self, student_id: str, previous_watermark: Optional[Dict], state: Dict) -> bool:
+        """
+        Store the new aggregate only if the watermark is still the one the evaluation
+        started from (a concurrent evaluation of the same pairs loses). Returns success.
+        """
+        try:
+            state["updated_at"] = datetime.utcnow()
+            if previous_watermark is None:
+                self.db.chat_evaluation_state.insert_one({"_id": student_id, **state})
+                return True
+            result = self.db.chat_evaluation_state.update_one(
+                {"_id": student_id, "watermark._id": previous_watermark["_id"]},
+                {"$set": state},
+            )
+            return result.matched_count == 1
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            logger.error(f"Error saving chat evaluation state for {student_id}: {e}")
+            return False
+
     def save_chat_evaluation(self, evaluation_data: Dict) -> bool:
         """
         Save the evaluation result of a chat session.
@@ -260,3 +673,110 @@ class LanguageLearningDB:
         except Exception as e:
             logger.error(f"Error retrieving all students: {e}")
             return []
+
+    def create_job(self, job_data: Dict) -> bool:
+        """Persist a new background job (job_data["_id"] is the job id)."""
+        try:
+            job_data["created_at"] = datetime.utcnow()
+            job_data["updated_at"] = job_data["created_at"]
+            self.db.generation_jobs.insert_one(job_data)
+            return True
+        except Exception as e:
+            logger.error(f"Error creating job: {e}")
+            return False
+
+    def claim_job(self, job_id: str, worker_id: str, lease_s: float) -> Optional[Dict]:
+        """
+        Atomically move a queued job (or a running one whose lease expired) to
+        "running", owned by worker_id until lease_until.
+        Returns the job, or None if another worker holds it or it does not exist.
+        """
+        try:
+            now = datetime.utcnow()
+            return self.db.generation_jobs.find_one_and_update(
+                {"_id": job_id, "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_until": {"$lt": now}},
+                    {"status": "running", "lease_until": None},
+                ]},
+                {
+                    "$set": {
+                        "status": "running",
+                        "worker_id": worker_id,
+                        "lease_until": now + timedelta(seconds=lease_s),
+                        "started_at": now,
+                        "updated_at": now,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            logger.error(f"Error claiming job {job_id}: {e}")
+            return None
+
+    def renew_job_lease(self, job_id: str, worker_id: str, lease_s: float) -> bool:
+        """Extend the lease of a running job; False if worker_id no longer owns it."""
+        try:
+            now = datetime.utcnow()
+            result = self.db.generation_jobs.update_one(
+                {"_id": job_id, "status": "running", "worker_id": worker_id},
+                {"$set": {"lease_until": now + timedelta(seconds=lease_s), "updated_at": now}},
+            )
+            return result.matched_count == 1
+        except Exception as e:
+            logger.error(f"Error renewing lease of job {job_id}: {e}")
+            return False
+
+    def update_job(self, job_id: str, fields: Dict, worker_id: Optional[str] = None) -> bool:
+        """
+        Set fields of a job. With worker_id, only while that worker still holds the
+        job (False if it was taken over); False on a database error.
+        """
+        try:
+            fields["updated_at"] = datetime.utcnow()
+            query = {"_id": job_id}
+            if worker_id is not None:
+                query["worker_id"] = worker_id
+            result = self.db.generation_jobs.update_one(query, {"$set": fields})
+            return worker_id is None or result.matched_count == 1
+        except Exception as e:
+            logger.error(f"Error updating job {job_id}: {e}")
+            return False
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        try:
+            return self.db.generation_jobs.find_one({"_id": job_id})
+        except Exception as e:
+            logger.error(f"Error reading job {job_id}: {e}")
+            return None
+
+    def get_unfinished_jobs(self) -> list[Dict]:
+        """Jobs left queued, or running under an expired (or missing) lease, e.g. by a crashed API process."""
+        try:
+            cursor = self.db.generation_jobs.find(
+                {"$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_until": {"$lt": datetime.utcnow()}},
+                    {"status": "running", "lease_until": None},
+                ]},
+            ).sort("created_at", 1)
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"Error retrieving unfinished jobs: {e}")
+            return []
+
+    def save_generated_content(self, documents: list[Dict]) -> int:
+        """Bulk-insert generated exercises/theory lessons. Returns the number inserted."""
+        if not documents:
+            return 0
+        try:
+            now = datetime.utcnow()
+            for doc in documents:
+                doc.setdefault("created_at", now)
+            result = self.db.generated_content.insert_many(documents, ordered=False)
+            logger.info(f"Saved {len(result.inserted_ids)} generated content items")
+            return len(result.inserted_ids)
+        except Exception as e:
+            logger.error(f"Error saving generated content: {e}")
+            return 0
@@ -0,0 +1,85 @@
+"""
+Canonical identity of a content-generation request.
+
+The same logical request arrives in many shapes: level as 3, "3", "b1" or
+"B1"; topics as a list or a comma-joined string, in any order and casing;
+language as "English" or "english". GenerationKey normalizes all of them so
+caches and dedupe maps recognize identical work.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+
+CEFR_SCALE = ("A1", "A2", "B1", "B2", "C1", "C2")
+
+
+def normalize_level(level: Any) -> str:
+    """3, "3" and "b1" all become "B1" (numeric levels are 1-based, as in the student profile)."""
+    text = str(level).strip().upper()
+    if text.isdigit():
+        return CEFR_SCALE[min(max(int(text), 1), len(CEFR_SCALE)) - 1]
+    return text
+
+
+def normalize_topics(topics: Union[str, Iterable[str], None]) -> Tuple[str, ...]:
+    """Sorted, de-duplicated, case- and whitespace-insensitive topic tuple."""
+    if topics is None:
+        return ()
+    if isinstance(topics, str):
+        topics = topics.split(",")
+    cleaned = {re.sub(r"\s+", " ", str(t)).strip().casefold() for t in topics}
+    return tuple(sorted(t for t in cleaned if t))
+
+
+def normalize_language(language: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", str(language or "English")).strip().casefold()
+
+
+@dataclass(frozen=True, slots=True)
+class GenerationKey:
+    content_type: str
+    topics: Tuple[str, ...]
+    level: str
+    language: str
+    difficulty: Optional[int] = None
+    variant: int = 0
+    week: Optional[int] = None
+
+    @classmethod
+    def build(
+        cls,
+        content_type: str,
+        topics: Union[str, Iterable[str], None],
+        level: Any,
+        language: Optional[str],
+        difficulty: Optional[int] = None,
+        variant: int = 0,
+        week: Optional[int] = None,
+    ) -> "GenerationKey":
+        return cls(
+            content_type=str(content_type).strip().lower(),
+            topics=normalize_topics(topics),
+            level=normalize_level(level),
+            language=normalize_language(language),
+            difficulty=int(difficulty) if difficulty is not None else None,
+            variant=int(variant),
+            week=int(week) if week is not None else None,
+        )
+
+    @property
+    def topic_text(self) -> str:
+        return "; ".join(self.topics)
+
+    def exact_fields(self) -> Dict[str, Any]:
+        """All fields except topics, None values dropped (for metadata filters)."""
+        fields = asdict(self)
+        fields.pop("topics")
+        return {k: v for k, v in fields.items() if v is not None}
+
+    def digest(self) -> str:
+        """Stable hex id (same across processes, unlike hash())."""
+        return hashlib.sha1(json.dumps(asdict(self), sort_keys=True).encode("utf-8")).hexdigest()
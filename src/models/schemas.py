@@ -60,6 +60,9 @@ class PersonalVocabularySchema(BaseModel):
     repetitions: int = 0
     strength: float = Field(0.5, ge=0.0, le=1.0)
     last_studied: Optional[datetime] = None
+    interval_days: int = 0
+    ease: float = 2.5
+    due_at: Optional[datetime] = None
 
 
 class StudentErrorSchema(BaseModel):
@@ -115,6 +118,18 @@ class TheorySchema(BaseModel):
     content: str
     key_points: List[str] = []
 
+class WeekTopics(BaseModel):
+    week: int
+    topics: List[str]
+
+class CurriculumPlanSchema(BaseModel):
+    """Generated course plan"""
+    total_weeks: int
+    language: str
+    level_from: str
+    level_to: str
+    topics_by_week: List[WeekTopics]
+
 class AlignmentResponse(BaseModel):
     """Result of aligning content to curriculum"""
     week: int
@@ -129,6 +144,8 @@ class ErrorDetail(BaseModel):
     error_description: str
     correction: str
     rule_explanation: Optional[str] = None
+    error_type: Optional[Literal["grammar", "vocabulary", "pronunciation", "spelling"]] = None
+    topic: Optional[str] = None
 
 class ChatEvaluationResponse(BaseModel):
     """Full chat evaluation result"""
@@ -0,0 +1,311 @@
+"""
+Versioned prompt templates.
+
+Every template is a static system message followed by one user message with
+the request's variables. The system message never changes between requests
+of a kind (and all of them start with the same preamble), so the serving
+backend's prefix cache can reuse its KV blocks; only the user message is
+prefilled per request. The user message lists the variables from the most
+shared (language, level) to the most specific (student data, history).
+
+Bump a template's version whenever its text changes; the id
+("theory_lesson@v1") is logged on render and stored with auto-saved theory
+material.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+
+PREAMBLE = """You are an expert language teacher and curriculum designer writing content for the students of a language learning app.
+Follow the task description exactly. When a JSON answer is requested, answer with nothing but that JSON: no markdown, no comments, no explanations.
+"""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: int
+    system: str
+    user: str
+    _system_message: SystemMessage = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_system_message", SystemMessage(content=PREAMBLE + self.system))
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **variables) -> List[BaseMessage]:
+        """[system, user] messages; the system message object is shared by all requests."""
+        logger.debug(f"Rendering prompt {self.id}")
+        return [self._system_message, HumanMessage(content=self.user.format(**variables))]
+
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    PROMPTS[template.name] = template
+    return template
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    return PROMPTS[name]
+
+
+def prompt_versions() -> Dict[str, int]:
+    return {name: template.version for name, template in PROMPTS.items()}
+
+
+THEORY_LESSON = register(PromptTemplate(
+    name="theory_lesson",
+    version=1,
+    system="""
+Task: Create a theoretical lesson for a student interacting with a language learning app.
+
+Requirements:
+1. **Title**: Catchy and relevant.
+2. **Content**:
+   - Use Markdown formatting.
+   - Explain the concept clearly (grammar, vocabulary, or culture).
+   - Provide examples in the target language. If it is not English, provide English translations; do NOT provide translations when teaching English.
+   - Keep it concise but comprehensive enough for the student's level.
+   - If research material is provided, strictly use it to verify facts or provide examples, but structure it as a clean lesson.
+3. **Key Takeaways**: A list of 2-4 crucial points to remember.
+
+Return strictly valid JSON in this format:
+{
+  "type": "theory",
+  "title": "Lesson Title",
+  "topic": "<main topic>",
+  "content": "Markdown string here...",
+  "key_points": ["Point 1", "Point 2", "Point 3"]
+}
+""",
+    user="""Target Language: {language}
+Student Level: {level} (CEFR)
+Current Week: {week}
+Main Topic: {topic}
+{research_material}""",
+))
+
+_EXERCISE_SYSTEM = """
+Task: Create practice exercise of the requested type for the given topics.
+
+Return JSON (ExerciseSchema):
+{
+  "exercise_id": "string",
+  "type": "<requested type>",
+  "topic": "string",
+  "task": "string",
+  "question": "string",
+  "options": ["string"] (optional),
+  "correct_answer": "string",
+  "explanation": "string",
+  "difficulty": <requested difficulty>
+}
+"""
+
+PRACTICE_EXERCISE = register(PromptTemplate(
+    name="practice_exercise",
+    version=1,
+    system=_EXERCISE_SYSTEM,
+    user="""Language: {language}
+Type: {content_type}
+Difficulty: {difficulty}
+Week: {week}
+Topics: {topics}""",
+))
+
+# Same system message as PRACTICE_EXERCISE, so both share the cached prefix
+TOOL_EXERCISE = register(PromptTemplate(
+    name="tool_exercise",
+    version=1,
+    system=_EXERCISE_SYSTEM,
+    user="""Type: {exercise_type}
+Difficulty: {level}
+Topic: {topic}""",
+))
+
+CURRICULUM_ALIGNMENT = register(PromptTemplate(
+    name="curriculum_alignment",
+    version=1,
+    system="""
+Task: Determine where this exercise fits into the provided syllabus.
+
+Return JSON matching this schema:
+{
+  "week": (int),
+  "topic": (string),
+  "confidence_score": (float),
+  "reasoning": (string)
+}
+""",
+    user="""Syllabus:
+{syllabus}
+
+Exercise:
+{exercise}""",
+))
+
+CHAT_EVALUATION = register(PromptTemplate(
+    name="chat_evaluation",
+    version=2,
+    system="""
+Task: Evaluate the following student answers from the chat history.
+
+Return JSON matching schema:
+{
+  "overall_score": (0-100),
+  "detailed_feedback": "string",
+  "all_errors": [
+    {
+       "question_index": (int),
+       "student_answer": (string),
+       "error_description": (string),
+       "correction": (string),
+       "rule_explanation": (string),
+       "error_type": ("grammar" | "vocabulary" | "spelling" | "pronunciation"),
+       "topic": (string, the grammar or vocabulary topic in English, e.g. "Past Simple")
+    }
+  ],
+  "improvement_plan": "string",
+  "follow_up_questions": ["string"]
+}
+""",
+    user="""Chat History:
+{chat_history}""",
+))
+
+CURRICULUM_PLAN = register(PromptTemplate(
+    name="curriculum_plan",
+    version=1,
+    system="""
+Task: Design a week-by-week course plan for the requested number of weeks. Write names of topics only in English language. 1-2 topics per week.
+
+Answer with this exact JSON:
+{
+  "total_weeks": <number of weeks>,
+  "language": "<language>",
+  "level_from": "<student level>",
+  "level_to": "<target level>",
+  "topics_by_week": [
+    {"week": 1, "topics": ["Greetings & Introductions", "Alphabet & Pronunciation"]},
+    {"week": 2, "topics": ["Numbers 1-100", "Telling Time", "Days & Months"]},
+    {"week": 3, "topics": ["Family Members", "Possessive Adjectives"]},
+    {"week": 4, "topics": ["Daily Routine", "Present Simple"]}
+  ]
+}
+Continue the list until the last week. The topics above are only an example; choose topics that fit the student's level and goal.
+""",
+    user="""Language: {language}
+Student level: {level_from}
+Target level: {level_to}
+Goal: {goals}
+Create a {total_weeks}-week course plan.""",
+))
+
+CURRICULUM_PERSONALIZATION = register(PromptTemplate(
+    name="curriculum_personalization",
+    version=1,
+    system="""
+Task: You get a course plan and a student's goal. Adapt it to this student's goal.
+Keep the grammar progression and the number of weeks; replace at most a third of the topics with goal-specific ones.
+Write names of topics only in English language.
+
+ANSWER WITH NOTHING BUT A JSON ARRAY in the same format: [{"week": 1, "topics": ["..."]}, ...]
+""",
+    user="""Plan ({total_weeks} weeks, {level_from} -> {level_to}):
+{base_plan}
+
+Goal: {goals}""",
+))
+
+DIALOGUE = register(PromptTemplate(
+    name="dialogue",
+    version=1,
+    system="""
+Task: Generate dialogue for practice in the given situation.
+
+Return JSON (DialogueSchema):
+{
+  "dialogue_id": "string",
+  "topic": "string",
+  "situation": "string",
+  "level": <requested level>,
+  "lines": [{"speaker": "A", "text": "...", "translation": "..."}],
+  "key_phrases": ["..."],
+  "cultural_notes": "..."
+}
+""",
+    user="""Level: {level}
+Topic: {topic}
+Situation: {situation}""",
+))
+
+GRAMMAR_EXPLANATION = register(PromptTemplate(
+    name="grammar_explanation",
+    version=1,
+    system="""
+Task: Explain the following grammar rule in simple terms.
+Provide a clear, beginner-friendly explanation with examples.
+Keep it concise (3-4 sentences max). Answer in plain text.
+""",
+    user="""Rule: {rule}
+Examples: {examples}""",
+))
+
+RESEARCH_SYNTHESIS = register(PromptTemplate(
+    name="research_synthesis",
+    version=1,
+    system="""
+Task: Use the retrieved textbook material to write **a coherent theoretical lesson**.
+If the retrieved material is relevant, base your explanation strictly on it.
+If it is not relevant, rely on your general knowledge but mention that no textbook source was found.
+
+Return a markdown response with:
+- Title
+- Clear Explanation
+- Examples
+- Key Takeaways
+""",
+    user="""Language: {language}
+User level: {level}
+Topic: {topic}
+
+--- Retrieved Textbook Content ---
+{retrieved}
+-------------------------""",
+))
+
+LESSON_PLAN = register(PromptTemplate(
+    name="lesson_plan",
+    version=1,
+    system="""
+Task: Design a lesson with four parts:
+1. Warmup (5 minutes)
+2. New content or review (15 minutes)
+3. Practice exercises (20 minutes)
+4. Consolidation and summary (10 minutes)
+
+Return response in JSON:
+{
+  "outline": ["Warmup: ...", "New content: ...", "Practice: ...", "Review: ..."],
+  "estimated_total_minutes": 50
+}
+""",
+    user="""Target language: {target_language}
+Level: {level}/5
+Learning style: {learning_style}
+Phase: {phase}
+Available tools: {tools}
+Topic: {topic}
+Student name: {name}""",
+))
@@ -0,0 +1,167 @@
+"""
+Background job queue for long-running generation requests.
+
+Jobs are persisted in the MongoDB `generation_jobs` collection and executed
+by a local thread pool, so the HTTP request only has to enqueue the job and
+return its id. Job lifecycle: queued -> running -> done | failed.
+
+A running job is leased to one worker (worker_id, lease_until) and the lease
+is renewed by a heartbeat while the handler runs. Only jobs whose lease has
+expired, i.e. whose worker died, are picked up again by recover().
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.database.mongodb_adapter import LanguageLearningDB
+
+logger = logging.getLogger(__name__)
+
+
+FINISHED_STATUSES = ("done", "failed")
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Attempts to store a job's final state before it is marked failed with a short error
+JOB_UPDATE_ATTEMPTS = int(os.getenv("JOB_UPDATE_ATTEMPTS", "3"))
+
+
+class GenerationJobQueue:
+    """
+    Persistent job queue with a worker pool.
+
+    Args:
+        db: Database adapter used as the job store
+        handlers: Job kind -> callable executing it: handler(params) -> result dict.
+            A result containing "error" marks the job as failed.
+        max_workers: Number of concurrent worker threads
+        lease_s: Lease of a running job, renewed every lease_s / 3 seconds
+    """
+
+    def __init__(
+        self,
+        db: LanguageLearningDB,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+        max_workers: int = 4,
+        lease_s: float = JOB_LEASE_SECONDS,
+    ):
+        self.db = db
+        self.handlers = handlers
+        self.lease_s = lease_s
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation-job")
+        logger.info(f"GenerationJobQueue {self.worker_id} started with {max_workers} workers")
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Optional[str]:
+        """Persist a job and schedule it. Returns the job id (None if it could not be stored)."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "_id": job_id,
+            "kind": kind,
+            "params": params,
+            "status": "queued",
+            "result": None,
+            "error": None,
+        }
+        if not self.db.create_job(job):
+            return None
+
+        self.executor.submit(self._run, job_id)
+        logger.info(f"Job {job_id} ({kind}) queued")
+        return job_id
+
+    def recover(self) -> int:
+        """Re-schedule queued jobs and running jobs whose worker stopped renewing the lease."""
+        jobs = self.db.get_unfinished_jobs()
+        for job in jobs:
+            self.executor.submit(self._run, job["_id"])
+
+        if jobs:
+            logger.info(f"Recovered {len(jobs)} unfinished jobs")
+        return len(jobs)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.db.get_job(job_id)
+        if job:
+            job["job_id"] = job.pop("_id")
+        return job
+
+    def wait_for_change(self, job_id: str, last_status: Optional[str], timeout: float = 15.0,
+                        poll_interval: float = 0.25) -> Optional[Dict]:
+        """
+        Block until the job status differs from last_status (or timeout).
+        Used by the Server-Sent Events endpoint; call from a worker thread.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.get("status") != last_status or time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _heartbeat(self, job_id: str, stop: threading.Event) -> None:
+        while not stop.wait(self.lease_s / 3):
+            if not self.db.renew_job_lease(job_id, self.worker_id, self.lease_s):
+                logger.warning(f"Job {job_id}: lease renewal failed")
+
+    def _finish(self, job_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Store the job's final state while this worker still holds it; if that keeps
+        failing, mark it failed with a short error. True if stored.
+        """
+        fields = {**fields, "lease_until": None}
+        for attempt in range(JOB_UPDATE_ATTEMPTS):
+            if self.db.update_job(job_id, dict(fields), worker_id=self.worker_id):
+                return True
+            job = self.db.get_job(job_id)
+            if job and job.get("worker_id") != self.worker_id:
+                logger.warning(f"Job {job_id} was taken over by {job.get('worker_id')}, result discarded")
+                return False
+            time.sleep(0.5 * (attempt + 1))
+
+        logger.error(f"Job {job_id}: could not store its {fields['status']} state")
+        if not self.db.update_job(job_id, {
+            "status": "failed",
+            "result": None,
+            "error": f"Could not store the job {fields['status']} state",
+            "duration_s": fields.get("duration_s"),
+            "lease_until": None,
+        }, worker_id=self.worker_id):
+            logger.error(f"Job {job_id}: could not mark it failed; it is retried once its lease expires")
+        return False
+
+    def _run(self, job_id: str) -> None:
+        job = self.db.claim_job(job_id, self.worker_id, self.lease_s)
+        if not job:
+            return
+
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, stop), daemon=True).start()
+        start = time.perf_counter()
+        try:
+            handler = self.handlers[job["kind"]]
+            result = handler(job.get("params", {}))
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            result = {"error": str(e)}
+        finally:
+            stop.set()
+
+        duration = round(time.perf_counter() - start, 3)
+        if isinstance(result, dict) and "error" in result:
+            self._finish(job_id, {"status": "failed", "error": result["error"], "duration_s": duration})
+            logger.warning(f"Job {job_id} failed after {duration}s: {result['error']}")
+        else:
+            if self._finish(job_id, {"status": "done", "result": result, "duration_s": duration}):
+                logger.info(f"Job {job_id} done in {duration}s")
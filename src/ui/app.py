@@ -8,6 +8,7 @@ from src.agents.language_tutor_agent import LanguageTutorAgent
 from src.agents.curriculum_planner_agent import CurriculumPlannerAgent
 from src.agents.unified_teacher_agent import UnifiedTeacherAgent
 from src.database.mongodb_adapter import LanguageLearningDB
+from src.utils.answer_matching import check_answer
 import base64
 import datetime
 
@@ -629,28 +630,46 @@ if st.session_state.current_student:
             content_type = CONTENT_TYPE_MAP[selected_type_label]
             
         if st.button("Generate Content", key="btn_gen_content"):
-            with st.spinner(f"Generating {selected_type_label} for Week {target_week}..."):
+            streamed_content = False
+            
+            if content_type == "theory":
+                 
+                 
+                current_topics = []
                 
-                if content_type == "theory":
-                     
-                     
-                    current_topics = []
-                    
-                    if st.session_state.curriculum and "topics_by_week" in st.session_state.curriculum:
-                        for w_data in st.session_state.curriculum["topics_by_week"]:
-                             if w_data["week"] == target_week:
-                                 current_topics = w_data["topics"]
-                                 break
-                    
-                    topic_str = ", ".join(current_topics) if current_topics else "General"
-                    
-                    gen_result = st.session_state.theory_agent.generate_theory(
+                if st.session_state.curriculum and "topics_by_week" in st.session_state.curriculum:
+                    for w_data in st.session_state.curriculum["topics_by_week"]:
+                         if w_data["week"] == target_week:
+                             current_topics = w_data["topics"]
+                             break
+                
+                topic_str = ", ".join(current_topics) if current_topics else "General"
+                
+                
+                st.markdown("---")
+                title_slot = st.empty()
+                title_slot.caption(f"Writing {selected_type_label} for Week {target_week}...")
+                stream_state = {"result": {}, "tokens": 0}
+                
+                def theory_tokens():
+                    for event in st.session_state.theory_agent.stream_theory(
                         topic=topic_str,
                         week=target_week,
                         level=student_info.get("current_level", "A1"), 
                         language=student_info.get("target_language", "English")
-                    )
-                else:
+                    ):
+                        if event["event"] == "token":
+                            stream_state["tokens"] += 1
+                            yield event["data"]
+                        else:
+                            stream_state["result"] = event["data"]
+                
+                st.write_stream(theory_tokens())
+                gen_result = stream_state["result"]
+                # A fallback lesson replaces what was streamed, so it still has to be rendered
+                streamed_content = stream_state["tokens"] > 0 and not gen_result.get("fallback")
+            else:
+                with st.spinner(f"Generating {selected_type_label} for Week {target_week}..."):
                     
                     params = {
                         "week": target_week,
@@ -666,17 +685,19 @@ if st.session_state.current_student:
             if "error" in gen_result:
                 st.error(f"Generation failed: {gen_result['error']}")
             else:
-                st.markdown("---")
                 
                 if gen_result.get("type") == "theory":
-                     st.subheader(f"📚 {gen_result.get('title', 'Theory Lesson')}")
-                     st.caption(f"Topic: {gen_result.get('topic', 'General')}")
+                     with title_slot.container():
+                         st.subheader(f"📚 {gen_result.get('title', 'Theory Lesson')}")
+                         st.caption(f"Topic: {gen_result.get('topic', 'General')}")
                      
-                     st.markdown(gen_result.get("content", ""))
+                     if not streamed_content:
+                         st.markdown(gen_result.get("content", ""))
                      
                      if gen_result.get("key_points"):
                          st.info("**Key Takeaways:**\n" + "\n".join([f"- {p}" for p in gen_result["key_points"]]))
                 else:
+                    st.markdown("---")
                     st.subheader(f"Week {target_week} Exercise")
                     st.write(f"**Topic:** {gen_result.get('topic', 'General')}")
                     st.write(f"**Question:** {gen_result.get('question', '')}")
@@ -836,26 +857,14 @@ if st.session_state.current_student:
             if current_result is None:
                 if st.button("Check Answer", key=check_key):
                     correct_val = current_q.get('correct_answer', '')
-                    is_correct = False
-                    
-                    if answer_type == "choice":
-                        
-                        
-                        
-                        
-                        
-                        
-                        u_ans = user_answer.strip()
-                        c_ans = correct_val.strip()
-                        
-                        
-                        u_letter = u_ans.split(')')[0].strip() if ')' in u_ans else u_ans
-                        
-                        is_correct = (u_ans == c_ans) or (u_letter == c_ans) or (u_ans in c_ans)
-                    else:
-                        is_correct = (user_answer.lower().strip() == correct_val.lower().strip())
-                    
-                    
+                    match = check_answer(
+                        current_q, user_answer,
+                        language=student_info.get('target_language', 'English'),
+                        exercise_type=qs["exercise_type"],
+                    )
+                    is_correct = match.correct
+                    st.session_state[f"q_typo_{idx}"] = match.correct and not match.exact
+
                     if is_correct:
                         qs["score"] += 1
                         st.session_state[f"q_result_{idx}"] = "correct"
@@ -881,6 +890,15 @@ if st.session_state.current_student:
                         "session_index": idx + 1,
                         "created_at": datetime.datetime.utcnow()
                     })
+                    if not is_correct:
+                        db.record_student_errors(student_id, [{
+                            "error_type": "vocabulary" if qs["exercise_type"] == "vocabulary" else "grammar",
+                            "original_text": str(user_answer or ""),
+                            "corrected_text": str(correct_val),
+                            "explanation": current_q.get('explanation', ''),
+                            "topic": current_q.get('topic') or qs["exercise_type"],
+                            "source": "quiz",
+                        }])
 
                     st.rerun()
             else:
@@ -890,6 +908,8 @@ if st.session_state.current_student:
                 
                 if current_result == "correct":
                     st.success("✅ Correct!")
+                    if st.session_state.get(f"q_typo_{idx}"):
+                        st.info(f"Watch the spelling: {correct_val}")
                 else:
                     st.error("❌ Incorrect")
                     st.info(f"Correct Answer: {correct_val}")
@@ -952,7 +972,7 @@ if st.session_state.current_student:
             
             if st.button("Return to Menu", key="end_session_btn"):
                 
-                keys_to_clear = [k for k in st.session_state.keys() if k.startswith("q_input_") or k.startswith("q_result_") or k.startswith("check_btn_")]
+                keys_to_clear = [k for k in st.session_state.keys() if k.startswith("q_input_") or k.startswith("q_result_") or k.startswith("q_typo_") or k.startswith("check_btn_")]
                 for k in keys_to_clear:
                     del st.session_state[k]
                 
@@ -0,0 +1,278 @@
+"""
+Answer matching for generated exercises (ExerciseSchema) without an LLM.
+
+An exercise's key is compiled once (cached by its answer, options and
+language) into:
+- the exact accepted strings, checked first with a single set lookup;
+- normalized forms: Unicode NFKD with diacritics dropped, case folded and
+  punctuation removed;
+- for vocabulary and translation exercises only, a typo budget checked per
+  word with a bounded edit distance.
+
+A typo may change one word of the answer, must keep its first letter and must
+not turn it into another form of the same word (a different inflectional
+ending), so "adress" passes for "address" but "walked" does not for
+"walking". Grammar and fill-in-the-blank items test exactly those forms and
+never match fuzzily. Articles are folded away only when the exercise type
+opts in (ARTICLE_FOLDING_TYPES) and the language has no grammatical gender.
+
+Multiple choice answers must resolve to the correct option (by label, option
+text or the full "B) text" string); they never match fuzzily.
+"""
+
+import re
+import string
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+ARTICLES = {
+    "english": frozenset({"a", "an", "the"}),
+    "spanish": frozenset({"el", "la", "los", "las", "un", "una", "unos", "unas"}),
+    "french": frozenset({"le", "la", "les", "l", "un", "une", "des"}),
+    "german": frozenset({"der", "die", "das", "den", "dem", "des", "ein", "eine", "einen", "einem", "einer", "eines"}),
+    "italian": frozenset({"il", "lo", "la", "i", "gli", "le", "l", "un", "uno", "una"}),
+    "portuguese": frozenset({"o", "a", "os", "as", "um", "uma", "uns", "umas"}),
+}
+
+# The article carries the noun's gender (or case) here, so it is part of the answer
+GENDERED_LANGUAGES = frozenset({"spanish", "french", "german", "italian", "portuguese"})
+
+# Exercise types (ExerciseType) whose answers get a typo budget / have articles folded
+FUZZY_EXERCISE_TYPES = frozenset({"vocabulary", "translation"})
+ARTICLE_FOLDING_TYPES = frozenset({"vocabulary", "translation"})
+
+# Inflectional endings (after normalization); a typo ending in one of these is another form of the word
+INFLECTION_ENDINGS = {
+    "english": frozenset({"s", "es", "ed", "d", "ing", "er", "est", "ies", "ied", "ier", "iest", "ly", "en", "n"}),
+    "spanish": frozenset({"o", "a", "os", "as", "e", "es", "ar", "er", "ir", "ado", "ada", "ido", "ida", "ando", "iendo", "aba", "ia", "s"}),
+    "french": frozenset({"e", "es", "s", "x", "ent", "ez", "ons", "er", "ee", "ees", "ait", "ais", "aient", "t"}),
+    "german": frozenset({"e", "en", "er", "es", "em", "ern", "n", "s", "st", "t", "et", "te", "ten", "est"}),
+    "italian": frozenset({"o", "a", "i", "e", "are", "ere", "ire", "ato", "ata", "ati", "ito", "ita", "iti", "ando", "endo"}),
+    "portuguese": frozenset({"o", "a", "os", "as", "e", "es", "s", "ar", "er", "ir", "ado", "ada", "ido", "ida", "ando", "endo"}),
+}
+
+# Alternatives inside one correct_answer: "don't | do not"
+ALTERNATIVE_SEPARATORS = re.compile(r"\s*[|;]\s*")
+OPTION_LABEL = re.compile(r"^\s*\(?([A-Za-z0-9])[).:]\s*")
+
+_APOSTROPHES = str.maketrans("", "", "'’‘`´")
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+# ASCII fast path: one translate() instead of a regex pass
+_ASCII_FOLD = str.maketrans({c: None if c in "'`" else " " for c in string.punctuation})
+
+
+def normalize_text(text: Any, articles: FrozenSet[str] = frozenset()) -> str:
+    """Diacritic-free, case-folded, punctuation-free form with `articles` removed."""
+    text = str(text)
+    if text.isascii():
+        words = text.translate(_ASCII_FOLD).lower().split()
+    else:
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+        words = _PUNCTUATION.sub(" ", text.translate(_APOSTROPHES).casefold()).split()
+    if articles:
+        words = [w for w in words if w not in articles] or words
+    return " ".join(words)
+
+
+def max_edits_for(text: str) -> int:
+    """Typo budget: none for short answers (one letter changes the word), one edit up to 12 chars, then two."""
+    if len(text) <= 4:
+        return 0
+    return 1 if len(text) <= 12 else 2
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance if it is <= limit, otherwise limit + 1. O(len * limit)."""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # Typos are local: only the differing middle needs the DP
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [limit + 1] * (len(b) + 1)
+        current[0] = i if i <= limit else limit + 1
+        row_min = current[0]
+        for j in range(lo, hi + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return min(previous[len(b)], limit + 1)
+
+
+def is_inflection(word: str, target: str, endings: FrozenSet[str]) -> bool:
+    """True if both words are a shared stem plus (possibly empty) endings: "walked"/"walking", "house"/"houses"."""
+    common = 0
+    while common < len(word) and common < len(target) and word[common] == target[common]:
+        common += 1
+    tails = (word[common:], target[common:])
+    return common >= 2 and all(not tail or tail in endings for tail in tails)
+
+
+def typo_distance(words: Tuple[str, ...], target: Tuple[str, ...], endings: FrozenSet[str]) -> Optional[int]:
+    """Edits of the one misspelled word of `words`, or None if the difference is not a typo of `target`."""
+    if len(words) != len(target):
+        return None
+    changed = [(w, t) for w, t in zip(words, target) if w != t]
+    if len(changed) != 1:
+        return None
+    word, expected = changed[0]
+    limit = max_edits_for(expected)
+    if not limit or word[:1] != expected[:1] or is_inflection(word, expected, endings):
+        return None
+    distance = bounded_edit_distance(word, expected, limit)
+    return distance if distance <= limit else None
+
+
+@dataclass(frozen=True)
+class AnswerMatch:
+    correct: bool
+    exact: bool = False      # matched without any typo allowance
+    distance: int = 0        # edits needed for a fuzzy match
+    expected: Optional[str] = None
+
+
+class AnswerKey:
+    """
+    Precompiled acceptable answers of one exercise.
+
+    Args:
+        answers: Acceptable answers (the first is reported as expected)
+        articles: Articles folded away during normalization
+        fuzzy: Allow one misspelled word within the typo budget of max_edits_for()
+        rejected: Known wrong answers (the other options of a multiple choice)
+        endings: Inflectional endings; a "typo" that only swaps these is rejected
+    """
+
+    __slots__ = ("expected", "articles", "raw", "rejected", "normalized", "fuzzy_targets", "endings", "_hit", "_miss")
+
+    def __init__(
+        self,
+        answers: Iterable[str],
+        articles: FrozenSet[str] = frozenset(),
+        fuzzy: bool = False,
+        rejected: Iterable[str] = (),
+        endings: FrozenSet[str] = frozenset(),
+    ):
+        answers = [str(a).strip() for a in answers if a is not None and str(a).strip()]
+        self.expected = answers[0] if answers else None
+        self.articles = articles
+        self.raw = frozenset(answers) | frozenset(a.casefold() for a in answers)
+        self.rejected = frozenset(rejected) - self.raw
+        normalized = {normalize_text(a, articles) for a in answers}
+        self.normalized = frozenset(normalized)
+        self.fuzzy_targets: Tuple[Tuple[str, ...], ...] = tuple(
+            tuple(n.split()) for n in normalized if fuzzy and max_edits_for(n)
+        )
+        self.endings = endings
+        self._hit = AnswerMatch(True, exact=True, expected=self.expected)
+        self._miss = AnswerMatch(False, expected=self.expected)
+
+    def check(self, answer: Any) -> AnswerMatch:
+        if answer is None or self.expected is None:
+            return self._miss
+        if isinstance(answer, str):
+            if answer in self.raw:
+                return self._hit
+            if answer in self.rejected:
+                return self._miss
+        text = str(answer).strip()
+        if text in self.raw:
+            return self._hit
+
+        normalized = normalize_text(text, self.articles)
+        if normalized in self.normalized:
+            return self._hit
+        if self.fuzzy_targets:
+            words = tuple(normalized.split())
+            for target in self.fuzzy_targets:
+                distance = typo_distance(words, target, self.endings)
+                if distance is not None:
+                    return AnswerMatch(True, distance=distance, expected=self.expected)
+        return self._miss
+
+
+def _split_option(option: str) -> Tuple[Optional[str], str]:
+    """("b", "went") for "B) went"; (None, text) for unlabeled options."""
+    label = OPTION_LABEL.match(option)
+    return (label.group(1).casefold(), option[label.end():]) if label else (None, option)
+
+
+def _choice_answers(correct: str, options: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Every way to name the correct option: its label, its text and the full option string."""
+    correct = correct.strip()
+    correct_label, correct_body = (correct.casefold(), "") if len(correct) == 1 else _split_option(correct)
+    for option in options:
+        label, body = _split_option(option)
+        if (label and label == correct_label) or (correct_body and normalize_text(body) == normalize_text(correct_body)):
+            return tuple(a for a in (option, body, label) if a)
+    return (correct,)
+
+
+@lru_cache(maxsize=4096)
+def compile_answer_key(
+    correct_answer: str,
+    options: Tuple[str, ...] = (),
+    language: str = "english",
+    fold_articles: bool = False,
+    fuzzy: bool = False,
+) -> AnswerKey:
+    """Key for a correct answer ("a | b" lists alternatives); with options it is a multiple choice key."""
+    answers = [a for a in ALTERNATIVE_SEPARATORS.split(correct_answer or "") if a]
+    if options:
+        choices = [a for answer in answers for a in _choice_answers(answer, options)]
+        return AnswerKey(choices, rejected=options)
+
+    language = language.strip().lower()
+    articles = ARTICLES.get(language, ARTICLES["english"]) if fold_articles else frozenset()
+    return AnswerKey(answers, articles=articles, fuzzy=fuzzy, endings=INFLECTION_ENDINGS.get(language, frozenset()))
+
+
+def answer_key_for(exercise: Any, language: str = "english", exercise_type: Optional[str] = None) -> AnswerKey:
+    """
+    Compiled key of an exercise dict or ExerciseSchema.
+
+    exercise_type is the skill practised (ExerciseType: "vocabulary",
+    "grammar", ...), defaulting to the exercise's own "exercise_type" field.
+    Without one the answer must match exactly (after normalization).
+    """
+    if hasattr(exercise, "model_dump"):
+        exercise = exercise.model_dump()
+    language = (language or "english").strip().lower()
+    exercise_type = str(exercise_type or exercise.get("exercise_type") or "").lower()
+    free_text = exercise.get("type") != "fill_in_the_blank"
+    about_articles = "article" in " ".join(
+        str(exercise.get(f) or "") for f in ("topic", "task", "question", "instructions")
+    ).lower()
+    return compile_answer_key(
+        str(exercise.get("correct_answer") or ""),
+        tuple(str(o) for o in exercise.get("options") or ()),
+        language,
+        free_text and exercise_type in ARTICLE_FOLDING_TYPES and language not in GENDERED_LANGUAGES and not about_articles,
+        free_text and exercise_type in FUZZY_EXERCISE_TYPES,
+    )
+
+
+def check_answer(
+    exercise: Dict[str, Any], answer: Any, language: str = "english", exercise_type: Optional[str] = None
+) -> AnswerMatch:
+    return answer_key_for(exercise, language, exercise_type).check(answer)
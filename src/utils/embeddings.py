@@ -0,0 +1,63 @@
+"""
+Text embeddings as NumPy arrays.
+
+Uses the same embedding function as the Chroma collections
+(ChromaVectorDB.embedding_function, or Chroma's default MiniLM model), so
+vectors computed here are comparable with the ones stored in Chroma. The
+model is loaded on first use.
+"""
+
+import json
+import logging
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+_default_function = None
+_lock = threading.Lock()
+_model_ids: Dict[int, str] = {}
+
+
+def get_embedding_function():
+    global _default_function
+    from src.database.chroma_db import ChromaVectorDB
+
+    if ChromaVectorDB.embedding_function is not None:
+        return ChromaVectorDB.embedding_function
+    if _default_function is None:
+        with _lock:
+            if _default_function is None:
+                from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+                _default_function = DefaultEmbeddingFunction()
+    return _default_function
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """(len(texts), dim) float32 matrix of L2-normalized embeddings."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = np.asarray(get_embedding_function()(list(texts)), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def embedding_model_id() -> str:
+    """
+    "<name>:<config>:<dim>" of the current embedding function; stored vectors
+    are only comparable with ones computed under the same id.
+    """
+    function = get_embedding_function()
+    model_id = _model_ids.get(id(function))
+    if model_id is None:
+        name = function.name() if hasattr(function, "name") else type(function).__name__
+        try:
+            config = json.dumps(function.get_config(), sort_keys=True, default=str)
+        except Exception:
+            config = ""
+        dim = len(function(["dimension probe"])[0])
+        model_id = _model_ids.setdefault(id(function), f"{name}:{config}:{dim}")
+    return model_id
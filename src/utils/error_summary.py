@@ -0,0 +1,120 @@
+"""
+Per-student error summary with decay-weighted recency.
+
+student_error_summary holds one document per student with error counts and
+recency weights by error_type and topic. Weights decay exponentially with
+ERROR_DECAY_HALF_LIFE_DAYS. To keep every update a plain $inc, weights are
+stored on a fixed-epoch scale: an error at time t adds 2^((t - epoch) / half
+life), and the current weight is the stored value divided by the same factor
+for "now". Nothing has to be rewritten as time passes. The factor overflows a
+float about 1000 half-lives after DECAY_EPOCH (~39 years at 14 days); moving
+the epoch requires dividing the stored weights by the same factor.
+"""
+
+import math
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+ERROR_DECAY_HALF_LIFE_DAYS = float(os.getenv("ERROR_DECAY_HALF_LIFE_DAYS", "14"))
+# Decayed error weight that switches a lesson into review mode (~2 fresh errors)
+ERROR_REVIEW_THRESHOLD = float(os.getenv("ERROR_REVIEW_THRESHOLD", "1.5"))
+
+DECAY_EPOCH = datetime(2024, 1, 1)
+DEFAULT_ERROR_TYPE = "grammar"
+DEFAULT_TOPIC = "general"
+
+_FIELD_UNSAFE = re.compile(r"[.$]")
+
+
+def decay_scale(at: datetime) -> float:
+    """Weight of an error at `at` on the fixed-epoch scale."""
+    days = (at - DECAY_EPOCH).total_seconds() / 86400.0
+    return math.pow(2.0, days / ERROR_DECAY_HALF_LIFE_DAYS)
+
+
+def field_key(name: Any) -> str:
+    """Topic / error type usable as a MongoDB field name."""
+    return _FIELD_UNSAFE.sub("_", " ".join(str(name).split()).lower()) or DEFAULT_TOPIC
+
+
+def summary_update(errors: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """The single $inc/$max/$set update that folds a batch of new errors into the summary document."""
+    now = now or datetime.utcnow()
+    inc: Dict[str, Any] = defaultdict(int)
+    names: Dict[str, str] = {}
+    latest = None
+
+    for error in errors:
+        at = error.get("occurred_at") or now
+        weight = decay_scale(at)
+        error_type = field_key(error.get("error_type") or DEFAULT_ERROR_TYPE)
+        topic = str(error.get("topic") or DEFAULT_TOPIC)
+        topic_key = field_key(topic)
+
+        inc["total"] += 1
+        inc["weight"] += weight
+        inc[f"by_type.{error_type}.count"] += 1
+        inc[f"by_type.{error_type}.weight"] += weight
+        inc[f"by_topic.{topic_key}.count"] += 1
+        inc[f"by_topic.{topic_key}.weight"] += weight
+        inc[f"by_topic.{topic_key}.types.{error_type}"] += 1
+        names[f"by_topic.{topic_key}.name"] = topic
+        latest = at if latest is None or at > latest else latest
+
+    update: Dict[str, Any] = {"$inc": dict(inc), "$set": {**names, "updated_at": now}}
+    if latest is not None:
+        update["$max"] = {"last_error_at": latest}
+    return update
+
+
+def summary_document(errors: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """The whole summary document of `errors`, as summary_update() would leave it on an empty one."""
+    update = summary_update(errors, now)
+    document: Dict[str, Any] = {}
+    for path, value in {**update["$inc"], **update["$set"], **update.get("$max", {})}.items():
+        *parents, leaf = path.split(".")
+        node = document
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return document
+
+
+class ErrorProfile:
+    """Decayed view of a student's error summary document at a point in time."""
+
+    def __init__(self, summary: Optional[Dict[str, Any]], now: Optional[datetime] = None):
+        self.summary = summary or {}
+        self._scale = decay_scale(now or datetime.utcnow())
+
+    @property
+    def total(self) -> int:
+        return int(self.summary.get("total", 0))
+
+    @property
+    def recent_weight(self) -> float:
+        """Decayed number of errors (an error today counts 1, one half-life ago 0.5)."""
+        return self.summary.get("weight", 0.0) / self._scale
+
+    def needs_review(self, threshold: float = ERROR_REVIEW_THRESHOLD) -> bool:
+        return self.recent_weight >= threshold
+
+    def top_types(self, n: int = 3) -> List[str]:
+        by_type = self.summary.get("by_type", {})
+        return sorted(by_type, key=lambda t: by_type[t].get("weight", 0.0), reverse=True)[:n]
+
+    def top_topics(self, n: int = 3) -> List[Dict[str, Any]]:
+        by_topic = self.summary.get("by_topic", {})
+        ranked = sorted(by_topic.values(), key=lambda t: t.get("weight", 0.0), reverse=True)[:n]
+        return [
+            {
+                "topic": t.get("name", DEFAULT_TOPIC),
+                "weight": round(t.get("weight", 0.0) / self._scale, 3),
+                "count": t.get("count", 0),
+                "error_types": sorted(t.get("types", {}), key=t.get("types", {}).get, reverse=True),
+            }
+            for t in ranked
+        ]
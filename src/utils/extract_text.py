@@ -1,19 +1,24 @@
+"""
+Textbook ingestion: PDF text extraction (text layer + VLM OCR), chunking
+and storage of embedded chunks in Chroma.
+
+Importing this module has no side effects. Clients for the VLM, the
+embedding model and Chroma are created lazily by the backends and the
+Ingestor on first use, so fake backends can be passed in for offline runs.
+"""
+
 import base64
+import hashlib
 import io
 import logging
+import math
 import os
+import sys
+import time
+import unicodedata
 
 from uuid import uuid4
 
-import numpy as np
-import pymupdf
-
-from chromadb import Client
-from chromadb.config import Settings
-from openai import OpenAI
-from PIL import Image
-from yandex_cloud_ml_sdk import YCloudML
-
 logger = logging.getLogger(__name__)
 
 
@@ -24,65 +29,157 @@ YANDEX_API_KEY = os.environ.get("YANDEX_API_KEY")
 
 CHROMA_COLLECTION_NAME = os.environ.get("CHROMA_COLLECTION_NAME", "language_books")
 
-client = OpenAI(
-    base_url=os.environ.get("LITELLM_BASE_URL"),
-    api_key=os.environ.get("LITELLM_API_KEY"),
-)
+MIN_PAGE_CHARS = int(os.environ.get("MIN_PAGE_CHARS", "40"))
+MIN_TEXT_COVERAGE = float(os.environ.get("MIN_TEXT_COVERAGE", "0.85"))
+MAX_GARBAGE_RATIO = float(os.environ.get("MAX_GARBAGE_RATIO", "0.02"))
 
-sdk = YCloudML(
-        folder_id=YANDEX_FOLDER_ID,
-        auth=YANDEX_API_KEY,
-    )
-doc_embedding_model = sdk.models.text_embeddings(f"emb://{YANDEX_FOLDER_ID}/text-search-doc/latest")
-
-chroma = Client(Settings(anonymized_telemetry=False))
-collection = chroma.get_or_create_collection(
-    name=CHROMA_COLLECTION_NAME,
-    metadata={
-        "hnsw:space": "cosine",
-    },
-)
-
-def extract_text_vlm(base64_image: str) -> str:
-
-    response = client.chat.completions.create(
-        model=VLM_MODEL_NAME,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": f"data:image/jpeg;base64,{base64_image}",
-                    },
-                    {
-                        "type": "text",
-                        "text": "Extract all text from this PDF. Preserve reading order.",
-                    },
-                ],
-            },
-        ],
-    )
 
-    return response.choices[0].message.content
+class OpenAIVLMBackend:
+    """VLM OCR through the OpenAI-compatible LiteLLM endpoint."""
+
+    def __init__(self, model_name: str = VLM_MODEL_NAME, base_url: str = None, api_key: str = None):
+        self.model_name = model_name
+        self.base_url = base_url or os.environ.get("LITELLM_BASE_URL")
+        self.api_key = api_key or os.environ.get("LITELLM_API_KEY")
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(base_url=self.base_url, api_key=self.api_key)
+        return self._client
+
+    def extract_text(self, base64_image: str) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": f"data:image/jpeg;base64,{base64_image}",
+                        },
+                        {
+                            "type": "text",
+                            "text": "Extract all text from this PDF. Preserve reading order.",
+                        },
+                    ],
+                },
+            ],
+        )
+
+        return response.choices[0].message.content
+
+
+class YandexEmbeddingBackend:
+    """Document embeddings from Yandex Cloud ML (text-search-doc)."""
+
+    def __init__(self, folder_id: str = None, api_key: str = None):
+        self.folder_id = folder_id or YANDEX_FOLDER_ID
+        self.api_key = api_key or YANDEX_API_KEY
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from yandex_cloud_ml_sdk import YCloudML
+
+            sdk = YCloudML(folder_id=self.folder_id, auth=self.api_key)
+            self._model = sdk.models.text_embeddings(f"emb://{self.folder_id}/text-search-doc/latest")
+        return self._model
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [list(self.model.run(text)) for text in texts]
+
+
+class FakeVLMBackend:
+    """Offline stand-in for the VLM: returns a fixed text after an optional delay."""
+
+    def __init__(self, text: str = "Lorem ipsum dolor sit amet.", latency_s: float = 0.0):
+        self.text = text
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def extract_text(self, base64_image: str) -> str:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self.text
+
+
+class FakeEmbeddingBackend:
+    """Offline stand-in for the embedding model: deterministic hashed bag-of-words vectors."""
+
+    def __init__(self, dim: int = 256, latency_s: float = 0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        vectors = []
+        for text in texts:
+            vec = [0.0] * self.dim
+            for token in text.lower().split():
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                vec[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            vectors.append([v / norm for v in vec])
+        return vectors
 
-def get_text_from_pdf_doc_vlm(pdf_doc: pymupdf.Document) -> str:
-    texts = []
-    for i, page in enumerate(pdf_doc):
 
-        pix = page.get_pixmap(dpi=144)
-        mode = "RGBA" if pix.alpha else "RGB" if pix.colorspace.n >= 3 else "L"
-        image = Image.frombytes(mode, [pix.width, pix.height], pix.samples).conver("GGB")
+def page_to_base64(page, dpi: int = 144) -> str:
+    from PIL import Image
 
-        buffer = io.BytesIO()
-        image.save(buffer, format="png")
-        img_bytes = buffer.getvalue()
-        base64_image = base64.b64encode(img_bytes).decode("utf-8")
-        text = extract_text_vlm(base64_image)
-        texts.append(text)
-        logger.info(f"Processed page {i+1}/{len(pdf_doc)}.")
+    pix = page.get_pixmap(dpi=dpi)
+    mode = "RGBA" if pix.alpha else "RGB" if pix.colorspace.n >= 3 else "L"
+    image = Image.frombytes(mode, [pix.width, pix.height], pix.samples).convert("RGB")
 
-    return "\n".join(texts)
+    buffer = io.BytesIO()
+    image.save(buffer, format="png")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def score_page_text(text: str) -> dict:
+    """
+    Score the quality of a page's embedded text layer.
+
+    coverage: share of non-space characters that are letters, digits or ordinary punctuation.
+    garbage_ratio: share of replacement, control and private-use characters
+    (typical for broken font encodings).
+    """
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return {"chars": 0, "coverage": 0.0, "garbage_ratio": 0.0}
+
+    readable = 0
+    garbage = 0
+    for c in chars:
+        category = unicodedata.category(c)
+        if c == "\ufffd" or category in ("Cc", "Co", "Cs", "Cn"):
+            garbage += 1
+        elif category[0] in ("L", "N", "P", "S", "M"):
+            readable += 1
+
+    return {
+        "chars": len(chars),
+        "coverage": readable / len(chars),
+        "garbage_ratio": garbage / len(chars),
+    }
+
+
+def is_text_layer_usable(score: dict) -> bool:
+    return (
+        score["chars"] >= MIN_PAGE_CHARS
+        and score["coverage"] >= MIN_TEXT_COVERAGE
+        and score["garbage_ratio"] <= MAX_GARBAGE_RATIO
+    )
 
 
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 150) -> list[str]:
@@ -97,20 +194,121 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 150) -> list[st
     return chunks
 
 
-def save_chunks_chroma(chunks: list[str]) -> None:
-    embeddings = [np.array(doc_embedding_model.run(chunk)) for chunk in chunks]
-    ids = [str(uuid4()) for _ in chunks]
-    collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        documents=chunks,
-    )
+class Ingestor:
+    """
+    PDF → text → chunks → Chroma pipeline.
+
+    Args:
+        embedding_backend: object with embed(texts) -> list of vectors
+            (defaults to YandexEmbeddingBackend)
+        vlm_backend: object with extract_text(base64_image) -> str
+            (defaults to OpenAIVLMBackend)
+        chroma_client: Chroma client to store chunks in
+            (defaults to an in-memory client, created on first use)
+        collection_name: Chroma collection for the chunks
+    """
+
+    def __init__(
+        self,
+        embedding_backend=None,
+        vlm_backend=None,
+        chroma_client=None,
+        collection_name: str = CHROMA_COLLECTION_NAME,
+    ):
+        self.embedding_backend = embedding_backend or YandexEmbeddingBackend()
+        self.vlm_backend = vlm_backend or OpenAIVLMBackend()
+        self.collection_name = collection_name
+        self._chroma = chroma_client
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            if self._chroma is None:
+                from chromadb import Client
+                from chromadb.config import Settings
+
+                self._chroma = Client(Settings(anonymized_telemetry=False))
+            self._collection = self._chroma.get_or_create_collection(
+                name=self.collection_name,
+                metadata={
+                    "hnsw:space": "cosine",
+                },
+            )
+        return self._collection
+
+    def get_text_from_pdf_doc_vlm(self, pdf_doc) -> str:
+        texts = []
+        for i, page in enumerate(pdf_doc):
+            text = self.vlm_backend.extract_text(page_to_base64(page))
+            texts.append(text)
+            logger.info(f"Processed page {i+1}/{len(pdf_doc)}.")
+
+        return "\n".join(texts)
+
+    def get_text_from_pdf_doc_hybrid(self, pdf_doc) -> tuple[str, dict]:
+        """
+        Extract text page by page, using the embedded text layer when it passes
+        the quality check and sending only the remaining pages to VLM OCR.
+
+        Returns:
+            Extracted text and routing stats
+            ({"pages", "text_layer", "vlm", "empty", "routes": [...]}).
+        """
+        texts = []
+        stats = {"pages": len(pdf_doc), "text_layer": 0, "vlm": 0, "empty": 0, "routes": []}
+
+        for i, page in enumerate(pdf_doc):
+            text = page.get_text()
+            score = score_page_text(text)
+
+            if is_text_layer_usable(score):
+                route = "text_layer"
+            elif score["chars"] == 0 and not page.get_images():
+                route = "empty"
+                text = ""
+            else:
+                route = "vlm"
+                text = self.vlm_backend.extract_text(page_to_base64(page))
+
+            stats[route] += 1
+            stats["routes"].append({"page": i + 1, "route": route, **score})
+            if text:
+                texts.append(text)
+            logger.debug(f"Page {i+1}/{len(pdf_doc)} routed to {route} ({score}).")
+
+        logger.info(
+            f"Extracted {stats['pages']} pages: {stats['text_layer']} from text layer, "
+            f"{stats['vlm']} via VLM, {stats['empty']} empty."
+        )
+        return "\n".join(texts), stats
+
+    def save_chunks(self, chunks: list[str]) -> None:
+        if not chunks:
+            return
+        embeddings = self.embedding_backend.embed(chunks)
+        ids = [str(uuid4()) for _ in chunks]
+        self.collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            documents=chunks,
+        )
+
+        logger.info(f"Saved {len(chunks)} chunks in Chroma.")
+
+    def ingest_pdf(self, doc_path: str) -> dict:
+        """Extract, chunk and store a PDF. Returns the routing stats plus chunk count."""
+        import pymupdf
+
+        with pymupdf.open(doc_path) as doc:
+            text, stats = self.get_text_from_pdf_doc_hybrid(doc)
+        chunks = chunk_text(text)
+        self.save_chunks(chunks)
+        stats["chunks"] = len(chunks)
+        return stats
 
-    logger.info(f"Saved {len(chunks)} chunks in Chroma.")
 
 if __name__ == "__main__":
-    doc_path = "..."
-    doc = pymupdf.open(doc_path)
-    text = get_text_from_pdf_doc_vlm(doc)
-    chunks = chunk_text(text)
-    save_chunks_chroma(chunks)
+    logging.basicConfig(level=logging.INFO)
+    ingestor = Ingestor()
+    print(ingestor.ingest_pdf(sys.argv[1]))
@@ -0,0 +1,151 @@
+"""
+Vectorized grading of answer sheets.
+
+A cohort's answers are encoded once into an int32 (students, questions)
+matrix of answer codes (-1 = no answer) and compared with the encoded keys
+in one NumPy operation. The same pass yields the classical item statistics:
+difficulty (share of students answering correctly) and discrimination (point-
+biserial correlation of the item with the rest of the test score).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.answer_matching import normalize_text
+
+
+NO_ANSWER = -1
+
+
+def normalize_answer(answer: Any) -> Optional[str]:
+    if answer is None:
+        return None
+    return normalize_text(answer) or None
+
+
+class _AnswerEncoder:
+    """Maps raw answers to key codes; answers matching no key share one "wrong" code."""
+
+    def __init__(self, codes: Dict[str, int]):
+        self.codes = codes
+        self.memo: Dict[Any, int] = {None: NO_ANSWER}
+
+    def __call__(self, answer: Any) -> int:
+        code = self.memo.get(answer)
+        if code is None:
+            normalized = normalize_answer(answer)
+            code = NO_ANSWER if normalized is None else self.codes.get(normalized, len(self.codes))
+            self.memo[answer] = code
+        return code
+
+
+def _statistic(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+@dataclass
+class GradedCohort:
+    student_ids: List[str]
+    question_ids: List[Any]
+    correct_answers: List[Any]
+    correct: np.ndarray         # (students, questions) bool
+    answered: np.ndarray        # (students, questions) bool
+    scores: np.ndarray          # (students,) points
+    max_score: float
+    difficulty: np.ndarray      # (questions,) share correct
+    discrimination: np.ndarray  # (questions,) corrected point-biserial, nan if undefined
+    omitted: np.ndarray         # (questions,) share without an answer
+
+    @property
+    def percentages(self) -> np.ndarray:
+        if not self.max_score:
+            return np.zeros_like(self.scores)
+        return self.scores * (100.0 / self.max_score)
+
+    def item_statistics(self) -> List[Dict[str, Any]]:
+        """Per-question statistics; undefined ones (nan, e.g. for an empty cohort) are None."""
+        return [
+            {
+                "question_id": qid,
+                "difficulty": _statistic(self.difficulty[j]),
+                "discrimination": _statistic(self.discrimination[j]),
+                "omitted": _statistic(self.omitted[j]),
+            }
+            for j, qid in enumerate(self.question_ids)
+        ]
+
+
+def encode_answer_sheets(questions: List[Dict[str, Any]], answer_sheets: Dict[str, Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (keys, responses): int32 (questions,) key codes and (students, questions)
+    answer codes. Answers match after answer_matching.normalize_text().
+    """
+    question_ids = [q["question_id"] for q in questions]
+    codes: Dict[str, int] = {}
+    keys = np.array(
+        [codes.setdefault(normalize_answer(q.get("correct_answer")) or "", len(codes)) for q in questions],
+        dtype=np.int32,
+    )
+
+    # Answer sheets decoded from JSON have string keys
+    str_ids = [str(qid) for qid in question_ids]
+    encode = _AnswerEncoder(codes)
+    responses = np.array(
+        [
+            list(map(encode, map(sheet.get, str_ids if isinstance(next(iter(sheet), None), str) else question_ids)))
+            for sheet in answer_sheets.values()
+        ],
+        dtype=np.int32,
+    ).reshape(len(answer_sheets), len(question_ids))
+    return keys, responses
+
+
+def grade_encoded(
+    keys: np.ndarray,
+    responses: np.ndarray,
+    points: np.ndarray,
+    student_ids: List[str],
+    questions: List[Dict[str, Any]],
+) -> GradedCohort:
+    """Score encoded responses and compute the item statistics in one pass."""
+    correct = responses == keys
+    answered = responses != NO_ANSWER
+    scores = correct @ points
+
+    n_students = len(student_ids)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difficulty = correct.mean(axis=0) if n_students else np.full(len(questions), np.nan)
+        omitted = 1.0 - answered.mean(axis=0) if n_students else np.full(len(questions), np.nan)
+
+        # Correlate each item with the score on the other items (item not counted twice)
+        item = correct.astype(np.float64)
+        rest = scores[:, None] - item * points
+        item_c = item - item.mean(axis=0) if n_students else item
+        rest_c = rest - rest.mean(axis=0) if n_students else rest
+        denominator = np.sqrt((item_c ** 2).sum(axis=0) * (rest_c ** 2).sum(axis=0))
+        discrimination = np.where(denominator > 0, (item_c * rest_c).sum(axis=0) / denominator, np.nan)
+
+    return GradedCohort(
+        student_ids=student_ids,
+        question_ids=[q["question_id"] for q in questions],
+        correct_answers=[q.get("correct_answer") for q in questions],
+        correct=correct,
+        answered=answered,
+        scores=scores,
+        max_score=float(points.sum()),
+        difficulty=difficulty,
+        discrimination=discrimination,
+        omitted=omitted,
+    )
+
+
+def grade_cohort(questions: List[Dict[str, Any]], answer_sheets: Dict[str, Dict]) -> GradedCohort:
+    """
+    Grade every answer sheet ({student_id: {question_id: answer}}) against the
+    questions' "correct_answer". A question's "points" (default 1) weights its score.
+    """
+    keys, responses = encode_answer_sheets(questions, answer_sheets)
+    points = np.array([float(q.get("points", 1)) for q in questions])
+    return grade_encoded(keys, responses, points, list(answer_sheets), questions)
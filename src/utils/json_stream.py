@@ -0,0 +1,339 @@
+"""
+Incremental JSON helpers for streamed LLM output.
+
+JsonStringFieldStreamer pulls the value of one string field (e.g. the
+"content" of a theory lesson) out of a JSON document while it is still
+being generated, so the text can be shown before the object is complete.
+
+JsonObjectParser is the single parser for JSON objects in LLM responses,
+fed either a whole response (parse_llm_json) or streamed tokens. It skips
+the text around the object and repairs the usual model mistakes on the
+fly instead of failing the whole generation.
+"""
+
+import json
+import logging
+import re
+from typing import Any, List, Optional
+
+from src.utils.metrics import JSON_REPAIRS
+
+logger = logging.getLogger(__name__)
+
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+# Inside a JSON string: a run of characters that need no attention
+_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]+')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_CLOSERS = {"{": "}", "[": "]"}
+# Characters of numbers and literals; whitespace between two of them is kept as one space
+_SCALAR_CHARS = frozenset("0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ.+-")
+
+
+class JsonStringFieldStreamer:
+    """
+    Streaming extractor for a top-level string field of a JSON object.
+
+    Feed raw model tokens with feed(); it returns the newly decoded part of
+    the field value (possibly ""). Text before the JSON (code fences,
+    preambles) is skipped. Only the first occurrence of the key is streamed.
+    """
+
+    def __init__(self, field: str = "content"):
+        self.field = field
+        self.done = False
+        self._state = "scan"
+        self._escape = None
+        self._high_surrogate = None
+        self._string = []
+        self._last_string = None
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        for ch in chunk:
+            if self.done:
+                break
+            self._step(ch, out)
+        return "".join(out)
+
+    def _step(self, ch: str, out: list) -> None:
+        state = self._state
+
+        if state == "scan":
+            if ch == '"':
+                self._state = "string"
+                self._string = []
+            elif ch == ":":
+                if self._last_string == self.field:
+                    self._state = "value"
+                self._last_string = None
+            elif not ch.isspace():
+                self._last_string = None
+
+        elif state == "string":
+            if self._escape is not None:
+                self._escape = None
+                self._string.append(ch)
+            elif ch == "\\":
+                self._escape = ""
+            elif ch == '"':
+                self._state = "scan"
+                self._last_string = "".join(self._string)
+            else:
+                self._string.append(ch)
+
+        elif state == "value":
+            if ch == '"':
+                self._state = "field"
+            elif not ch.isspace():
+                self._state = "scan"
+
+        elif state == "field":
+            self._decode_field_char(ch, out)
+
+    def _decode_field_char(self, ch: str, out: list) -> None:
+        if self._escape is None:
+            if ch == "\\":
+                self._escape = ""
+            elif ch == '"':
+                self.done = True
+                self._state = "done"
+            else:
+                out.append(ch)
+            return
+
+        if self._escape == "":
+            if ch == "u":
+                self._escape = "u"
+            else:
+                out.append(_SIMPLE_ESCAPES.get(ch, ch))
+                self._escape = None
+            return
+
+        self._escape += ch
+        if len(self._escape) < 5:
+            return
+
+        code = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        out.append(chr(code))
+
+
+class JsonObjectParser:
+    """
+    Incremental, tolerant parser for the first JSON object (or, with
+    root="[", array) of an LLM response.
+
+    Feed raw model tokens with feed(); it returns True as soon as the object
+    has closed. `value` then holds it, validated through `model` and dumped
+    to a dict if one is given, so a streaming caller can stop reading. Text
+    around the object (code fences, preambles, closing remarks) is ignored,
+    and a brace pair in the preamble that is not JSON ("{name}") is skipped.
+
+    Repaired on the fly: trailing and doubled commas, // and /* */ comments,
+    raw control characters and invalid escapes inside strings. The repairs
+    applied to the accepted object are listed in `repairs` and counted in
+    JSON_REPAIRS. A truncated response is an error: finish() raises
+    ValueError unless a preview of a still-streaming answer is asked for
+    with allow_truncated=True (then `truncated` is set).
+
+    Args:
+        model: Optional pydantic model the object is validated into
+        agent: Label for the repair metrics
+        root: "{" for an object, "[" for an array
+    """
+
+    def __init__(self, model=None, agent: str = "unknown", root: str = "{"):
+        self.model = model
+        self.agent = agent
+        self.root = root
+        self.done = False
+        self.truncated = False
+        self.value: Any = None
+        self.repairs: List[str] = []
+        self._error: Optional[Exception] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._out: List[str] = []
+        self._stack: List[str] = []
+        self._state = "scan"
+        self._pending_comma = False
+        self._separated = False
+        self._repairs: List[str] = []
+
+    def feed(self, chunk: str) -> bool:
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            state = self._state
+
+            if state == "scan":
+                start = chunk.find(self.root, i)
+                if start == -1:
+                    break
+                self._out.append(self.root)
+                self._stack.append(_CLOSERS[self.root])
+                self._state = "value"
+                i = start + 1
+
+            elif state == "string":
+                run = _STRING_RUN.match(chunk, i)
+                if run:
+                    self._out.append(run.group())
+                    i = run.end()
+                    continue
+                ch = chunk[i]
+                i += 1
+                if ch == '"':
+                    self._out.append(ch)
+                    self._state = "value"
+                elif ch == "\\":
+                    self._out.append(ch)
+                    self._state = "escape"
+                else:
+                    self._out.append(_CONTROL_ESCAPES.get(ch) or f"\\u{ord(ch):04x}")
+                    self._repair("control_character")
+
+            elif state == "escape":
+                ch = chunk[i]
+                i += 1
+                if ch in _VALID_ESCAPES:
+                    self._out.append(ch)
+                else:
+                    self._out[-1] = ch
+                    self._repair("invalid_escape")
+                self._state = "string"
+
+            elif state == "line_comment":
+                end = chunk.find("\n", i)
+                if end == -1:
+                    break
+                i = end + 1
+                self._state = "value"
+
+            elif state in ("block_comment", "block_comment_star"):
+                ch = chunk[i]
+                i += 1
+                if ch == "/" and state == "block_comment_star":
+                    self._state = "value"
+                else:
+                    self._state = "block_comment_star" if ch == "*" else "block_comment"
+
+            else:
+                self._value_char(chunk[i])
+                i += 1
+        return self.done
+
+    def _value_char(self, ch: str) -> None:
+        """One character outside strings and comments ("value" or "slash" state)."""
+        if ch in " \t\r\n":
+            self._separated = self._out[-1] in _SCALAR_CHARS
+            return
+        separated, self._separated = self._separated, False
+        if self._state == "slash":
+            self._state = "value"
+            if ch in "/*":
+                self._state = "line_comment" if ch == "/" else "block_comment"
+                self._repair("comment")
+                return
+            self._out.append("/")  # not JSON; left for json.loads to reject
+        if ch == "/":
+            self._state = "slash"
+            return
+
+        if ch == ",":
+            if self._pending_comma:
+                self._repair("extra_comma")
+            self._pending_comma = True
+            return
+        if ch in "}]":
+            if self._pending_comma:
+                self._pending_comma = False
+                self._repair("trailing_comma")
+            self._out.append(ch)
+            if self._stack:
+                self._stack.pop()
+            if not self._stack:
+                self._complete()
+            return
+
+        if self._pending_comma:
+            self._out.append(",")
+            self._pending_comma = False
+        elif separated and ch in _SCALAR_CHARS:
+            self._out.append(" ")  # "1 2" stays invalid instead of becoming 12
+        self._out.append(ch)
+        if ch == '"':
+            self._state = "string"
+        elif ch in _CLOSERS:
+            self._stack.append(_CLOSERS[ch])
+
+    def _repair(self, kind: str) -> None:
+        self._repairs.append(kind)
+
+    def _complete(self) -> None:
+        try:
+            data = json.loads("".join(self._out))
+        except json.JSONDecodeError as exc:
+            logger.debug(f"Skipping brace pair that is not JSON: {exc}")
+            self._error = exc
+            self._reset()
+            return
+
+        self.value = self.model(**data).model_dump() if self.model else data
+        self.done = True
+        self.repairs = self._repairs
+        for kind in set(self.repairs):
+            JSON_REPAIRS.labels(self.agent, kind).inc()
+
+    def finish(self, allow_truncated: bool = False) -> Any:
+        """
+        The parsed object. Raises ValueError if there is none or it is unterminated;
+        with allow_truncated the unterminated object is closed instead (never store that one).
+        """
+        if not self.done and self._state != "scan":
+            if not allow_truncated:
+                raise ValueError("LLM output ended inside the JSON object (truncated)")
+            self._close_truncated()
+            self.truncated = self.done
+        if not self.done:
+            raise self._error or ValueError("No JSON object found in LLM output")
+        return self.value
+
+    def _close_truncated(self) -> None:
+        if self._state == "escape":
+            self._out.pop()
+            self._state = "string"
+        if self._state == "string":
+            self._out.append('"')
+        if self._out[-1] == ":":
+            self._out.append("null")
+        self._pending_comma = False
+        self._repair("truncated")
+        self._out.extend(reversed(self._stack))
+        self._stack = []
+        self._complete()
+
+
+def parse_llm_json(text: str, model=None, agent: str = "unknown", root: str = "{") -> Any:
+    """The JSON object in an LLM response (see JsonObjectParser), validated through `model` if given."""
+    parser = JsonObjectParser(model, agent, root)
+    parser.feed(text)
+    return parser.finish()
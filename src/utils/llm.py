@@ -1,5 +1,6 @@
 
 import os
+import threading
 from langchain_openai import ChatOpenAI
 import logging
 from dotenv import load_dotenv
@@ -12,6 +13,11 @@ SRC_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 ENV_PATH = os.path.join(SRC_DIR, ".env")
 load_dotenv(ENV_PATH) 
 
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Process-wide budget of concurrent LLM requests shared by batch/background generation.
+llm_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
 def get_llm(mock: bool | None = None):
     api_key = os.getenv("LITELLM_API_KEY", "")
     base_url = os.getenv("LITELLM_BASE_URL", "http://a6k2.dgx:34000/v1")
@@ -0,0 +1,135 @@
+"""
+Prometheus metrics for the API and agents.
+
+All collectors live in the default in-process registry of prometheus_client
+and are exposed by the API at GET /metrics. Recording a sample is a lock
+and a few additions, cheap enough for every request, LLM call and DB op.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route",
+    ["method", "endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the API event loop waking up from a timed sleep",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+AGENT_OPERATION_DURATION = Histogram(
+    "agent_operation_duration_seconds",
+    "Duration of agent operations and LangGraph nodes",
+    ["agent", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "LLM call latency",
+    ["agent", "mode"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens consumed",
+    ["agent", "direction"],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by result (hit/miss)",
+    ["cache", "result"],
+)
+
+DB_OPERATION_DURATION = Histogram(
+    "db_operation_duration_seconds",
+    "Database operation latency",
+    ["backend", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+JSON_PARSE_FAILURES = Counter(
+    "llm_json_parse_failures_total",
+    "LLM responses that could not be parsed/validated as JSON",
+    ["agent"],
+)
+
+JSON_REPAIRS = Counter(
+    "llm_json_repairs_total",
+    "LLM JSON responses accepted after a repair (trailing comma, comment, truncation, ...)",
+    ["agent", "repair"],
+)
+
+LLM_REQUEST_ERRORS = Counter(
+    "llm_request_errors_total",
+    "LLM calls that failed before an answer could be parsed (network, timeout, rate limit, ...)",
+    ["agent", "error"],
+)
+
+STRUCTURED_OUTPUT_REQUESTS = Counter(
+    "llm_structured_output_total",
+    "Schema-guided LLM requests by outcome (first_attempt/after_retry/failed)",
+    ["agent", "schema", "outcome"],
+)
+
+STRUCTURED_OUTPUT_RETRIES = Counter(
+    "llm_structured_output_retries_total",
+    "Schema-guided LLM requests repeated after a validation failure",
+    ["agent", "schema"],
+)
+
+FALLBACK_HITS = Counter(
+    "agent_fallback_total",
+    "Times an agent fell back to non-LLM content",
+    ["agent", "kind"],
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, *labels: str):
+    """Time the enclosed block into histogram.labels(*labels)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def record_llm_usage(agent: str, response) -> None:
+    """Count input/output tokens from a LangChain AIMessage (if the backend reports usage)."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    LLM_TOKENS.labels(agent, "in").inc(usage.get("input_tokens", 0))
+    LLM_TOKENS.labels(agent, "out").inc(usage.get("output_tokens", 0))
+    # Prompt tokens served from the backend's prefix cache (direction "in" includes them)
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    if cached:
+        LLM_TOKENS.labels(agent, "in_cached").inc(cached)
+
+
+def record_llm_failure(agent: str, exc: Exception) -> None:
+    """Count a failed LLM generation: invalid answers (ValueError) as parse failures, the rest as request errors."""
+    if isinstance(exc, ValueError):
+        JSON_PARSE_FAILURES.labels(agent).inc()
+    else:
+        LLM_REQUEST_ERRORS.labels(agent, type(exc).__name__).inc()
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
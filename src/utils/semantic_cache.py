@@ -0,0 +1,134 @@
+"""
+Semantic cache for LLM generations.
+
+A request is identified by a GenerationKey. Its canonical topic text is
+embedded in a Chroma collection; a stored result is served when an entry with
+the same exact fields (content type, CEFR level, language, difficulty,
+variant) has cosine similarity >= threshold and is younger than the TTL of
+its content type. This catches reuse that exact matching misses:
+"Past Tense, Regular Verbs" vs "regular verbs, past tense", level 3 vs "B1",
+extra whitespace.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from src.models.generation_key import GenerationKey
+from src.utils.metrics import DB_OPERATION_DURATION, observe, record_cache
+
+logger = logging.getLogger(__name__)
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_COLLECTION = "generation_cache"
+
+# Staleness bound per content type, seconds. Override with e.g.
+# SEMANTIC_CACHE_TTL="theory=604800,multiple_choice=3600,default=86400"
+DEFAULT_TTL_S = {"theory": 7 * 24 * 3600, "default": 24 * 3600}
+
+PURGE_EVERY_N_STORES = 500
+
+
+def _ttl_from_env() -> Dict[str, int]:
+    ttl = dict(DEFAULT_TTL_S)
+    for item in os.getenv("SEMANTIC_CACHE_TTL", "").split(","):
+        if "=" in item:
+            content_type, seconds = item.split("=", 1)
+            ttl[content_type.strip()] = int(seconds)
+    return ttl
+
+
+class SemanticCache:
+    """
+    Embedding-similarity cache stored in a Chroma collection.
+
+    Args:
+        collection: Chroma collection (cosine space) holding the entries
+        threshold: Minimum cosine similarity of topic texts for a hit
+        ttl_s: Max entry age per content type ("default" for the rest)
+        name: Label for the cache_requests_total metric
+    """
+
+    def __init__(
+        self,
+        collection,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_s: Optional[Dict[str, int]] = None,
+        name: str = "semantic_generation",
+    ):
+        self.collection = collection
+        self.threshold = threshold
+        self.ttl_s = ttl_s or _ttl_from_env()
+        self.name = name
+        self._stores = 0
+
+    def _ttl(self, content_type: str) -> int:
+        return self.ttl_s.get(content_type, self.ttl_s.get("default", 24 * 3600))
+
+    def lookup(self, key: GenerationKey) -> Optional[Dict[str, Any]]:
+        """Cached result for a semantically equivalent request, or None."""
+        conditions = [{k: v} for k, v in key.exact_fields().items()]
+        conditions.append({"created_at": {"$gte": time.time() - self._ttl(key.content_type)}})
+
+        try:
+            with observe(DB_OPERATION_DURATION, "chroma", "semantic_cache.query"):
+                results = self.collection.query(
+                    query_texts=[key.topic_text],
+                    n_results=1,
+                    where={"$and": conditions},
+                    include=["metadatas", "distances"],
+                )
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            record_cache(self.name, False)
+            return None
+
+        hit = None
+        if results["ids"] and results["ids"][0]:
+            similarity = 1.0 - results["distances"][0][0]
+            if similarity >= self.threshold:
+                hit = json.loads(results["metadatas"][0][0]["result"])
+                logger.debug(f"Semantic cache hit for {key} (similarity {similarity:.3f})")
+
+        record_cache(self.name, hit is not None)
+        return hit
+
+    def store(self, key: GenerationKey, result: Dict[str, Any]) -> None:
+        try:
+            with observe(DB_OPERATION_DURATION, "chroma", "semantic_cache.upsert"):
+                self.collection.upsert(
+                    ids=[key.digest()],
+                    documents=[key.topic_text],
+                    metadatas=[{
+                        **key.exact_fields(),
+                        "created_at": time.time(),
+                        "result": json.dumps(result, ensure_ascii=False, default=str),
+                    }],
+                )
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
+            return
+
+        self._stores += 1
+        if self._stores % PURGE_EVERY_N_STORES == 0:
+            self.purge_expired()
+
+    def purge_expired(self) -> None:
+        """Delete entries older than their content type's TTL."""
+        now = time.time()
+        try:
+            for content_type, ttl in self.ttl_s.items():
+                if content_type == "default":
+                    where = {"$and": [
+                        {"content_type": {"$nin": [t for t in self.ttl_s if t != "default"] or ["_"]}},
+                        {"created_at": {"$lt": now - ttl}},
+                    ]}
+                else:
+                    where = {"$and": [{"content_type": content_type}, {"created_at": {"$lt": now - ttl}}]}
+                self.collection.delete(where=where)
+        except Exception as e:
+            logger.warning(f"Semantic cache purge failed: {e}")
@@ -0,0 +1,96 @@
+"""
+SM-2 spaced-repetition scheduling for personal vocabulary.
+
+Every vocabulary item carries its schedule (repetitions, interval_days, ease,
+due_at). Review grades use the SM-2 scale 0-5; quiz results can be passed as
+booleans. The due-queue query and the post-session bulk update live in
+LanguageLearningDB and are served by the (student_id, due_at) index.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_GRADE = 3
+
+# SM-2 grades used for plain right/wrong quiz results
+CORRECT_GRADE = 4
+INCORRECT_GRADE = 1
+
+
+def to_grade(result: Union[bool, int, float]) -> int:
+    if isinstance(result, bool):
+        return CORRECT_GRADE if result else INCORRECT_GRADE
+    return max(0, min(5, int(round(result))))
+
+
+def next_review(item: Dict[str, Any], grade: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """New schedule fields of a vocabulary item after a review with the given SM-2 grade."""
+    now = now or datetime.utcnow()
+    repetitions = item.get("repetitions", 0) or 0
+    interval = item.get("interval_days", 0) or 0
+    ease = item.get("ease", DEFAULT_EASE) or DEFAULT_EASE
+
+    if grade < PASSING_GRADE:
+        repetitions, interval = 0, 1
+    else:
+        repetitions += 1
+        interval = 1 if repetitions == 1 else 6 if repetitions == 2 else round(interval * ease)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+
+    strength = item.get("strength", 0.5)
+    return {
+        "repetitions": repetitions,
+        "interval_days": interval,
+        "ease": round(ease, 3),
+        "strength": round(0.7 * strength + 0.3 * grade / 5, 3),
+        "last_reviewed_at": now,
+        "due_at": now + timedelta(days=interval),
+    }
+
+
+class ReviewScheduler:
+    """
+    Args:
+        db: LanguageLearningDB holding the vocabulary collection
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def due(self, student_id: str, limit: int = 20, now: Optional[datetime] = None) -> List[Dict]:
+        """The student's next `limit` due items, most overdue first."""
+        return self.db.get_due_vocabulary(student_id, limit=limit, now=now or datetime.utcnow())
+
+    def for_lesson(self, student_id: str, limit: int = 5) -> List[Dict]:
+        """Review words for a lesson: due items first, then the ones due next."""
+        return self.db.get_due_vocabulary(student_id, limit=limit, include_upcoming=True)
+
+    def record_session(
+        self,
+        student_id: str,
+        results: Dict[str, Union[bool, int, float]],
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Reschedule the words of a finished review session ({word: grade or correct})
+        with one read of those words and one bulk update.
+        """
+        now = now or datetime.utcnow()
+        items = self.db.get_vocabulary_items(student_id, list(results))
+        updates = [
+            {"_id": item["_id"], **next_review(item, to_grade(results[item["word"]]), now)}
+            for item in items
+            if item.get("word") in results
+        ]
+        updated = self.db.update_vocabulary_schedules(updates)
+
+        unknown = sorted(set(results) - {item.get("word") for item in items})
+        if unknown:
+            logger.info(f"Review session of {student_id}: {len(unknown)} words not in vocabulary")
+        return {"student_id": student_id, "reviewed": len(updates), "updated": updated, "unknown_words": unknown}
@@ -0,0 +1,100 @@
+"""
+Schema-guided LLM output.
+
+The pydantic schema of the expected answer is sent with the request as an
+OpenAI-compatible `response_format`, so the serving endpoint constrains
+decoding to valid JSON of that shape. The answer is still parsed and
+validated (parse_llm_json); only a validation failure is retried, with the
+error appended to the prompt. Outcomes and retries are counted in
+STRUCTURED_OUTPUT_REQUESTS / STRUCTURED_OUTPUT_RETRIES, so the first-attempt
+success rate is first_attempt / sum(outcomes).
+
+STRUCTURED_OUTPUT_MODE:
+- "json_schema" (default): full schema, guided decoding
+- "json_object": JSON mode only, for endpoints without json_schema support
+- "off": plain prompts
+"""
+
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Union
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.utils.json_stream import parse_llm_json
+from src.utils.metrics import (
+    LLM_REQUEST_DURATION,
+    STRUCTURED_OUTPUT_REQUESTS,
+    STRUCTURED_OUTPUT_RETRIES,
+    observe,
+    record_llm_usage,
+)
+
+logger = logging.getLogger(__name__)
+
+
+STRUCTURED_OUTPUT_MODE = os.getenv("STRUCTURED_OUTPUT_MODE", "json_schema").strip().lower()
+STRUCTURED_OUTPUT_MAX_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_MAX_RETRIES", "1"))
+
+# Validation errors quoted back to the model are cut to this length
+RETRY_ERROR_CHARS = 500
+
+
+@lru_cache(maxsize=None)
+def response_format(schema) -> Dict[str, Any]:
+    """OpenAI `response_format` for a pydantic model under STRUCTURED_OUTPUT_MODE."""
+    if STRUCTURED_OUTPUT_MODE == "json_object":
+        return {"type": "json_object"}
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema(), "strict": False},
+    }
+
+
+def with_response_format(llm, schema):
+    """`llm` bound to the schema's response_format (unchanged if disabled or not a LangChain model)."""
+    if STRUCTURED_OUTPUT_MODE == "off" or schema is None or not hasattr(llm, "bind"):
+        return llm
+    return llm.bind(response_format=response_format(schema))
+
+
+def retry_prompt(prompt: Union[str, List[BaseMessage]], answer: str, error: Exception) -> Union[str, List[BaseMessage]]:
+    """The request repeated with the validation error; message prompts keep their prefix and add the failed answer."""
+    feedback = (
+        f"Your previous answer was rejected: {str(error)[:RETRY_ERROR_CHARS]}\n"
+        "Answer again with only the corrected JSON object."
+    )
+    if isinstance(prompt, str):
+        return f"{prompt}\n\n{feedback}"
+    return [*prompt, AIMessage(content=answer), HumanMessage(content=feedback)]
+
+
+def invoke_structured(llm, prompt: Union[str, List[BaseMessage]], schema, agent: str, max_retries: int = STRUCTURED_OUTPUT_MAX_RETRIES) -> Dict:
+    """
+    Invoke the LLM for an answer of `schema` and return it validated and
+    dumped to a dict. Request errors are raised as is; invalid answers are
+    retried up to max_retries times, then the last error is raised.
+    """
+    bound = with_response_format(llm, schema)
+    name = schema.__name__
+    request = prompt
+
+    for attempt in range(max_retries + 1):
+        with observe(LLM_REQUEST_DURATION, agent, "invoke"):
+            response = bound.invoke(request)
+        record_llm_usage(agent, response)
+
+        try:
+            result = parse_llm_json(response.content, schema, agent=agent)
+        except ValueError as exc:
+            if attempt == max_retries:
+                STRUCTURED_OUTPUT_REQUESTS.labels(agent, name, "failed").inc()
+                raise
+            STRUCTURED_OUTPUT_RETRIES.labels(agent, name).inc()
+            logger.warning(f"{agent}: invalid {name} answer (attempt {attempt + 1}), retrying: {exc}")
+            request = retry_prompt(prompt, response.content, exc)
+            continue
+
+        STRUCTURED_OUTPUT_REQUESTS.labels(agent, name, "first_attempt" if attempt == 0 else "after_retry").inc()
+        return result
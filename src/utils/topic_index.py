@@ -0,0 +1,167 @@
+"""
+Per-curriculum topic embedding index for exercise alignment.
+
+Every (week, topic) of a curriculum is embedded once; the matrix is stored in
+MongoDB (curriculum_topic_index, float32 bytes) together with a fingerprint of
+topics_by_week and the embedding model, and cached in process. A changed
+curriculum or embedding model (name or dimension) has a different
+fingerprint, so its index is rebuilt; CurriculumPlannerAgent refreshes it
+right after saving a plan. Alignment is then a matrix-vector product.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.embeddings import embed_texts, embedding_model_id
+
+logger = logging.getLogger(__name__)
+
+
+TOPIC_INDEX_ENABLED = os.getenv("TOPIC_INDEX_ENABLED", "true").lower() == "true"
+
+EXERCISE_TEXT_FIELDS = ("topic", "task", "question", "explanation")
+
+
+@dataclass
+class TopicMatrix:
+    weeks: np.ndarray        # (n_topics,) week number of each topic
+    topics: List[str]
+    vectors: np.ndarray      # (n_topics, dim), L2-normalized
+    week_starts: np.ndarray  # offset of each week's first topic (topics are grouped by week)
+
+
+def curriculum_fingerprint(curriculum: Dict) -> str:
+    """Identity of a curriculum's topic matrix: its topics_by_week and the embedding model."""
+    return hashlib.sha1(json.dumps(
+        {"topics_by_week": curriculum.get("topics_by_week", []), "embedding_model": embedding_model_id()},
+        sort_keys=True,
+        default=str,
+    ).encode("utf-8")).hexdigest()
+
+
+def exercise_text(exercise: Dict[str, Any]) -> str:
+    parts = [str(exercise[f]) for f in EXERCISE_TEXT_FIELDS if exercise.get(f)]
+    return "\n".join(parts) if parts else json.dumps(exercise, ensure_ascii=False, default=str)
+
+
+def match_weeks(similarities: np.ndarray, matrix: TopicMatrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For each row of an (m, n_topics) cosine similarity matrix returns the best
+    topic index, its similarity and the margin between the best and the
+    second-best week (a week scores as its best topic).
+    """
+    week_scores = np.maximum.reduceat(similarities, matrix.week_starts, axis=1)
+    if week_scores.shape[1] > 1:
+        top2 = -np.partition(-week_scores, 1, axis=1)[:, :2]
+        margin = top2[:, 0] - top2[:, 1]
+    else:
+        margin = np.ones(similarities.shape[0], dtype=similarities.dtype)
+    return similarities.argmax(axis=1), similarities.max(axis=1), margin
+
+
+class TopicIndex:
+    """
+    Args:
+        db: LanguageLearningDB used to persist the matrices
+        max_cached: Matrices kept in memory (LRU)
+    """
+
+    def __init__(self, db, max_cached: int = 1024):
+        self.db = db
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, Tuple[str, TopicMatrix]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def index_id(curriculum: Dict) -> str:
+        return f"{curriculum.get('student_id')}:{curriculum.get('language')}"
+
+    def get(self, curriculum: Dict) -> Optional[TopicMatrix]:
+        """Topic matrix of the curriculum (memory -> MongoDB -> rebuilt), None if it has no topics."""
+        index_id = self.index_id(curriculum)
+        fingerprint = curriculum_fingerprint(curriculum)
+
+        with self._lock:
+            cached = self._cache.get(index_id)
+            if cached and cached[0] == fingerprint:
+                self._cache.move_to_end(index_id)
+                return cached[1]
+
+        stored = self.db.get_topic_index(index_id)
+        if stored and stored.get("fingerprint") == fingerprint:
+            matrix = TopicMatrix(
+                weeks=np.asarray(stored["weeks"], dtype=np.int32),
+                topics=stored["topics"],
+                vectors=np.frombuffer(stored["vectors"], dtype=np.float32).reshape(len(stored["topics"]), -1),
+                week_starts=np.asarray(stored["week_starts"], dtype=np.int64),
+            )
+            self._remember(index_id, fingerprint, matrix)
+            return matrix
+
+        return self.refresh(curriculum)
+
+    def refresh(self, curriculum: Dict) -> Optional[TopicMatrix]:
+        """Embed all topics of the curriculum and store the matrix."""
+        matrix = self._build(curriculum)
+        if matrix is not None:
+            self._store(curriculum, curriculum_fingerprint(curriculum), matrix)
+        return matrix
+
+    def refresh_many(self, curricula: List[Dict]) -> int:
+        """refresh() for a cohort; curricula cloned from the same plan are embedded once."""
+        matrices: Dict[str, Optional[TopicMatrix]] = {}
+        for curriculum in curricula:
+            fingerprint = curriculum_fingerprint(curriculum)
+            if fingerprint not in matrices:
+                matrices[fingerprint] = self._build(curriculum)
+            if matrices[fingerprint] is not None:
+                self._store(curriculum, fingerprint, matrices[fingerprint])
+        return len(matrices)
+
+    @staticmethod
+    def _build(curriculum: Dict) -> Optional[TopicMatrix]:
+        weeks, topics, week_starts = [], [], []
+        for week_data in sorted(curriculum.get("topics_by_week", []), key=lambda w: w.get("week", 0)):
+            week_topics = [str(t) for t in week_data.get("topics", []) if str(t).strip()]
+            if not week_topics:
+                continue
+            week_starts.append(len(topics))
+            weeks.extend([week_data.get("week")] * len(week_topics))
+            topics.extend(week_topics)
+        if not topics:
+            return None
+
+        return TopicMatrix(
+            weeks=np.asarray(weeks, dtype=np.int32),
+            topics=topics,
+            vectors=embed_texts(topics),
+            week_starts=np.asarray(week_starts, dtype=np.int64),
+        )
+
+    def _store(self, curriculum: Dict, fingerprint: str, matrix: TopicMatrix) -> None:
+        index_id = self.index_id(curriculum)
+        self.db.save_topic_index({
+            "_id": index_id,
+            "fingerprint": fingerprint,
+            "weeks": matrix.weeks.tolist(),
+            "topics": matrix.topics,
+            "week_starts": matrix.week_starts.tolist(),
+            "vectors": matrix.vectors.tobytes(),
+        })
+        self._remember(index_id, fingerprint, matrix)
+        logger.info(f"Topic index refreshed for {index_id} ({len(matrix.topics)} topics)")
+
+    def _remember(self, index_id: str, fingerprint: str, matrix: TopicMatrix) -> None:
+        with self._lock:
+            self._cache[index_id] = (fingerprint, matrix)
+            self._cache.move_to_end(index_id)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
@@ -0,0 +1,191 @@
+"""
+Lightweight span tracing for agents and LangGraph nodes.
+
+Spans are written one per line to a JSONL file (TRACE_FILE) in the OTLP/JSON
+layout used by the OpenTelemetry collector file exporter, so the file can be
+replayed into a collector (otlpjsonfile receiver) or summarized locally with
+scripts/trace_summary.py. With TRACE_FILE unset, spans are not recorded and
+the wrappers only feed the Prometheus metrics.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from src.utils.metrics import AGENT_OPERATION_DURATION, observe
+
+logger = logging.getLogger(__name__)
+
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "peas")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class JsonlSpanExporter:
+    """Appends finished spans to a JSONL file (thread-safe)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, span: "Span") -> None:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "peas.agents"},
+                    "spans": [span.to_otlp()],
+                }],
+            }],
+        }, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_exporter: Optional[JsonlSpanExporter] = JsonlSpanExporter(os.environ["TRACE_FILE"]) if os.getenv("TRACE_FILE") else None
+
+
+def configure_tracing(trace_file: Optional[str]) -> None:
+    """Enable span export to trace_file (None disables it)."""
+    global _exporter
+    _exporter = JsonlSpanExporter(trace_file) if trace_file else None
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.error = str(exc)
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": _otlp_attributes({
+                "exception.type": type(exc).__name__,
+                "exception.message": str(exc),
+            }),
+        })
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": self.events,
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Open a span as a child of the current one. Yields the Span, or None when
+    tracing is disabled.
+    """
+    if _exporter is None:
+        yield None
+        return
+
+    span = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end_ns = time.time_ns()
+        try:
+            _exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Failed to export span {name}: {e}")
+
+
+def traced_operation(operation: str):
+    """
+    Method decorator for agent operations: the AGENT_OPERATION_DURATION metric
+    plus, when tracing is on, a span "<AgentClass>.<operation>".
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            agent = self.__class__.__name__
+            with observe(AGENT_OPERATION_DURATION, agent, operation), \
+                    start_span(f"{agent}.{operation}", {"agent": agent, "operation": operation}):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_node(agent: str, node: str, fn):
+    """
+    Wrap a LangGraph node: records its duration metric and, when tracing is on,
+    a span with start/end time, exceptions and the serialized state size.
+    """
+    @functools.wraps(fn)
+    def wrapper(state):
+        with observe(AGENT_OPERATION_DURATION, agent, node), \
+                start_span(f"{agent}.{node}", {"agent": agent, "graph.node": node}) as span:
+            if span is not None:
+                span.set_attribute("state.input_bytes", _state_size(state))
+            result = fn(state)
+            if span is not None:
+                span.set_attribute("state.output_bytes", _state_size(result))
+                span.set_attribute("state.keys", len(result) if isinstance(result, dict) else 0)
+            return result
+    return wrapper
+
+
+def _state_size(state: Any) -> int:
+    try:
+        return len(json.dumps(state, default=str))
+    except Exception:
+        return -1
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> list:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded_value = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded_value = {"doubleValue": value}
+        else:
+            encoded_value = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": encoded_value})
+    return encoded